@@ -0,0 +1 @@
+"""Offline performance benchmarks (fake LLM gateway + static fixture site)."""
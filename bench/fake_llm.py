@@ -0,0 +1,134 @@
+"""Stand-in OpenAI-compatible /chat/completions server with configurable latency and token rate."""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+_SPEC_ID_RE = re.compile(r"^\s*id:\s*(\S+)", re.MULTILINE)
+
+
+def canned_ir(spec_id: str, base_url: str) -> dict:
+    return {
+        "id": spec_id,
+        "desc": f"bench {spec_id}",
+        "env_base_url": base_url,
+        "ignore_https_errors": True,
+        "actions": [
+            {"op": "goto", "url": "/login", "wait_until": "domcontentloaded"},
+            {"op": "fill", "locator": {"kind": "label", "value": "用户名"}, "value": "${ADMIN_USER}"},
+            {"op": "fill", "locator": {"kind": "label", "value": "密码"}, "value": "${ADMIN_PASS}"},
+            {"op": "click", "locator": {"kind": "role", "value": "button", "name": "登录"}},
+            {"op": "wait_for", "target": "url", "value": "**/dashboard*", "timeout_ms": 15000},
+        ],
+        "expects": [
+            {"kind": "url_is", "value": "/dashboard"},
+            {"kind": "visible_text", "value": "Dashboard"},
+        ],
+        "tags": ["bench"],
+    }
+
+
+def _tokens(text: str) -> list[str]:
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+class FakeLLMServer:
+    """Threaded HTTP server; every request sleeps `latency_sec` then emits tokens at `tokens_per_sec`."""
+
+    def __init__(self, latency_sec: float = 0.2, tokens_per_sec: float = 200.0,
+                 target_base_url: str = "http://127.0.0.1:8000", host: str = "127.0.0.1", port: int = 0) -> None:
+        self.latency_sec = latency_sec
+        self.tokens_per_sec = tokens_per_sec
+        self.target_base_url = target_base_url
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", "0"))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                user = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+                if '{"irs": [...]}' in user:  # packed prompt (spec2ir.prompt.build_packed_user_prompt)
+                    answer = {"irs": [canned_ir(spec_id, server.target_base_url)
+                                      for spec_id in _SPEC_ID_RE.findall(user)]}
+                else:
+                    m = _SPEC_ID_RE.search(user)
+                    answer = canned_ir(m.group(1) if m else "bench", server.target_base_url)
+                content = json.dumps(answer, ensure_ascii=False)
+                tokens = _tokens(content)
+                time.sleep(server.latency_sec)
+                if body.get("stream"):
+                    include_usage = (body.get("stream_options") or {}).get("include_usage")
+                    self._stream(tokens, len(user) // 4 if include_usage else None)
+                else:
+                    time.sleep(len(tokens) / server.tokens_per_sec)
+                    payload = json.dumps({
+                        "choices": [{"message": {"role": "assistant", "content": content}}],
+                        "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": len(tokens),
+                                  "total_tokens": len(user) // 4 + len(tokens)},
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+            def _stream(self, tokens: list[str], prompt_tokens: int | None = None) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                delay = 1.0 / server.tokens_per_sec
+                for tok in tokens:
+                    chunk = {"choices": [{"delta": {"content": tok}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(delay)
+                if prompt_tokens is not None:
+                    # OpenAI sends usage in a final chunk with no choices when stream_options.include_usage is set
+                    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                             "total_tokens": prompt_tokens + len(tokens)}
+                    self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
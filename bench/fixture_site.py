@@ -0,0 +1,98 @@
+"""Static login/dashboard fixture pages with large accessibility trees."""
+from __future__ import annotations
+
+import html
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def _nav(links: int) -> str:
+    items = "".join(f'<li><a href="/section/{i}">菜单 {i} Section {i}</a></li>' for i in range(links))
+    return f"<nav><ul>{items}</ul></nav>"
+
+
+def login_page(links: int) -> str:
+    return f"""<!doctype html><html lang="zh"><head><meta charset="utf-8"><title>登录</title></head>
+<body>{_nav(links)}
+<main><h1>WAF 控制台登录</h1>
+<form onsubmit="event.preventDefault(); location.href='/dashboard';">
+  <label for="u">用户名</label><input id="u" name="username" autocomplete="off">
+  <label for="p">密码</label><input id="p" name="password" type="password">
+  <button type="submit">登录</button>
+</form></main>
+<footer>{"".join(f'<a href="/legal/{i}">条款 {i}</a>' for i in range(links // 4))}</footer>
+</body></html>"""
+
+
+def dashboard_page(links: int, rows: int) -> str:
+    body = "".join(
+        f"<tr><td>{i}</td><td>10.0.{i // 256}.{i % 256}</td><td>{html.escape('/api/v1/items?id=' + str(i))}</td>"
+        f"<td><button>详情 {i}</button></td></tr>"
+        for i in range(rows)
+    )
+    return f"""<!doctype html><html lang="zh"><head><meta charset="utf-8"><title>Dashboard</title></head>
+<body>{_nav(links)}
+<main><h1>Dashboard</h1><p>统计 Statistics</p>
+<table><thead><tr><th>#</th><th>源 IP</th><th>URL</th><th>操作</th></tr></thead><tbody>{body}</tbody></table>
+</main></body></html>"""
+
+
+class FixtureSite:
+    """Threaded HTTP server for /login, /dashboard (alias /statistics); `?rows=` overrides table size."""
+
+    def __init__(self, links: int = 200, rows: int = 500, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.links = links
+        self.rows = rows
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FixtureSite":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FixtureSite":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                rows = int(query.get("rows", [site.rows])[0])
+                if url.path in ("/", "/login"):
+                    page = login_page(site.links)
+                elif url.path in ("/dashboard", "/statistics"):
+                    page = dashboard_page(site.links, rows)
+                else:
+                    page = f"<!doctype html><html><body><h1>{html.escape(url.path)}</h1></body></html>"
+                data = page.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
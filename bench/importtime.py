@@ -0,0 +1,91 @@
+"""CLI startup guard based on `python -X importtime`.
+
+Imports each CLI entry module in a fresh interpreter, takes the median
+cumulative import time over several runs and checks that heavy dependencies
+are not loaded just to parse arguments. Exits 1 on regression, so it can run
+in CI:
+
+    PYTHONPATH=src python -m bench.importtime --max-ms 60
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+CLI_MODULES = ["spec2ir.main", "spec2ir_runner.main"]
+# Only needed once a command actually runs (conversion, capture, execution).
+HEAVY_MODULES = ["playwright", "pydantic", "httpx", "asyncio"]
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (src, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of `module` in microseconds, as reported by -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=_env(), check=True)
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def loaded_heavy_modules(module: str) -> List[str]:
+    code = f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env(), check=True)
+    loaded = {name.split(".")[0] for name in json.loads(proc.stdout)}
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def help_wall_ms(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", module, "--help"], capture_output=True, env=_env(), check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def measure(modules: List[str] = CLI_MODULES, repeat: int = 5) -> Dict[str, dict]:
+    out: Dict[str, dict] = {}
+    for module in modules:
+        out[f"cli_import:{module}"] = {
+            "import_ms": statistics.median(import_time_us(module) for _ in range(repeat)) / 1000,
+            "help_wall_ms": statistics.median(help_wall_ms(module) for _ in range(repeat)),
+            "heavy_modules": loaded_heavy_modules(module),
+        }
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fail if CLI startup imports regress")
+    p.add_argument("--max-ms", type=float, default=float(os.getenv("SPEC2IR_MAX_IMPORT_MS", "60")),
+                   help="Max median cumulative import time per CLI module (ms)")
+    p.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    args = p.parse_args()
+
+    failed = False
+    for name, m in measure(repeat=args.repeat).items():
+        problems = []
+        if m["import_ms"] > args.max_ms:
+            problems.append(f"import {m['import_ms']:.1f}ms > {args.max_ms:.0f}ms")
+        if m["heavy_modules"]:
+            problems.append(f"loads {', '.join(m['heavy_modules'])} at import")
+        tag = "[FAIL]" if problems else "[OK]"
+        print(f"{tag} {name}: import {m['import_ms']:.1f}ms, --help {m['help_wall_ms']:.0f}ms"
+              f"{' (' + '; '.join(problems) + ')' if problems else ''}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Offline benchmark harness.
+
+Starts a fake OpenAI-compatible gateway and a fixture site, then measures
+spec_to_ir throughput (plain, streamed, and packed through a multi-provider
+config), a11y capture latency, prune time, bulk IR loading and
+run_ir throughput (live and replayed from recorded HARs) at several
+concurrency levels. Results are written as JSON so runs of
+different versions can be compared with --compare.
+
+    python -m bench.run --out bench_results.json
+    python -m bench.run --compare old.json --out new.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import yaml
+
+from bench.fake_llm import FakeLLMServer, canned_ir
+from bench.fixture_site import FixtureSite
+from bench.importtime import measure as measure_cli_imports
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _synthetic_tree(links: int, rows: int) -> dict:
+    nav = {"role": "navigation", "children": [{"role": "link", "name": f"菜单 {i}"} for i in range(links)]}
+    form = {"role": "form", "children": [
+        {"role": "textbox", "name": "用户名"}, {"role": "textbox", "name": "密码"}, {"role": "button", "name": "登录"},
+    ]}
+    table = {"role": "table", "children": [
+        {"role": "row", "children": [
+            {"role": "cell", "name": str(i)}, {"role": "cell", "name": f"10.0.{i // 256}.{i % 256}"},
+            {"role": "button", "name": f"详情 {i}"},
+        ]} for i in range(rows)
+    ]}
+    return {"role": "WebArea", "name": "Dashboard", "children": [nav, {"role": "main", "children": [form, table]}]}
+
+
+def _synthetic_aria_yaml(links: int, rows: int) -> str:
+    lines = ["- navigation:"]
+    lines += [f'  - link "菜单 {i}"' for i in range(links)]
+    lines += ["- main:", "  - heading \"Dashboard\" [level=1]", "  - table:"]
+    for i in range(rows):
+        lines += ["    - row:", f'      - cell "{i}"', f'      - button "详情 {i}"']
+    return "\n".join(lines)
+
+
+def _write_specs(directory: str, count: int, base_url: str) -> List[str]:
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i:04d}.yaml")
+        spec = {
+            "id": f"bench_{i:04d}",
+            "desc": "登录后进入 Dashboard",
+            "prepare": [f"打开 {base_url}/login 登录页"],
+            "steps": [{"action": "输入用户名 admin"}, {"action": "输入密码"}, {"action": "点击登录"}],
+            "expect": "跳转到 /dashboard",
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(spec, f, allow_unicode=True)
+        paths.append(path)
+    return paths
+
+
+def _write_irs(directory: str, count: int, base_url: str) -> List[str]:
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i:04d}.ir.yaml")
+        with open(path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(canned_ir(f"bench_{i:04d}", base_url), f, allow_unicode=True, sort_keys=False)
+        paths.append(path)
+    return paths
+
+
+async def bench_spec_to_ir(llm_base_url: str, site_url: str, count: int, levels: List[int],
+                           stream: bool) -> Dict[str, dict]:
+    os.environ.update({"LLM_BASE_URL": llm_base_url, "LLM_API_KEY": "bench", "LLM_MODEL": "bench",
+                       "LLM_STREAM": "1" if stream else "0"})
+    from spec2ir.batch import convert_batch
+    from spec2ir.llm.openai_compat import OpenAICompatProvider
+
+    out: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        specs = _write_specs(tmp, count, site_url)
+        for level in levels:
+            llm = OpenAICompatProvider()
+            try:
+                result = await convert_batch(specs, llm, out_dir=os.path.join(tmp, f"out{level}"), concurrency=level)
+            finally:
+                await llm.aclose()
+            out[f"spec_to_ir{'_stream' if stream else ''}@c{level}"] = {
+                "specs": count,
+                "failed": len(result.failed),
+                "wall_sec": result.wall_sec,
+                "specs_per_min": count / result.wall_sec * 60 if result.wall_sec else 0.0,
+            }
+    return out
+
+
+async def bench_spec_to_ir_packed_multi(llm_base_url: str, site_url: str, count: int,
+                                        levels: List[int], pack: int = 4) -> Dict[str, dict]:
+    """Packed conversions routed through a YAML-configured MultiProvider, as `--provider x.yaml --pack N` does."""
+    from spec2ir.batch import convert_batch
+    from spec2ir.converter import validate_completion
+    from spec2ir.llm.registry import load_multi_provider
+
+    out: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        specs = _write_specs(tmp, count, site_url)
+        config = os.path.join(tmp, "providers.yaml")
+        with open(config, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"mode": "fallback", "providers": [
+                {"name": name, "base_url": llm_base_url, "api_key": "bench", "model": "bench"}
+                for name in ("gw-a", "gw-b")]}, f)
+        for level in levels:
+            if level < 2:
+                continue  # packing needs conversions in flight together
+            llm = load_multi_provider(config, validate=validate_completion)
+            try:
+                result = await convert_batch(specs, llm, out_dir=os.path.join(tmp, f"out{level}"),
+                                             concurrency=level, pack=pack)
+            finally:
+                await llm.aclose()
+            out[f"spec_to_ir_pack{pack}_multi@c{level}"] = {
+                "specs": count,
+                "failed": len(result.failed),
+                "wall_sec": result.wall_sec,
+                "specs_per_min": count / result.wall_sec * 60 if result.wall_sec else 0.0,
+                "llm_requests": result.pack.requests if result.pack else None,
+                "retried_alone": result.pack.retried if result.pack else None,
+                "invalid_answers": sum(m.stats.invalid for m in llm.members),
+            }
+    return out
+
+
+def bench_prune(links: int, rows: int, repeat: int) -> Dict[str, dict]:
+    from spec2ir.a11y_budget import prune_a11y_tree_to_budget
+    from spec2ir.ui_context import _aria_snapshot_yaml_to_tree, _measured, _normalize_aria_yaml, _prune_a11y_tree
+
+    tree = _synthetic_tree(links, rows)
+    aria = _synthetic_aria_yaml(links, rows)
+    focus = "输入用户名 admin\n输入密码\n点击登录\n跳转到 /dashboard"
+    return {
+        "prune_fixed": {"nodes": links + rows * 4 + 6,
+                        "median_ms": _median_ms(lambda: _prune_a11y_tree(tree, 10, 40), repeat)},
+        "prune_budget": {"budget_tokens": 2000,
+                         "median_ms": _median_ms(lambda: prune_a11y_tree_to_budget(tree, focus, 2000), repeat)},
+        "aria_normalize": {"yaml_bytes": len(aria.encode("utf-8")),
+                           "median_ms": _median_ms(lambda: _aria_snapshot_yaml_to_tree(aria), repeat)},
+        "aria_normalize_budget": {"max_nodes": 2000,
+                                  "median_ms": _median_ms(lambda: _normalize_aria_yaml(aria, 2000), repeat),
+                                  "peak_mb": _measured("aria_snapshot", len(aria), 2000,
+                                                       lambda: _normalize_aria_yaml(aria, 2000),
+                                                       memstats=True)[1].peak_bytes / 2**20},
+    }
+
+
+def bench_load_irs(count: int) -> Dict[str, dict]:
+    from spec2ir_runner.loader import IRLoader, write_bundle
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = _write_irs(tmp, count, "https://bench.local")
+        cache_dir = os.path.join(tmp, "cache")
+        results = {}
+        for name, loader in (("load_irs_cold", IRLoader(cache_dir)), ("load_irs_cache_dir", IRLoader(cache_dir))):
+            started = time.perf_counter()
+            entries = loader.load_all(paths)
+            results[name] = {"irs": count, "total_ms": (time.perf_counter() - started) * 1000}
+        bundle = os.path.join(tmp, "bench.irs.jsonl")
+        write_bundle((ir for _, ir in entries), bundle)
+        started = time.perf_counter()
+        IRLoader(use_disk=False).load_all([bundle])
+        results["load_irs_bundle"] = {"irs": count, "total_ms": (time.perf_counter() - started) * 1000}
+    return results
+
+
+async def bench_capture(site_url: str, repeat: int) -> Dict[str, dict]:
+    from spec2ir.browser_pool import BrowserPool
+    from spec2ir.ui_context import A11yCaptureOptions, capture_a11y_tree
+
+    opts = A11yCaptureOptions()
+    url = f"{site_url}/dashboard"
+    cold = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await capture_a11y_tree(url, opts)
+        cold.append((time.perf_counter() - started) * 1000)
+    warm = []
+    async with BrowserPool(size=1) as pool:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await capture_a11y_tree(url, opts, pool=pool)
+            warm.append((time.perf_counter() - started) * 1000)
+    return {
+        "capture_cold": {"median_ms": statistics.median(cold)},
+        "capture_pooled": {"median_ms": statistics.median(warm)},
+    }
+
+
+async def bench_run_ir(site_url: str, count: int, levels: List[int]) -> Dict[str, dict]:
+    """run_ir throughput against the fixture site, then replayed offline from HARs recorded by the first level."""
+    from spec2ir.har import HarMode
+    from spec2ir_runner.suite import run_suite
+
+    os.environ.setdefault("ADMIN_USER", "admin")
+    os.environ.setdefault("ADMIN_PASS", "bench-pass-1")
+    out: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = _write_irs(tmp, count, site_url)
+        har_dir = os.path.join(tmp, "har")
+        for name, har in (("run_ir", None), ("run_ir_replay", HarMode("replay", har_dir))):
+            for i, level in enumerate(levels):
+                if har is None and i == 0:
+                    result = await run_suite(paths, level, har=HarMode("record", har_dir))
+                else:
+                    result = await run_suite(paths, level, har=har)
+                out[f"{name}@c{level}"] = {
+                    "irs": count,
+                    "failed": len(result.failed),
+                    "wall_sec": result.wall_sec,
+                    "tests_per_min": result.tests_per_minute,
+                }
+    return out
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def _meta() -> dict:
+    try:
+        from importlib.metadata import version
+        pkg_version = version("spec2ir-demo")
+    except Exception:
+        pkg_version = ""
+    return {"version": pkg_version, "git_rev": _git_rev(), "python": platform.python_version(),
+            "platform": platform.platform(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+async def _guarded(name: str, coro) -> Dict[str, dict]:
+    try:
+        return await coro
+    except Exception as exc:  # e.g. Playwright browsers not installed
+        print(f"[SKIP] {name}: {type(exc).__name__}: {str(exc).splitlines()[0] if str(exc) else ''}", file=sys.stderr)
+        return {name: {"skipped": f"{type(exc).__name__}"}}
+
+
+async def run_all(args) -> dict:
+    results: Dict[str, dict] = {}
+    with FixtureSite(links=args.links, rows=args.rows) as site, \
+            FakeLLMServer(args.llm_latency, args.llm_token_rate, target_base_url=site.base_url) as llm:
+        results.update(await _guarded("spec_to_ir", bench_spec_to_ir(
+            llm.base_url, site.base_url, args.specs, args.levels, stream=False)))
+        results.update(await _guarded("spec_to_ir_stream", bench_spec_to_ir(
+            llm.base_url, site.base_url, args.specs, args.levels, stream=True)))
+        results.update(await _guarded("spec_to_ir_pack_multi", bench_spec_to_ir_packed_multi(
+            llm.base_url, site.base_url, args.specs, args.levels)))
+        results.update(bench_prune(args.links, args.rows, args.repeat))
+        results.update(bench_load_irs(args.load_irs))
+        results.update(measure_cli_imports(repeat=args.repeat))
+        if not args.skip_browser:
+            results.update(await _guarded("capture", bench_capture(site.base_url, args.repeat)))
+            results.update(await _guarded("run_ir", bench_run_ir(site.base_url, args.irs, args.levels)))
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "compare")}
+    return {"meta": _meta(), "params": params, "results": results}
+
+
+def compare(old: dict, new: dict) -> str:
+    lines = ["[COMPARE] metric: old -> new (change)"]
+    for name, metrics in new["results"].items():
+        before = old.get("results", {}).get(name, {})
+        for key, value in metrics.items():
+            prev = before.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(prev, (int, float)) or not prev:
+                continue
+            if key.endswith(("_ms", "_sec", "_per_min")):
+                lines.append(f"  {name}.{key}: {prev:.2f} -> {value:.2f} ({(value - prev) / prev * 100:+.1f}%)")
+    return "\n".join(lines)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Offline spec2ir / spec2ir_runner benchmarks")
+    p.add_argument("--out", default="bench_results.json", help="Write machine-readable results here")
+    p.add_argument("--compare", default=None, help="Previous results JSON to diff against")
+    p.add_argument("--levels", type=int, nargs="+", default=[1, 4, 8], help="Concurrency levels")
+    p.add_argument("--specs", type=int, default=16, help="Specs per spec_to_ir level")
+    p.add_argument("--irs", type=int, default=8, help="IRs per run_ir level")
+    p.add_argument("--load-irs", type=int, default=500, help="IR files for the bulk loader benchmark")
+    p.add_argument("--links", type=int, default=200, help="Navigation links per fixture page")
+    p.add_argument("--rows", type=int, default=500, help="Dashboard table rows")
+    p.add_argument("--repeat", type=int, default=5, help="Repetitions for latency measurements")
+    p.add_argument("--llm-latency", type=float, default=0.2, help="Fake gateway time to first token (s)")
+    p.add_argument("--llm-token-rate", type=float, default=400.0, help="Fake gateway tokens per second")
+    p.add_argument("--skip-browser", action="store_true", help="Skip benchmarks that need Playwright browsers")
+    args = p.parse_args()
+
+    report = asyncio.run(run_all(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    for name, metrics in report["results"].items():
+        print(f"{name:28s} {json.dumps(metrics, ensure_ascii=False)}")
+    print(f"[OK] results written to {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
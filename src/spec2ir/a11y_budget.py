@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+A11Y_NODE_KEYS = ("role", "name", "value", "description", "keyshortcuts",
+                  "checked", "pressed", "expanded", "level")
+
+_ROLE_WEIGHTS = {
+    "textbox": 6.0, "searchbox": 6.0, "combobox": 5.0, "button": 5.0,
+    "link": 4.0, "checkbox": 4.0, "radio": 4.0, "switch": 4.0, "slider": 3.0, "spinbutton": 3.0,
+    "menuitem": 3.0, "tab": 3.0, "option": 2.0, "heading": 2.0, "form": 2.0, "dialog": 2.0, "alert": 2.0,
+}
+_MATCH_WEIGHT = 4.0
+_TERM_RE = re.compile(r"[A-Za-z0-9_]{2,}|[\u4e00-\u9fff]+")
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough tokenizer-free estimate: one token per CJK char, ~4 chars per token otherwise."""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _terms(text: str) -> Set[str]:
+    out: Set[str] = set()
+    for m in _TERM_RE.finditer(text or ""):
+        word = m.group(0)
+        if word.isascii():
+            out.add(word.lower())
+        elif len(word) == 1:
+            out.add(word)
+        else:
+            out.update(word[i:i + 2] for i in range(len(word) - 1))
+    return out
+
+
+@dataclass
+class A11yPruneReport:
+    total_nodes: int
+    kept_nodes: int
+    budget_tokens: int
+    tokens: int
+    baseline_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.baseline_tokens - self.tokens
+
+    def __str__(self) -> str:
+        return (
+            f"[A11Y] kept {self.kept_nodes}/{self.total_nodes} nodes, ~{self.tokens} tokens "
+            f"(budget {self.budget_tokens}, fixed prune ~{self.baseline_tokens}, saved ~{self.saved_tokens})"
+        )
+
+
+def _flatten(tree: Any) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Iteratively flatten into (own-fields node, parent index) in document order."""
+    nodes: List[Dict[str, Any]] = []
+    parents: List[int] = []
+    roots = tree if isinstance(tree, list) else [tree]
+    stack: List[Tuple[Any, int]] = [(n, -1) for n in reversed(roots)]
+    while stack:
+        node, parent = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        own = {k: node[k] for k in A11Y_NODE_KEYS if k in node and node[k] not in (None, "", [])}
+        nodes.append(own)
+        parents.append(parent)
+        idx = len(nodes) - 1
+        children = node.get("children") or []
+        if isinstance(children, list):
+            stack.extend((c, idx) for c in reversed(children))
+    return nodes, parents
+
+
+def _node_score(node: Dict[str, Any], query: Set[str]) -> float:
+    score = _ROLE_WEIGHTS.get(str(node.get("role", "")), 0.0)
+    if query:
+        text = " ".join(str(node[k]) for k in ("name", "value", "description") if k in node)
+        overlap = len(_terms(text) & query)
+        score += _MATCH_WEIGHT * min(overlap, 3)
+    return score
+
+
+def _rebuild(nodes: List[Dict[str, Any]], parents: List[int], keep: Iterable[int], list_root: bool) -> Any:
+    copies: Dict[int, Dict[str, Any]] = {}
+    roots: List[Dict[str, Any]] = []
+    for idx in sorted(keep):
+        copy = dict(nodes[idx])
+        copies[idx] = copy
+        parent = parents[idx]
+        if parent == -1:
+            roots.append(copy)
+        else:
+            copies[parent].setdefault("children", []).append(copy)
+    if list_root:
+        return roots
+    return roots[0] if roots else {}
+
+
+def prune_a11y_tree_to_budget(
+    tree: Any,
+    focus_text: str,
+    budget_tokens: int,
+    baseline_tokens: Optional[int] = None,
+) -> Tuple[Any, A11yPruneReport]:
+    """Keep the nodes most relevant to `focus_text` (plus their ancestors) within a token budget.
+
+    Nodes are scored by interactive role and by term overlap with the spec's
+    steps/expect text, then added greedily with any ancestors they need until
+    the budget is spent. `baseline_tokens` (the fixed-depth prune) is only used
+    for the savings report.
+    """
+    nodes, parents = _flatten(tree)
+    query = _terms(focus_text)
+    costs = [estimate_tokens(json.dumps(n, ensure_ascii=False, separators=(",", ":"))) + 2 for n in nodes]
+    order = sorted(range(len(nodes)), key=lambda i: (-_node_score(nodes[i], query), i))
+
+    keep: Set[int] = set()
+    spent = 0
+    for idx in order:
+        if idx in keep:
+            continue
+        path = []
+        cur = idx
+        while cur != -1 and cur not in keep:
+            path.append(cur)
+            cur = parents[cur]
+        extra = sum(costs[i] for i in path)
+        if spent + extra > budget_tokens:
+            continue
+        keep.update(path)
+        spent += extra
+
+    pruned = _rebuild(nodes, parents, keep, isinstance(tree, list))
+    tokens = estimate_tokens(json.dumps(pruned, ensure_ascii=False, separators=(",", ":")))
+    report = A11yPruneReport(
+        total_nodes=len(nodes),
+        kept_nodes=len(keep),
+        budget_tokens=budget_tokens,
+        tokens=tokens,
+        baseline_tokens=baseline_tokens if baseline_tokens is not None else tokens,
+    )
+    return pruned, report
+
+
+def _signature(node: Dict[str, Any]) -> str:
+    return json.dumps(node, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def tree_delta(previous: Any, current: Any, max_removed: int = 50) -> Tuple[Any, List[Dict[str, Any]], int]:
+    """Encode `current` against `previous`: (added, removed, unchanged).
+
+    Nodes are compared by their own fields (role, name, value, ...), as a
+    multiset, so moved or repeated nodes are not reported twice. `added` is
+    the subtree of new nodes plus the ancestors they need, `removed` lists at
+    most `max_removed` nodes of `previous` that are gone, and `unchanged`
+    counts nodes of `current` already present in `previous` (those needed as
+    ancestors still appear in `added`).
+    """
+    prev_nodes, _ = _flatten(previous)
+    remaining: Dict[str, int] = {}
+    for node in prev_nodes:
+        sig = _signature(node)
+        remaining[sig] = remaining.get(sig, 0) + 1
+
+    nodes, parents = _flatten(current)
+    keep: Set[int] = set()
+    unchanged = 0
+    for idx, node in enumerate(nodes):
+        sig = _signature(node)
+        if remaining.get(sig):
+            remaining[sig] -= 1
+            unchanged += 1
+            continue
+        cur = idx
+        while cur != -1 and cur not in keep:
+            keep.add(cur)
+            cur = parents[cur]
+
+    removed: List[Dict[str, Any]] = []
+    for sig, count in remaining.items():
+        removed.extend([json.loads(sig)] * min(count, max_removed - len(removed)))
+        if len(removed) >= max_removed:
+            break
+    added = _rebuild(nodes, parents, keep, isinstance(current, list)) if keep else None
+    return added, removed, unchanged
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def _default_cache_dir() -> str:
+    root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "spec2ir", "a11y")
+
+
+class _CaptureCancelled(Exception):
+    """Set on an in-flight future whose capturing task was cancelled; waiters then capture themselves."""
+
+
+@dataclass
+class SnapshotCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # requests that waited for a capture already in flight
+
+    def __str__(self) -> str:
+        total = self.hits + self.disk_hits + self.misses + self.coalesced
+        return (
+            f"[A11Y] snapshot cache: {self.misses} captures for {total} requests "
+            f"(memory hits={self.hits} disk hits={self.disk_hits} coalesced={self.coalesced})"
+        )
+
+
+class A11ySnapshotCache:
+    """Raw a11y snapshots keyed by URL plus the capture options that change the page.
+
+    Snapshots are kept in memory and as JSON files under `cache_dir` for
+    `ttl_sec`; pruning (depth/children or token budget) runs on every use, so
+    specs with different focus text share one capture. Concurrent get() calls
+    for the same key wait for a single capture; if that capture's task is
+    cancelled, one of the waiters captures instead. Expired files are deleted
+    when read, and once per cache object all expired files are swept on the
+    first write. Configure via env:
+      - SPEC2IR_A11Y_CACHE_DIR (default: $XDG_CACHE_HOME/spec2ir/a11y)
+      - SPEC2IR_A11Y_CACHE_TTL_SEC (default: 600)
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl_sec: Optional[float] = None) -> None:
+        self.cache_dir = cache_dir or os.getenv("SPEC2IR_A11Y_CACHE_DIR") or _default_cache_dir()
+        self.ttl_sec = ttl_sec if ttl_sec is not None else float(os.getenv("SPEC2IR_A11Y_CACHE_TTL_SEC", "600"))
+        self.stats = SnapshotCacheStats()
+        self._memory: Dict[str, Tuple[float, str, Any]] = {}  # key -> (created, url, tree)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._swept = False
+
+    @staticmethod
+    def cache_key(url: str, options: Dict[str, Any]) -> str:
+        material = json.dumps([url, options], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _fresh(self, created: float) -> bool:
+        return time.time() - created <= self.ttl_sec
+
+    def _read(self, key: str) -> Optional[Tuple[float, str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(entry.get("created", 0)):
+            self._remove(path)
+            return None
+        return entry["created"], entry.get("url", ""), entry.get("tree")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _sweep(self) -> None:
+        """Delete snapshot files written more than ttl_sec ago (their mtime is the write time)."""
+        self._swept = True
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                expired = not self._fresh(os.stat(path).st_mtime)
+            except OSError:
+                continue
+            if expired:
+                self._remove(path)
+
+    def _write(self, key: str, url: str, created: float, tree: Any) -> None:
+        if not self._swept:
+            self._sweep()
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "url": url, "tree": tree}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            pass  # an unwritable cache only costs a recapture next run
+
+    async def get(self, url: str, options: Dict[str, Any], capture: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached snapshot of `url`, or the result of `capture()` (run once per key at a time)."""
+        key = self.cache_key(url, options)
+        while True:
+            entry = self._memory.get(key)
+            if entry is not None and self._fresh(entry[0]):
+                self.stats.hits += 1
+                return entry[2]
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _CaptureCancelled:
+                continue  # the capturing caller went away, not this one: capture (or wait) again
+        entry = self._read(key)
+        if entry is not None:
+            self.stats.disk_hits += 1
+            self._memory[key] = entry
+            return entry[2]
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            tree = await capture()
+        except asyncio.CancelledError:
+            future.set_exception(_CaptureCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved: only coalesced waiters need it
+            raise
+        finally:
+            del self._inflight[key]
+        created = time.time()
+        self._memory[key] = (created, url, tree)
+        self._write(key, url, created, tree)
+        future.set_result(tree)
+        return tree
+
+    def invalidate(self, url: Optional[str] = None) -> int:
+        """Drop cached snapshots of `url` (all snapshots when None); returns how many were removed."""
+        removed = {k for k, (_, u, _) in self._memory.items() if url is None or u == url}
+        for key in removed:
+            del self._memory[key]
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            if url is not None:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        if json.load(f).get("url") != url:
+                            continue
+                except (OSError, ValueError):
+                    pass
+            try:
+                os.remove(path)
+                removed.add(name[:-len(".json")])
+            except OSError:
+                pass
+        return len(removed)
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import difflib
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from spec2ir.ir_model import Click, Fill, Goto, Locator, TestIR, WaitFor
+
+
+# Roles whose accessible name is what Playwright's get_by_label matches.
+LABELED_ROLES = frozenset({
+    "textbox", "searchbox", "combobox", "listbox", "checkbox", "radio",
+    "spinbutton", "slider", "switch",
+})
+_WS_RE = re.compile(r"\s+")
+# Root role of each page in a multi-page capture (spec2ir.flow_capture); not an ARIA role.
+FLOW_PAGE_ROLE = "page"
+
+
+def is_flow_capture(tree_json: Optional[str]) -> bool:
+    return bool(tree_json) and tree_json.startswith(f'[{{"role":"{FLOW_PAGE_ROLE}"')
+
+
+def _norm(text: str) -> str:
+    return _WS_RE.sub(" ", str(text)).strip().casefold()
+
+
+class _Bucket(dict):
+    """Normalized key -> value, plus character-bigram postings for substring lookups.
+
+    The postings (bigram -> keys containing it, in insertion order) are built
+    on the first substring query and dropped whenever a key is added.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._grams: Optional[Dict[str, List[str]]] = None
+        self.scans = 0  # needles too short for a bigram; these fall back to scanning every key
+
+    def __setitem__(self, key, value) -> None:
+        self._grams = None
+        super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._grams = None
+        return super().setdefault(key, default)
+
+    def containing(self, needle: str) -> List[str]:
+        """Keys containing `needle`, in insertion order."""
+        if len(needle) < 2:
+            self.scans += 1
+            return [key for key in self if needle in key]
+        if self._grams is None:
+            self._grams = defaultdict(list)
+            for key in self:
+                for gram in {key[i:i + 2] for i in range(len(key) - 1)}:
+                    self._grams[gram].append(key)
+        postings = [self._grams.get(needle[i:i + 2], ()) for i in range(len(needle) - 1)]
+        return [key for key in min(postings, key=len) if needle in key]
+
+
+class A11yIndex:
+    """Hash lookups over a captured a11y tree by (role, name), label and text.
+
+    Keys are normalized (case-folded, whitespace collapsed). Exact lookups are
+    dict hits; substring lookups go through each bucket's bigram postings and
+    only compare keys sharing the needle's rarest bigram (see _Bucket; single
+    characters still scan the bucket, counted in `full_scans`). Fuzzy
+    matching looks at the distinct names of one bucket, never the whole tree.
+    """
+
+    def __init__(self) -> None:
+        self.role_names: Dict[str, _Bucket] = defaultdict(_Bucket)  # role -> norm name -> name
+        self.labels: _Bucket = _Bucket()  # norm label -> (role, name)
+        self.texts: _Bucket = _Bucket()  # norm text -> text
+        self.nodes = 0
+        self.pages = 1
+
+    @classmethod
+    def from_tree(cls, tree) -> "A11yIndex":
+        """Index a snapshot, or a multi-page capture (all pages; `pages` counts them)."""
+        index = cls()
+        if isinstance(tree, list) and tree and all(
+                isinstance(n, dict) and n.get("role") == FLOW_PAGE_ROLE for n in tree):
+            index.pages = len(tree)
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, dict):
+                continue
+            index._add(node)
+            children = node.get("children")
+            if isinstance(children, list):
+                stack.extend(children)
+        return index
+
+    @classmethod
+    def from_json(cls, tree_json: str) -> "A11yIndex":
+        return cls.from_tree(json.loads(tree_json))
+
+    def _add(self, node: dict) -> None:
+        self.nodes += 1
+        role = _norm(node.get("role") or "")
+        name = node.get("name")
+        if isinstance(name, str) and name.strip():
+            key = _norm(name)
+            self.role_names[role].setdefault(key, name)
+            self.texts.setdefault(key, name)
+            if role in LABELED_ROLES:
+                self.labels.setdefault(key, (role, name))
+        value = node.get("value")
+        if isinstance(value, str) and value.strip():
+            self.texts.setdefault(_norm(value), value)
+
+    @property
+    def full_scans(self) -> int:
+        return self.labels.scans + self.texts.scans + sum(b.scans for b in self.role_names.values())
+
+    @staticmethod
+    def _contains(bucket: _Bucket, needle: str) -> bool:
+        """Playwright's default (non-exact) matching: case-insensitive substring."""
+        return needle in bucket or bool(bucket.containing(needle))
+
+    def has_role(self, role: str, name: Optional[str] = None) -> bool:
+        names = self.role_names.get(_norm(role))
+        if names is None:
+            return False
+        return name is None or self._contains(names, _norm(name))
+
+    def has_label(self, label: str) -> bool:
+        return self._contains(self.labels, _norm(label))
+
+    def has_text(self, text: str) -> bool:
+        return self._contains(self.texts, _norm(text))
+
+    def exists(self, locator: Locator) -> Optional[bool]:
+        """True/False for role, label and text locators; None when the tree cannot tell (css, xpath, testid)."""
+        if locator.kind == "role":
+            return self.has_role(locator.value, locator.name)
+        if locator.kind == "label":
+            return self.has_label(locator.value)
+        if locator.kind == "text":
+            return self.has_text(locator.value)
+        return None
+
+    def resolve_label(self, text: str) -> Optional[str]:
+        """Accessible name of the form control labelled `text` (exact, else unique substring)."""
+        key = _norm(text)
+        if key in self.labels:
+            return self.labels[key][1]
+        hits = self.labels.containing(key)
+        return self.labels[hits[0]][1] if len(hits) == 1 else None
+
+    def resolve_named(self, name: str, roles: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """(role, name) of the node called `name`, trying `roles` in order (exact, else unique substring)."""
+        key = _norm(name)
+        for role in roles:
+            names = self.role_names.get(role, {})
+            if key in names:
+                return role, names[key]
+        hits = []
+        for role in roles:
+            names = self.role_names.get(role)
+            if names is not None:
+                hits.extend((role, names[k]) for k in names.containing(key))
+        return hits[0] if len(hits) == 1 else None
+
+    @staticmethod
+    def _closest(needle: str, bucket, cutoff: float) -> Optional[str]:
+        """Unique best fuzzy match in `bucket`, or None when nothing (or more than one) is close enough."""
+        scored = sorted(
+            ((difflib.SequenceMatcher(None, needle, key).ratio(), key) for key in bucket),
+            reverse=True,
+        )
+        scored = [(score, key) for score, key in scored if score >= cutoff]
+        if not scored or (len(scored) > 1 and scored[0][0] == scored[1][0]):
+            return None
+        return scored[0][1]
+
+    def repair(self, locator: Locator, cutoff: float = 0.6) -> Optional[Locator]:
+        """Deterministically rewrite a locator that misses, or None if no unambiguous fix exists."""
+        if locator.kind == "role":
+            role, name = _norm(locator.value), locator.name
+            if name is None:
+                return None
+            needle = _norm(name)
+            same_role = self.role_names.get(role, {})
+            key = self._closest(needle, same_role, cutoff)
+            if key is not None:
+                return Locator(kind="role", value=locator.value, name=same_role[key])
+            # right name, wrong role (e.g. a "button" that is really a link)
+            roles = [r for r, names in self.role_names.items() if needle in names and r]
+            if len(roles) == 1:
+                return Locator(kind="role", value=roles[0], name=self.role_names[roles[0]][needle])
+            return None
+        if locator.kind == "label":
+            key = self._closest(_norm(locator.value), self.labels, cutoff)
+            if key is not None:
+                return Locator(kind="label", value=self.labels[key][1])
+            return None
+        if locator.kind == "text":
+            key = self._closest(_norm(locator.value), self.texts, cutoff)
+            if key is not None:
+                return Locator(kind="text", value=self.texts[key])
+        return None
+
+
+def _describe(locator: Locator) -> str:
+    return f"{locator.kind}={locator.value!r}" + (f" name={locator.name!r}" if locator.name else "")
+
+
+@dataclass
+class LocatorReport:
+    checked: int = 0
+    valid: int = 0
+    skipped: int = 0
+    repaired: List[str] = field(default_factory=list)
+    unresolved: List[str] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        lines = [
+            f"[A11Y] locators: {self.checked} checked, {self.valid} ok, {len(self.repaired)} repaired, "
+            f"{len(self.unresolved)} unresolved, {self.skipped} not checkable"
+        ]
+        lines += [f"[A11Y]   repaired {r}" for r in self.repaired]
+        lines += [f"[A11Y]   missing {u}" for u in self.unresolved]
+        return "\n".join(lines)
+
+
+def _captured_page_actions(ir: TestIR, pages: int = 1) -> Set[int]:
+    """Indexes of actions that run on captured pages: from the first goto until navigation leaves the last one."""
+    indexes: Set[int] = set()
+    seen_goto = False
+    navigations = 0
+    for i, action in enumerate(ir.actions):
+        if isinstance(action, Goto):
+            if seen_goto:
+                navigations += 1
+            seen_goto = True
+        elif isinstance(action, WaitFor) and action.target == "url" and seen_goto:
+            navigations += 1
+        if navigations >= pages:
+            break
+        indexes.add(i)
+    return indexes
+
+
+def validate_ir_locators(ir: TestIR, index: A11yIndex) -> Tuple[TestIR, LocatorReport]:
+    """Check Fill/Click locators against `index`, repairing misses; returns a (possibly) updated copy."""
+    report = LocatorReport()
+    on_page = _captured_page_actions(ir, index.pages)
+    actions = list(ir.actions)
+    for i, action in enumerate(actions):
+        if not isinstance(action, (Fill, Click)):
+            continue
+        found = index.exists(action.locator) if i in on_page else None
+        if found is None:
+            report.skipped += 1
+            continue
+        report.checked += 1
+        if found:
+            report.valid += 1
+            continue
+        fixed = index.repair(action.locator)
+        if fixed is not None:
+            actions[i] = action.model_copy(update={"locator": fixed})
+            report.repaired.append(f"#{i + 1} {_describe(action.locator)} -> {_describe(fixed)}")
+        else:
+            report.unresolved.append(f"#{i + 1} {action.op} {_describe(action.locator)}")
+    if report.repaired:
+        ir = ir.model_copy(update={"actions": actions})
+    return ir, report
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import glob
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import yaml
+from pydantic import TypeAdapter
+
+from spec2ir.a11y_cache import A11ySnapshotCache, SnapshotCacheStats
+from spec2ir.converter import spec_to_ir
+from spec2ir.flow_capture import capture_flow as walk_flow
+from spec2ir.llm.base import LLMProvider
+from spec2ir.packing import PackStats, SpecPacker
+from spec2ir.rules import RuleReport, convert_spec
+from spec2ir.ir_model import TestIR
+from spec2ir.spec_model import SpecCase
+from spec2ir.ui_context import (
+    extract_first_url,
+    capture_a11y_tree,
+    a11y_tree_to_compact_json,
+    spec_focus_text,
+    A11yCaptureOptions,
+)
+from spec2ir.browser_pool import BrowserPool
+
+
+_SPEC_SUFFIXES = (".yaml", ".yml")
+_IR_SUFFIXES = (".ir.yaml", ".ir.yml")
+
+
+def collect_spec_paths(pattern: str) -> List[str]:
+    """Expand a directory or glob into a sorted list of spec files (IR outputs are skipped)."""
+    if os.path.isdir(pattern):
+        candidates = [
+            os.path.join(root, name)
+            for root, _, files in os.walk(pattern)
+            for name in files
+        ]
+    else:
+        candidates = glob.glob(pattern, recursive=True)
+    return sorted(
+        p for p in candidates
+        if os.path.isfile(p) and p.endswith(_SPEC_SUFFIXES) and not p.endswith(_IR_SUFFIXES)
+    )
+
+
+def spec_root(spec_paths: List[str]) -> str:
+    """Deepest directory containing every spec; outputs under --out-dir keep their path relative to it."""
+    if not spec_paths:
+        return ""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in spec_paths])
+
+
+def ir_output_path(spec_path: str, out_dir: Optional[str] = None, root: Optional[str] = None) -> str:
+    """Where a spec's IR goes: next to the spec, or under `out_dir` mirroring the spec's directory below `root`.
+
+    Keeping the relative directory stops specs that share a basename in
+    different directories from overwriting (and, in incremental mode,
+    reusing) each other's IR.
+    """
+    base, _ = os.path.splitext(os.path.basename(spec_path))
+    if not out_dir:
+        return os.path.join(os.path.dirname(spec_path), f"{base}.ir.yaml")
+    relative = os.path.relpath(os.path.dirname(os.path.abspath(spec_path)), root) if root else "."
+    return os.path.normpath(os.path.join(out_dir, relative, f"{base}.ir.yaml"))
+
+
+def load_spec(spec_path: str) -> SpecCase:
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec_yaml = yaml.safe_load(f)
+    return TypeAdapter(SpecCase).validate_python(spec_yaml)
+
+
+def load_previous_ir(out_path: str) -> Optional[TestIR]:
+    """The IR an earlier run wrote to `out_path`, or None if there is none (or it no longer validates)."""
+    if not os.path.isfile(out_path):
+        return None
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            return TypeAdapter(TestIR).validate_python(yaml.safe_load(f))
+    except (OSError, ValueError, yaml.YAMLError):
+        return None
+
+
+def write_ir(ir_dict: dict, out_path: str) -> None:
+    directory = os.path.dirname(out_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(ir_dict, f, allow_unicode=True, sort_keys=False)
+
+
+@dataclass
+class BatchItemResult:
+    spec_path: str
+    out_path: str
+    ok: bool
+    elapsed_sec: float
+    error: Optional[str] = None
+    rules: Optional[RuleReport] = None
+
+
+@dataclass
+class BatchResult:
+    items: List[BatchItemResult] = field(default_factory=list)
+    wall_sec: float = 0.0
+    pack: Optional[PackStats] = None
+    a11y_cache: Optional[SnapshotCacheStats] = None
+
+    @property
+    def succeeded(self) -> List[BatchItemResult]:
+        return [x for x in self.items if x.ok]
+
+    @property
+    def failed(self) -> List[BatchItemResult]:
+        return [x for x in self.items if not x.ok]
+
+    def summary(self) -> str:
+        line = (
+            f"[SUMMARY] {len(self.succeeded)} ok, {len(self.failed)} failed, "
+            f"{len(self.items)} total in {self.wall_sec:.2f}s"
+        )
+        if self.a11y_cache is not None:
+            line = f"{line}\n{self.a11y_cache}"
+        if self.pack is not None:
+            line = f"{line}\n{self.pack}"
+        reports = [x.rules for x in self.items if x.rules is not None]
+        if not reports:
+            return line
+        total = RuleReport()
+        for r in reports:
+            total.merge(r)
+        return f"{line}\n{total}"
+
+
+async def convert_batch(
+    spec_paths: List[str],
+    llm: LLMProvider,
+    *,
+    out_dir: Optional[str] = None,
+    concurrency: int = 4,
+    capture_a11y: bool = False,
+    a11y_url: Optional[str] = None,
+    pool: Optional[BrowserPool] = None,
+    a11y_token_budget: Optional[int] = None,
+    net_profile: Optional[str] = None,
+    use_rules: bool = True,
+    incremental: bool = True,
+    pack: int = 1,
+    a11y_cache: Optional[A11ySnapshotCache] = None,
+    capture_flow: bool = False,
+) -> BatchResult:
+    """Convert many specs with one LLM provider and (optionally) one shared browser pool.
+
+    Each IR is written as soon as its conversion finishes; a failing spec is
+    recorded in the result and does not stop the rest of the batch. With
+    `use_rules`, steps matched by spec2ir.rules skip the LLM; with
+    `incremental`, steps unchanged since the IR already at the output path
+    keep their actions. With `pack` > 1, up to that many LLM conversions that
+    share an a11y capture go out as one request (see spec2ir.packing); only
+    conversions in flight together can share, so keep `concurrency` >= `pack`.
+    `a11y_cache` captures each URL once for all specs that open it;
+    `capture_flow` instead walks each spec's steps and sends every page
+    reached (spec2ir.flow_capture), which is per spec and not cached.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    result = BatchResult()
+    packer = SpecPacker(llm, pack) if pack > 1 else None
+    root = spec_root(spec_paths) if out_dir else None
+
+    async def convert_one(spec_path: str, pool: Optional[BrowserPool]) -> None:
+        out_path = ir_output_path(spec_path, out_dir, root)
+        async with sem:
+            started = time.perf_counter()
+            try:
+                spec = load_spec(spec_path)
+                a11y_json = None
+                if pool is not None:
+                    url = a11y_url or extract_first_url(spec.prepare)
+                    if not url:
+                        raise RuntimeError("capture-a11y enabled but no URL found in prepare; pass --a11y-url")
+                    opts = A11yCaptureOptions(ignore_https_errors=True, token_budget=a11y_token_budget,
+                                              focus_text=spec_focus_text(spec), net_profile=net_profile)
+                    if capture_flow:
+                        pages, _ = await walk_flow(spec, opts, pool=pool, url=url)
+                        a11y_json = a11y_tree_to_compact_json(pages)
+                    else:
+                        tree = await capture_a11y_tree(url, opts, pool=pool, cache=a11y_cache)
+                        a11y_json = a11y_tree_to_compact_json(tree)
+                rules = None
+                previous = load_previous_ir(out_path) if incremental else None
+                if use_rules or previous is not None:
+                    ir, rules = await convert_spec(spec, llm, a11y_tree_json=a11y_json, use_rules=use_rules,
+                                                   previous=previous, packer=packer)
+                elif packer is not None:
+                    ir = await packer.convert(spec, a11y_json)
+                else:
+                    ir = await spec_to_ir(spec, llm, a11y_tree_json=a11y_json)
+                write_ir(ir.model_dump(), out_path)
+                item = BatchItemResult(spec_path, out_path, True, time.perf_counter() - started, rules=rules)
+                print(f"[OK] {spec_path} -> {out_path} ({item.elapsed_sec:.2f}s)")
+            except Exception as exc:
+                item = BatchItemResult(spec_path, out_path, False, time.perf_counter() - started,
+                                       error=f"{type(exc).__name__}: {exc}")
+                print(f"[FAIL] {spec_path}: {item.error}")
+            result.items.append(item)
+
+    started = time.perf_counter()
+    if capture_a11y and pool is not None:
+        await asyncio.gather(*(convert_one(p, pool) for p in spec_paths))
+    elif capture_a11y:
+        async with BrowserPool() as own_pool:
+            await asyncio.gather(*(convert_one(p, own_pool) for p in spec_paths))
+    else:
+        await asyncio.gather(*(convert_one(p, None) for p in spec_paths))
+    result.wall_sec = time.perf_counter() - started
+    if packer is not None:
+        result.pack = packer.stats
+    if capture_a11y and a11y_cache is not None:
+        result.a11y_cache = a11y_cache.stats
+    return result
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+
+if TYPE_CHECKING:  # Playwright is imported on start(), not at module load
+    from playwright.async_api import Browser, BrowserContext, Playwright
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "off")
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return int(raw)
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser) -> None:
+        self.browser = browser
+        self.active = 0
+        self.uses = 0
+        self.retiring = False
+
+
+@dataclass
+class BrowserPoolStats:
+    launched: int = 0
+    recycled: int = 0
+    contexts: int = 0
+
+    def __str__(self) -> str:
+        return f"[POOL] browsers_launched={self.launched} recycled={self.recycled} contexts={self.contexts}"
+
+
+class BrowserPool:
+    """Keeps a few Chromium instances warm and hands out fresh, isolated BrowserContexts.
+
+    Configure via env (constructor arguments win):
+      - SPEC2IR_POOL_BROWSERS (default: 2) max Chromium processes
+      - SPEC2IR_POOL_CONTEXTS (default: 4) max concurrent contexts per browser
+      - SPEC2IR_POOL_RECYCLE (default: 50) close a browser after this many contexts
+      - SPEC2IR_HEADLESS (default: 1)
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        max_contexts_per_browser: Optional[int] = None,
+        recycle_after: Optional[int] = None,
+        headless: Optional[bool] = None,
+    ) -> None:
+        self.size = max(1, size if size is not None else _env_int("SPEC2IR_POOL_BROWSERS", 2))
+        self.max_contexts_per_browser = max(1, max_contexts_per_browser if max_contexts_per_browser is not None
+                                            else _env_int("SPEC2IR_POOL_CONTEXTS", 4))
+        self.recycle_after = max(1, recycle_after if recycle_after is not None
+                                 else _env_int("SPEC2IR_POOL_RECYCLE", 50))
+        self.headless = headless if headless is not None else _env_flag("SPEC2IR_HEADLESS", True)
+        self.stats = BrowserPoolStats()
+
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._launching = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self, warm: Optional[int] = None) -> None:
+        """Start Playwright and pre-launch `warm` browsers (default: the full pool size)."""
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        want = min(self.size, self.size if warm is None else warm) - len(self._browsers)
+        if want > 0:
+            browsers = await asyncio.gather(*(self._launch() for _ in range(want)))
+            async with self._cond:
+                self._browsers.extend(_PooledBrowser(b) for b in browsers)
+                self._cond.notify_all()
+
+    async def close(self) -> None:
+        async with self._cond:
+            browsers, self._browsers = self._browsers, []
+        for slot in browsers:
+            await slot.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self) -> Browser:
+        assert self._playwright is not None
+        browser = await self._playwright.chromium.launch(headless=self.headless)
+        self.stats.launched += 1
+        return browser
+
+    def _pick(self) -> Optional[_PooledBrowser]:
+        self._browsers = [b for b in self._browsers if b.browser.is_connected() or b.active]
+        candidates = [
+            b for b in self._browsers
+            if not b.retiring and b.active < self.max_contexts_per_browser and b.browser.is_connected()
+        ]
+        if not candidates:
+            return None
+        slot = min(candidates, key=lambda b: b.active)
+        slot.active += 1
+        slot.uses += 1
+        if slot.uses >= self.recycle_after:
+            slot.retiring = True
+        return slot
+
+    async def _acquire(self) -> _PooledBrowser:
+        while True:
+            async with self._cond:
+                slot = self._pick()
+                if slot is not None:
+                    return slot
+                if len(self._browsers) + self._launching >= self.size:
+                    await self._cond.wait()
+                    continue
+                self._launching += 1
+            try:
+                browser = await self._launch()
+            except BaseException:
+                async with self._cond:
+                    self._launching -= 1
+                    self._cond.notify_all()
+                raise
+            async with self._cond:
+                self._launching -= 1
+                self._browsers.append(_PooledBrowser(browser))
+                self._cond.notify_all()
+
+    async def _release(self, slot: _PooledBrowser) -> None:
+        async with self._cond:
+            slot.active -= 1
+            retire = slot.retiring and slot.active == 0
+            if retire and slot in self._browsers:
+                self._browsers.remove(slot)
+            self._cond.notify_all()
+        if retire:
+            self.stats.recycled += 1
+            await slot.browser.close()
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs) -> AsyncIterator[BrowserContext]:
+        """Yield a new BrowserContext (closed on exit) from the least loaded warm browser."""
+        if self._playwright is None:
+            await self.start(warm=0)
+        slot = await self._acquire()
+        try:
+            context = await slot.browser.new_context(**context_kwargs)
+            self.stats.contexts += 1
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            await self._release(slot)
@@ -1,36 +1,69 @@
 from __future__ import annotations
+import functools
 import json
+import os
 import re
+import sys
+from typing import AsyncIterator, List, Optional, get_args
 
 from pydantic import TypeAdapter
 
-from spec2ir.ir_model import TestIR
-from spec2ir.spec_model import SpecCase
-from spec2ir.prompt import SYSTEM_PROMPT, build_user_prompt
+from spec2ir.a11y_index import A11yIndex, validate_ir_locators
+from spec2ir.ir_model import TestIR, Action, Expectation, LocatorKind
+from spec2ir.spec_model import SpecCase, spec_lines, step_hashes
+from spec2ir.prompt import (
+    SYSTEM_PROMPT,
+    build_locator_feedback,
+    build_packed_user_prompt,
+    build_user_prompt,
+    prompt_token_report,
+)
 from spec2ir.llm.base import LLMProvider
+from spec2ir.stream_json import IncrementalJSONParser, StreamValidationError
 
 
-def _schema_for_ir() -> str:
-    # Concise schema guidance (enough for demo). For production: generate JSON Schema from Pydantic.
-    return r'''
-{
-  "id": "string",
-  "desc": "string",
-  "env_base_url": "string (e.g. https://host:port)",
-  "ignore_https_errors": "boolean",
-  "actions": [
-    {"op":"goto","url":"string","wait_until":"domcontentloaded|load|networkidle"},
-    {"op":"fill","locator":{"kind":"testid|role|label|text|css|xpath","value":"string","name":"optional string"},"value":"string like ${VAR}"},
-    {"op":"click","locator":{"kind":"testid|role|label|text|css|xpath","value":"string","name":"optional string"}},
-    {"op":"wait_for","target":"url|selector|text","value":"string","timeout_ms":"int"}
-  ],
-  "expects": [
-    {"kind":"url_is","value":"string path like /statistics"},
-    {"kind":"visible_text","value":"string"}
-  ],
-  "tags": ["string"]
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "off")
+
+
+# Hints the bare model types cannot express; keyed by (definition, field).
+_SCHEMA_HINTS = {
+    ("TestIR", "env_base_url"): "e.g. https://host:port",
+    ("Fill", "value"): "${VAR} for credentials",
+    ("ExpectURL", "value"): "path like /statistics",
 }
-'''.strip()
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_for_ir() -> str:
+    """Minified JSON Schema of TestIR, generated once per process.
+
+    Titles are dropped, `step` is asked for as a line number (see
+    SYSTEM_PROMPT; _attribute_steps turns it into a line hash) and left out of
+    expects, which always map to spec.expect. The text is byte-identical
+    across calls so it can sit in a cacheable prompt prefix.
+    """
+    schema = TestIR.model_json_schema()
+    definitions = dict(schema.pop("$defs", {}))
+    definitions["TestIR"] = schema
+    for def_name, definition in definitions.items():
+        definition.pop("title", None)
+        properties = definition.get("properties", {})
+        for field_name, prop in properties.items():
+            prop.pop("title", None)
+            hint = _SCHEMA_HINTS.get((def_name, field_name))
+            if hint:
+                prop["description"] = hint
+        if "step" in properties:
+            if "op" in properties:
+                properties["step"] = {"type": "integer"}
+            else:
+                del properties["step"]
+    schema["$defs"] = {k: v for k, v in definitions.items() if k != "TestIR"}
+    return json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
 
 
 def _sanitize_llm_json(text: str) -> str:
@@ -67,38 +100,238 @@ def _normalize_locator(locator: dict | None) -> dict | None:
     return locator
 
 
+def normalize_fill_value(v: str) -> str:
+    if not isinstance(v, str):
+        return v
+    if v.startswith("${") and v.endswith("}"):
+        return v
+    if v == "admin":
+        return "${ADMIN_USER}"
+    if len(v) >= 8 and re.search(r"[A-Za-z]", v) and re.search(r"\d", v):
+        return "${ADMIN_PASS}"
+    return v
+
+
+def _post_process_action(act: dict) -> dict:
+    op = act.get("op")
+    if isinstance(act.get("step"), int):
+        act["step"] = str(act["step"])
+    if op == "fill":
+        act["value"] = normalize_fill_value(act.get("value", ""))
+    if op in {"fill", "click"}:
+        act["locator"] = _normalize_locator(act.get("locator"))
+    return act
+
+
 def _post_process(ir_dict: dict) -> dict:
     """Security policy & schema compliance: sanitize values & locators."""
+    for act in ir_dict.get("actions", []):
+        _post_process_action(act)
+    return ir_dict
 
-    def normalize_value(v: str) -> str:
-        if not isinstance(v, str):
-            return v
-        if v.startswith("${") and v.endswith("}"):
-            return v
-        if v == "admin":
-            return "${ADMIN_USER}"
-        if len(v) >= 8 and re.search(r"[A-Za-z]", v) and re.search(r"\d", v):
-            return "${ADMIN_PASS}"
-        return v
 
-    for act in ir_dict.get("actions", []):
-        op = act.get("op")
-        if op == "fill":
-            act["value"] = normalize_value(act.get("value", ""))
-        if op in {"fill", "click"}:
-            act["locator"] = _normalize_locator(act.get("locator"))
+_IR_ADAPTER = TypeAdapter(TestIR)
 
-    return ir_dict
+
+def ir_from_text(raw: str) -> TestIR:
+    json_text = _sanitize_llm_json(raw)
+    ir_dict = json.loads(json_text)
+    ir_dict = _post_process(ir_dict)
+    return _IR_ADAPTER.validate_python(ir_dict)
+
+
+def validate_completion(raw: str) -> None:
+    """Answer check for MultiProvider covering both prompt kinds: one IR, or a packed {"irs": [...]} answer.
+
+    A packed answer is only checked for shape; its entries are validated one
+    by one in specs_to_irs, so a single bad entry does not reject the rest.
+    """
+    data = json.loads(_sanitize_llm_json(raw))
+    if isinstance(data, dict) and "irs" in data:
+        entries = data["irs"]
+        if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+            raise ValueError('packed answer "irs" must be an array of objects')
+        return
+    _IR_ADAPTER.validate_python(_post_process(data))
 
 
-async def spec_to_ir(spec: SpecCase, llm: LLMProvider, a11y_tree_json: str | None = None) -> TestIR:
+def _literal_values(model_types, field: str) -> set[str]:
+    return {v for m in model_types for v in get_args(m.model_fields[field].annotation)}
+
+
+_ACTION_ADAPTER = TypeAdapter(Action)
+_EXPECTATION_ADAPTER = TypeAdapter(Expectation)
+_STREAM_CHECKS = {
+    ("actions", "op"): _literal_values(get_args(Action), "op"),
+    ("actions", "locator", "kind"): set(get_args(LocatorKind)) | set(_LOCATOR_KIND_ALIASES),
+    ("expects", "kind"): _literal_values(get_args(Expectation), "kind"),
+}
+
+
+def _validate_stream_item(section: str, item, index: int):
+    try:
+        if section == "actions":
+            if not isinstance(item, dict):
+                raise StreamValidationError(f"action #{index} is not an object")
+            return _ACTION_ADAPTER.validate_python(_post_process_action(item))
+        return _EXPECTATION_ADAPTER.validate_python(item)
+    except StreamValidationError:
+        raise
+    except ValueError as exc:
+        raise StreamValidationError(f"invalid {section} item #{index}: {exc}") from exc
+
+
+class IRStream:
+    """Async iterator over validated actions while the LLM is still generating.
+
+    The request is cancelled on the first invalid action/expectation (unknown
+    op, locator kind, ...), raising StreamValidationError. After a complete
+    iteration `ir` holds the fully validated TestIR.
+    """
+
+    def __init__(self, llm: LLMProvider, system_prompt: str, user_prompt: str) -> None:
+        self.llm = llm
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.ir: Optional[TestIR] = None
+
+    def __aiter__(self) -> AsyncIterator[Action]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Action]:
+        parser = IncrementalJSONParser(("actions", "expects"), _STREAM_CHECKS)
+        counts = {"actions": 0, "expects": 0}
+        chunks = self.llm.stream_json(self.system_prompt, self.user_prompt)
+        try:
+            try:
+                async for piece in chunks:
+                    for section, item in parser.feed(piece):
+                        counts[section] += 1
+                        validated = _validate_stream_item(section, item, counts[section])
+                        if section == "actions":
+                            yield validated
+            finally:
+                await chunks.aclose()
+            self.ir = ir_from_text(parser.full_text())
+        except Exception:
+            self.llm.discard(self.system_prompt, self.user_prompt)
+            raise
+
+
+def stream_ir(spec: SpecCase, llm: LLMProvider, a11y_tree_json: str | None = None) -> IRStream:
     schema = _schema_for_ir()
     user_prompt = build_user_prompt(spec, schema, a11y_tree_json)
+    return IRStream(llm, SYSTEM_PROMPT, user_prompt)
+
+
+def _attribute_steps(ir: TestIR, spec: SpecCase) -> TestIR:
+    """Replace the LLM's 1-based line numbers in `step` with spec line hashes (None when out of range)."""
+    hashes = step_hashes(spec_lines(spec))
+    expect_hash = step_hashes([spec.expect])[0]
+    actions = []
+    for action in ir.actions:
+        n = int(action.step) if action.step and action.step.isdigit() else 0
+        actions.append(action.model_copy(update={"step": hashes[n - 1] if 1 <= n <= len(hashes) else None}))
+    expects = [e.model_copy(update={"step": expect_hash}) for e in ir.expects]
+    return ir.model_copy(update={"actions": actions, "expects": expects})
+
+
+async def _complete_ir(llm: LLMProvider, user_prompt: str) -> TestIR:
+    if llm.supports_streaming:
+        stream = IRStream(llm, SYSTEM_PROMPT, user_prompt)
+        async for _ in stream:
+            pass
+        return stream.ir
 
     raw = await llm.complete_json(SYSTEM_PROMPT, user_prompt)
-    json_text = _sanitize_llm_json(raw)
-    ir_dict = json.loads(json_text)
-    ir_dict = _post_process(ir_dict)
+    try:
+        return ir_from_text(raw)
+    except Exception:
+        llm.discard(SYSTEM_PROMPT, user_prompt)
+        raise
+
+
+async def spec_to_ir(spec: SpecCase, llm: LLMProvider, a11y_tree_json: str | None = None,
+                     attempts: int | None = None) -> TestIR:
+    """Convert via the LLM, retrying invalid output up to SPEC2IR_LLM_ATTEMPTS (default 2) times.
+
+    Streaming providers are validated action by action, so a bad generation is
+    abandoned as soon as it goes wrong instead of after the full response.
+    With an a11y tree, fill/click locators are checked against it and repaired
+    by exact/fuzzy matching; the LLM is asked again (within the same attempt
+    budget) only for misses that cannot be repaired. SPEC2IR_VALIDATE_LOCATORS=0
+    turns this off. SPEC2IR_PROMPT_STATS=1 prints estimated tokens per prompt section.
+    """
+    attempts = attempts or int(os.getenv("SPEC2IR_LLM_ATTEMPTS", "2"))
+    schema = _schema_for_ir()
+    user_prompt = build_user_prompt(spec, schema, a11y_tree_json)
+    if _env_flag("SPEC2IR_PROMPT_STATS", False):
+        print(prompt_token_report(spec, schema, a11y_tree_json), file=sys.stderr)
+    index = None
+    if a11y_tree_json and _env_flag("SPEC2IR_VALIDATE_LOCATORS", True):
+        index = A11yIndex.from_json(a11y_tree_json)
+
+    prompt = user_prompt
+    for attempt in range(1, attempts + 1):
+        try:
+            ir = await _complete_ir(llm, prompt)
+        except ValueError as exc:
+            if attempt >= attempts:
+                raise
+            reason = str(exc).splitlines()[0] if str(exc) else type(exc).__name__
+            print(f"[LLM] invalid output ({reason}); retry {attempt}/{attempts - 1}", file=sys.stderr)
+            continue
+        ir = _attribute_steps(ir, spec)
+        if index is None:
+            return ir
+        ir, report = validate_ir_locators(ir, index)
+        if report.checked:
+            print(report, file=sys.stderr)
+        if not report.unresolved or attempt >= attempts:
+            return ir
+        print(f"[LLM] {len(report.unresolved)} locator(s) not in a11y tree; retry {attempt}/{attempts - 1}",
+              file=sys.stderr)
+        prompt = build_locator_feedback(user_prompt, report.unresolved)
+    raise AssertionError("unreachable")
+
+
+async def specs_to_irs(specs: List[SpecCase], llm: LLMProvider,
+                       a11y_tree_json: str | None = None) -> List[Optional[TestIR]]:
+    """Convert several specs sharing one a11y capture with a single LLM request.
+
+    The answer is split and validated spec by spec; entries that are missing,
+    fail validation or keep locators the a11y tree cannot resolve come back
+    as None so the caller can retry just those specs with spec_to_ir.
+    """
+    user_prompt = build_packed_user_prompt(specs, _schema_for_ir(), a11y_tree_json)
+    raw = await llm.complete_json(SYSTEM_PROMPT, user_prompt)
+    try:
+        entries = json.loads(_sanitize_llm_json(raw)).get("irs")
+        if not isinstance(entries, list):
+            raise ValueError('packed answer has no "irs" array')
+    except (ValueError, AttributeError):
+        llm.discard(SYSTEM_PROMPT, user_prompt)
+        return [None] * len(specs)
+    if len(entries) != len(specs):
+        by_id = {e.get("id"): e for e in entries if isinstance(e, dict)}
+        entries = [by_id.get(spec.id) for spec in specs]
 
-    adapter = TypeAdapter(TestIR)
-    return adapter.validate_python(ir_dict)
+    index = None
+    if a11y_tree_json and _env_flag("SPEC2IR_VALIDATE_LOCATORS", True):
+        index = A11yIndex.from_json(a11y_tree_json)
+    results: List[Optional[TestIR]] = []
+    for spec, entry in zip(specs, entries):
+        try:
+            ir = _IR_ADAPTER.validate_python(_post_process(entry))
+        except (ValueError, TypeError, AttributeError):
+            results.append(None)
+            continue
+        ir = _attribute_steps(ir, spec)
+        if index is not None:
+            ir, report = validate_ir_locators(ir, index)
+            if report.checked:
+                print(report, file=sys.stderr)
+            if report.unresolved:
+                ir = None
+        results.append(ir)
+    return results
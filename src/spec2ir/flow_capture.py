@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from spec2ir.a11y_budget import estimate_tokens, tree_delta
+from spec2ir.a11y_index import FLOW_PAGE_ROLE, A11yIndex
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.ir_model import Action, Click, Fill, Goto, Locator, WaitFor
+from spec2ir.netprofile import NetworkStats, apply_profile, get_profile
+from spec2ir.rules import RuleContext, compile_step
+from spec2ir.spec_model import SpecCase, spec_lines
+from spec2ir.ui_context import (
+    A11yCaptureOptions,
+    a11y_tree_to_compact_json,
+    extract_first_url,
+    page_a11y_snapshot,
+    shape_a11y_tree,
+)
+from spec2ir_runner.plan import fill_value, locator_call
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+
+_PASSWORD_RE = re.compile(r"密码|口令|password|passwd", re.IGNORECASE)
+_PASSWORD_VAR_RE = re.compile(r"^\$\{\w*PASS\w*\}$", re.IGNORECASE)  # e.g. ${ADMIN_PASS}
+
+
+@dataclass
+class FlowReport:
+    pages: int = 0
+    executed: int = 0  # spec lines performed in the browser
+    lines: int = 0
+    tokens: int = 0  # capture as sent (later pages as deltas where smaller)
+    full_tokens: int = 0  # same pages sent as whole trees
+    stopped: Optional[str] = None
+
+    def __str__(self) -> str:
+        line = (
+            f"[A11Y] flow: {self.pages} pages after {self.executed}/{self.lines} steps, "
+            f"~{self.tokens} tokens as deltas (whole trees ~{self.full_tokens})"
+        )
+        return f"{line}; stopped at {self.stopped}" if self.stopped else line
+
+
+def _allowed_clicks() -> List[str]:
+    """SPEC2IR_FLOW_ALLOW_CLICKS: comma-separated accessible names (fnmatch patterns) safe to click."""
+    raw = os.getenv("SPEC2IR_FLOW_ALLOW_CLICKS", "")
+    return [p.strip().casefold() for p in raw.split(",") if p.strip()]
+
+
+def _click_allowed(locator: Locator, allow: List[str]) -> bool:
+    name = (locator.name or locator.value).casefold()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in allow)
+
+
+def _is_password_fill(line: str, action: Fill) -> bool:
+    return bool(_PASSWORD_RE.search(line) or _PASSWORD_RE.search(action.locator.value)
+                or _PASSWORD_VAR_RE.match(action.value))
+
+
+def _locate(page: Page, locator: Locator):
+    """The runner's locator (see locator_call), narrowed to the first match: capture must not fail on strictness."""
+    method, args, kwargs = locator_call(locator)
+    return getattr(page, method)(*args, **kwargs).first
+
+
+async def _perform(page: Page, action: Action, timeout_ms: int) -> None:
+    if isinstance(action, Goto):
+        await page.goto(action.url, wait_until=action.wait_until, timeout=timeout_ms)
+    elif isinstance(action, Fill):
+        await _locate(page, action.locator).fill(fill_value(action.value), timeout=timeout_ms)
+    elif isinstance(action, Click):
+        await _locate(page, action.locator).click(timeout=timeout_ms)
+    elif action.target == "url":
+        await page.wait_for_url(action.value, timeout=min(action.timeout_ms, timeout_ms))
+    elif action.target == "text":
+        await page.get_by_text(action.value).first.wait_for(timeout=min(action.timeout_ms, timeout_ms))
+    else:
+        await page.wait_for_selector(action.value, timeout=min(action.timeout_ms, timeout_ms))
+
+
+def _page_node(url: str, after_step: int, children: Any) -> Dict[str, Any]:
+    node: Dict[str, Any] = {"role": FLOW_PAGE_ROLE, "name": url, "after_step": after_step}
+    if children:
+        node["children"] = children if isinstance(children, list) else [children]
+    return node
+
+
+async def _walk(context: BrowserContext, spec: SpecCase, url: str, opts: A11yCaptureOptions,
+                max_pages: int, step_timeout_ms: int, settle_ms: int,
+                allow_clicks: Optional[List[str]] = None) -> Tuple[List[dict], FlowReport]:
+    lines = spec_lines(spec)
+    report = FlowReport(lines=len(lines))
+    page = await context.new_page()
+    await page.goto(url, wait_until=opts.wait_until, timeout=opts.timeout_ms)
+    tree = shape_a11y_tree(await page_a11y_snapshot(page, opts.max_nodes), opts)
+    pages = [_page_node(page.url, 0, tree)]
+    report.full_tokens = estimate_tokens(a11y_tree_to_compact_json(pages[0]))
+    index = A11yIndex.from_tree(tree)
+    allow_clicks = allow_clicks or []
+    # clicks may change server state (delete, save, ...); only the login submit runs by default:
+    # from a password fill until the next navigation
+    login_submit = False
+
+    for n, line in enumerate(lines, 1):
+        if len(pages) >= max_pages:
+            report.stopped = f"page limit ({max_pages})"
+            break
+        actions = compile_step(line, RuleContext(index))
+        if actions is None:
+            report.stopped = f"step {n} (no rule matches {line!r})"
+            break
+        blocked = next((a for a in actions if isinstance(a, Click)
+                        and not login_submit and not _click_allowed(a.locator, allow_clicks)), None)
+        if blocked is not None:
+            target = blocked.locator.name or blocked.locator.value
+            report.stopped = f"step {n} (click {target!r} is not a login submit; see SPEC2IR_FLOW_ALLOW_CLICKS)"
+            break
+        url_before = page.url
+        moved = False
+        try:
+            for action in actions:
+                if isinstance(action, Goto) and action.url.rstrip("/") == page.url.rstrip("/"):
+                    continue  # the page the walk started on
+                await _perform(page, action, step_timeout_ms)
+                moved = moved or isinstance(action, (Goto, Click)) or (
+                    isinstance(action, WaitFor) and action.target == "url")
+            if moved:
+                await page.wait_for_timeout(settle_ms)
+                await page.wait_for_load_state(opts.wait_until, timeout=step_timeout_ms)
+        except Exception as exc:
+            report.stopped = f"step {n} ({type(exc).__name__}: {str(exc).splitlines()[0] if str(exc) else ''})"
+            break
+        report.executed += 1
+        if any(isinstance(a, Fill) and _is_password_fill(line, a) for a in actions):
+            login_submit = True
+        elif login_submit and (page.url != url_before or any(
+                isinstance(a, Goto) or (isinstance(a, WaitFor) and a.target == "url") for a in actions)):
+            login_submit = False
+        if not moved:
+            continue
+        current = shape_a11y_tree(await page_a11y_snapshot(page, opts.max_nodes), opts)
+        added, removed, _ = tree_delta(tree, current)
+        if added is None and not removed:
+            continue
+        node = _page_node(page.url, n, added)
+        node["delta"] = True
+        if removed:
+            node["removed"] = removed
+        whole = _page_node(page.url, n, current)
+        whole_tokens = estimate_tokens(a11y_tree_to_compact_json(whole))
+        if estimate_tokens(a11y_tree_to_compact_json(node)) >= whole_tokens:
+            node = whole  # mostly a new page: the delta would not be smaller
+        pages.append(node)
+        report.full_tokens += whole_tokens
+        tree = current
+        index = A11yIndex.from_tree(tree)
+
+    report.pages = len(pages)
+    report.tokens = estimate_tokens(a11y_tree_to_compact_json(pages))
+    return pages, report
+
+
+async def capture_flow(spec: SpecCase, opts: A11yCaptureOptions, pool: Optional[BrowserPool] = None,
+                       url: Optional[str] = None) -> Tuple[List[dict], FlowReport]:
+    """Snapshot every page reached by performing the spec's steps that rules can compile.
+
+    Starts at `url` (default: first URL in prepare) and performs prepare and
+    steps lines in order, each compiled by spec2ir.rules against the current
+    page (open, fill, click, wait for URL/text; ${VAR} fill values come from
+    the environment). Converting must not change the system under test, so
+    clicks only run from a password fill until the next navigation (the
+    login submit) or when their target's name matches
+    SPEC2IR_FLOW_ALLOW_CLICKS; any other click ends the walk. After a line
+    that navigates or clicks, the page is snapshotted again and kept as a
+    delta against the previous snapshot (delta=true), or whole when the
+    delta would not be smaller. The walk stops at the first line no rule
+    covers, a click it may not perform, a failed action or
+    SPEC2IR_FLOW_MAX_PAGES (default 5) pages. Returns a list of role "page"
+    nodes, to be sent via a11y_tree_to_compact_json.
+    """
+    url = url or extract_first_url(spec.prepare)
+    if not url:
+        raise RuntimeError("flow capture needs a URL in prepare (or pass url)")
+    max_pages = int(os.getenv("SPEC2IR_FLOW_MAX_PAGES", "5"))
+    step_timeout_ms = int(os.getenv("SPEC2IR_FLOW_STEP_TIMEOUT_MS", "10000"))
+    settle_ms = int(os.getenv("SPEC2IR_FLOW_SETTLE_MS", "300"))
+
+    async def walk(context: BrowserContext) -> Tuple[List[dict], FlowReport]:
+        profile = get_profile(opts.net_profile)
+        net_stats = NetworkStats()
+        if profile is not None:
+            await apply_profile(context, profile, net_stats, first_party_urls=[url])
+        result = await _walk(context, spec, url, opts, max_pages, step_timeout_ms, settle_ms, _allowed_clicks())
+        if profile is not None:
+            print(net_stats, file=sys.stderr)
+        print(result[1], file=sys.stderr)
+        return result
+
+    if pool is not None:
+        async with pool.context(ignore_https_errors=opts.ignore_https_errors) as context:
+            return await walk(context)
+    async with BrowserPool(size=1) as own_pool:
+        async with own_pool.context(ignore_https_errors=opts.ignore_https_errors) as context:
+            return await walk(context)
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+# cache busters and request timestamps that differ between recording and replay
+DEFAULT_IGNORED_PARAMS = ("_", "_t", "t", "ts", "timestamp", "nonce", "cb", "rnd", "random")
+# Unix time in seconds or milliseconds, anywhere in the path or a query value
+_TIMESTAMP_RE = re.compile(r"(?<!\d)1\d{9}(?:\d{3})?(?!\d)")
+# the body is replayed decoded, so the original transfer framing no longer applies
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in _TRUE_VALUES
+
+
+def har_file_name(ir_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", ir_id) + ".har"
+
+
+def record_context_kwargs(path: str) -> Dict[str, Any]:
+    """new_context() options that make Playwright write the context's traffic to `path` when it closes."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return {"record_har_path": path, "record_har_content": "embed", "record_har_mode": "full"}
+
+
+@dataclass
+class HarMatchOptions:
+    """How a live request is matched to a recorded one.
+
+    Defaults come from env:
+      - SPEC2IR_HAR_IGNORE_QUERY=1: compare URLs without their query string
+      - SPEC2IR_HAR_IGNORE_PARAMS: comma-separated query parameters to drop
+        (default: common cache busters such as _, t, ts, timestamp)
+      - SPEC2IR_HAR_IGNORE_TIMESTAMPS=0: keep Unix timestamps in paths/values
+      - SPEC2IR_HAR_MATCH_BODY=1: POST bodies must match as well
+      - SPEC2IR_HAR_NOT_FOUND=fallback: send unmatched requests to the network
+        instead of aborting them
+    """
+    ignore_query: bool = False
+    ignore_params: Tuple[str, ...] = DEFAULT_IGNORED_PARAMS
+    ignore_timestamps: bool = True
+    match_body: bool = False
+    not_found: str = "abort"  # abort|fallback
+
+    @classmethod
+    def from_env(cls, **overrides) -> "HarMatchOptions":
+        params = os.getenv("SPEC2IR_HAR_IGNORE_PARAMS")
+        options = cls(
+            ignore_query=_env_flag("SPEC2IR_HAR_IGNORE_QUERY", False),
+            ignore_params=tuple(p.strip() for p in params.split(",") if p.strip()) if params is not None
+            else DEFAULT_IGNORED_PARAMS,
+            ignore_timestamps=_env_flag("SPEC2IR_HAR_IGNORE_TIMESTAMPS", True),
+            match_body=_env_flag("SPEC2IR_HAR_MATCH_BODY", False),
+            not_found=os.getenv("SPEC2IR_HAR_NOT_FOUND", "abort"),
+        )
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(options, name, value)
+        if options.not_found not in ("abort", "fallback"):
+            raise ValueError(f"Unknown HAR not_found mode: {options.not_found} (abort|fallback)")
+        return options
+
+    def key(self, method: str, url: str, body: Optional[str] = None) -> str:
+        parts = urlsplit(url)
+        query = ""
+        if not self.ignore_query:
+            ignored = set(self.ignore_params)
+            pairs = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in ignored)
+            query = urlencode(pairs)
+        normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+        if self.match_body and body:
+            normalized += f"\0{body}"
+        if self.ignore_timestamps:
+            normalized = _TIMESTAMP_RE.sub("<ts>", normalized)
+        return f"{method.upper()} {normalized}"
+
+
+@dataclass
+class HarStats:
+    requests: int = 0
+    served: int = 0
+    missed: Counter = field(default_factory=Counter)  # resource type -> unmatched requests
+
+    def merge(self, other: "HarStats") -> None:
+        self.requests += other.requests
+        self.served += other.served
+        self.missed.update(other.missed)
+
+    def __str__(self) -> str:
+        missed = sum(self.missed.values())
+        by_type = ", ".join(f"{t}={n}" for t, n in self.missed.most_common())
+        return (
+            f"[HAR] replayed {self.served}/{self.requests} requests, {missed} not in the recording"
+            f"{': ' + by_type if by_type else ''}"
+        )
+
+
+@dataclass
+class _Recorded:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _response(entry: dict) -> _Recorded:
+    response = entry["response"]
+    headers: Dict[str, List[str]] = {}
+    for h in response.get("headers", []):
+        name = h["name"].lower()
+        if name not in _DROP_HEADERS and not name.startswith(":"):
+            headers.setdefault(name, []).append(h["value"])
+    content = response.get("content") or {}
+    text = content.get("text") or ""
+    body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+    # Playwright joins repeated headers with newlines (set-cookie) like response.all_headers()
+    joined = {k: ("\n" if k == "set-cookie" else ", ").join(v) for k, v in headers.items()}
+    return _Recorded(response["status"], joined, body)
+
+
+class HarReplayer:
+    """Serves requests from a recorded HAR file through a context-wide route.
+
+    Requests are matched by method and normalized URL (see HarMatchOptions).
+    A request recorded several times is answered with the recordings in
+    order, separately for each context, and the last one repeats after that.
+    """
+
+    def __init__(self, path: str, options: Optional[HarMatchOptions] = None) -> None:
+        self.path = path
+        self.options = options or HarMatchOptions.from_env()
+        self._entries: Dict[str, List[dict]] = {}
+        self._decoded: Dict[int, _Recorded] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            log = json.load(f).get("log", {})
+        for entry in log.get("entries", []):
+            status = (entry.get("response") or {}).get("status", 0)
+            if status <= 0:
+                continue  # aborted or failed while recording
+            request = entry["request"]
+            body = (request.get("postData") or {}).get("text")
+            self._entries.setdefault(self.options.key(request["method"], request["url"], body), []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    async def attach(self, context, stats: Optional[HarStats] = None) -> None:
+        cursors: Counter = Counter()
+
+        async def handle(route, request) -> None:
+            if stats is not None:
+                stats.requests += 1
+            body = request.post_data if self.options.match_body else None
+            key = self.options.key(request.method, request.url, body)
+            entries = self._entries.get(key)
+            if not entries:
+                if stats is not None:
+                    stats.missed[request.resource_type] += 1
+                if self.options.not_found == "fallback":
+                    await route.fallback()
+                else:
+                    await route.abort("internetdisconnected")
+                return
+            entry = entries[min(cursors[key], len(entries) - 1)]
+            cursors[key] += 1
+            recorded = self._decoded.get(id(entry))
+            if recorded is None:
+                recorded = self._decoded[id(entry)] = _response(entry)
+            if stats is not None:
+                stats.served += 1
+            await route.fulfill(status=recorded.status, headers=recorded.headers, body=recorded.body)
+
+        await context.route("**/*", handle)
+
+
+@dataclass
+class HarMode:
+    """Record each IR's traffic to, or replay it from, `<directory>/<ir id>.har`."""
+    mode: str  # record|replay
+    directory: str
+    options: HarMatchOptions = field(default_factory=HarMatchOptions.from_env)
+    stats: HarStats = field(default_factory=HarStats)
+
+    def __post_init__(self) -> None:
+        if self.mode not in ("record", "replay"):
+            raise ValueError(f"Unknown HAR mode: {self.mode} (record|replay)")
+
+    def path_for(self, ir_id: str) -> str:
+        return os.path.join(self.directory, har_file_name(ir_id))
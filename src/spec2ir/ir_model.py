@@ -17,21 +17,25 @@ class Goto(BaseModel):
     op: Literal["goto"] = "goto"
     url: str
     wait_until: Literal["domcontentloaded", "load", "networkidle"] = "domcontentloaded"
+    step: Optional[str] = None  # hash of the spec line this came from (spec_model.step_hashes), if known
 
 class WaitFor(BaseModel):
     op: Literal["wait_for"] = "wait_for"
     target: Literal["url", "selector", "text"] = "url"
     value: str
     timeout_ms: int = 15000
+    step: Optional[str] = None
 
 class Fill(BaseModel):
     op: Literal["fill"] = "fill"
     locator: Locator
     value: str  # should be ${VAR} not raw secrets
+    step: Optional[str] = None
 
 class Click(BaseModel):
     op: Literal["click"] = "click"
     locator: Locator
+    step: Optional[str] = None
 
 Action = Union[Goto, WaitFor, Fill, Click]
 
@@ -40,10 +44,12 @@ Action = Union[Goto, WaitFor, Fill, Click]
 class ExpectURL(BaseModel):
     kind: Literal["url_is"] = "url_is"
     value: str  # usually path like /statistics
+    step: Optional[str] = None  # hash of spec.expect
 
 class ExpectVisibleText(BaseModel):
     kind: Literal["visible_text"] = "visible_text"
     value: str
+    step: Optional[str] = None
 
 Expectation = Union[ExpectURL, ExpectVisibleText]
 
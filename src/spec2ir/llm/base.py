@@ -1,5 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 
 
 class LLMProvider(ABC):
@@ -7,3 +8,28 @@ class LLMProvider(ABC):
     async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
         """Return a JSON string (not markdown) that conforms to schema."""
         raise NotImplementedError
+
+    @property
+    def supports_streaming(self) -> bool:
+        return False
+
+    async def stream_json(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Yield the completion in pieces; closing the iterator early cancels the request.
+
+        Providers without native streaming yield the whole completion at once.
+        """
+        yield await self.complete_json(system_prompt, user_prompt)
+
+    def cache_identity(self) -> dict:
+        """Fields that change the completion for identical prompts (used as cache key)."""
+        return {
+            "provider": type(self).__name__,
+            "model": getattr(self, "model", None),
+            "temperature": getattr(self, "temperature", None),
+        }
+
+    def discard(self, system_prompt: str, user_prompt: str) -> None:
+        """Forget a completion whose output failed validation (no-op unless cached)."""
+
+    async def aclose(self) -> None:
+        """Release long-lived resources such as pooled HTTP connections."""
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from spec2ir.llm.base import LLMProvider
+
+
+def _default_cache_dir() -> str:
+    root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "spec2ir", "llm")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    def __str__(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"[CACHE] hits={self.hits} misses={self.misses} hit_rate={rate:.0f}% "
+            f"writes={self.writes} evicted={self.evictions}"
+        )
+
+
+class CachedProvider(LLMProvider):
+    """Content-addressed on-disk cache in front of any LLMProvider.
+
+    The key is a sha256 over the wrapped provider's cache_identity() plus the
+    system and user prompts, so any change to spec, a11y tree, model or
+    temperature is a miss. Configure via env:
+      - SPEC2IR_CACHE_DIR (default: $XDG_CACHE_HOME/spec2ir/llm)
+      - SPEC2IR_CACHE_TTL_SEC (default: 7 days; entries older than this are ignored and evicted)
+      - SPEC2IR_CACHE_MAX_MB (default: 256; least recently used entries are evicted beyond this)
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        cache_dir: Optional[str] = None,
+        *,
+        refresh: bool = False,
+        max_age_sec: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self.inner = inner
+        self.cache_dir = cache_dir or os.getenv("SPEC2IR_CACHE_DIR") or _default_cache_dir()
+        self.refresh = refresh
+        self.max_age_sec = max_age_sec if max_age_sec is not None else float(
+            os.getenv("SPEC2IR_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.getenv("SPEC2IR_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.stats = CacheStats()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.evict()
+
+    def cache_identity(self) -> dict:
+        return self.inner.cache_identity()
+
+    def cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        material = json.dumps(
+            [self.inner.cache_identity(), system_prompt, user_prompt],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+            now = time.time()
+            # mtime is the write time and decides expiry here and in evict(); hits only move atime
+            if now - st.st_mtime > self.max_age_sec:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path, (now, st.st_mtime))  # set explicitly, so noatime/relatime mounts still get LRU order
+        except OSError:
+            pass
+        return entry.get("content")
+
+    def _write(self, key: str, content: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "identity": self.inner.cache_identity(), "content": content},
+                      f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+        self.stats.writes += 1
+
+    def evict(self) -> None:
+        """Drop entries written more than max_age_sec ago, then the least recently read ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age_sec:
+                    self._remove(path)
+                    continue
+                if not name.endswith(".json"):
+                    continue
+                entries.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+            self.stats.evictions += 1
+        except OSError:
+            pass
+
+    def discard(self, system_prompt: str, user_prompt: str) -> None:
+        path = self._path(self.cache_key(system_prompt, user_prompt))
+        if os.path.exists(path):
+            self._remove(path)
+        self.inner.discard(system_prompt, user_prompt)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.inner.supports_streaming
+
+    async def stream_json(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        key = self.cache_key(system_prompt, user_prompt)
+        if not self.refresh:
+            cached = self._read(key)
+            if cached is not None:
+                self.stats.hits += 1
+                yield cached
+                return
+        self.stats.misses += 1
+        chunks: list[str] = []
+        async for piece in self.inner.stream_json(system_prompt, user_prompt):
+            chunks.append(piece)
+            yield piece
+        # only reached when the stream ran to completion (not cancelled by the consumer)
+        self._write(key, "".join(chunks))
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        key = self.cache_key(system_prompt, user_prompt)
+        if not self.refresh:
+            cached = self._read(key)
+            if cached is not None:
+                self.stats.hits += 1
+                return cached
+        self.stats.misses += 1
+        content = await self.inner.complete_json(system_prompt, user_prompt)
+        self._write(key, content)
+        return content
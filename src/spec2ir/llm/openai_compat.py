@@ -1,13 +1,22 @@
 from __future__ import annotations
+import asyncio
+import email.utils
+import importlib.util
 import json
 import os
+import random
 import sys
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, List
+
 import httpx
 from spec2ir.llm.base import LLMProvider
-
+from spec2ir.llm.ratelimit import RateLimiter
 
 
 _TRUE_VALUES = {"1", "true", "yes", "on"}
+_RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
 
 
 def _env_flag(name: str, default: bool = False) -> bool:
@@ -17,75 +26,234 @@ def _env_flag(name: str, default: bool = False) -> bool:
     return raw.strip().lower() in _TRUE_VALUES
 
 
+def _estimate_tokens(*texts: str) -> int:
+    # ~4 chars/token for latin text, CJK is closer to 1-2; err on the high side.
+    return sum(max(len(t) // 3, 1) for t in texts)
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    raw = response.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
 class OpenAICompatProvider(LLMProvider):
     """OpenAI-compatible Chat Completions client.
     Works with OpenAI, Azure OpenAI (if compatible gateway), or internal gateways exposing /v1/chat/completions.
-    Configure via env:
+    Configure via constructor arguments (base_url, api_key, model, temperature) or env:
       - LLM_BASE_URL (default: https://api.openai.com/v1)
       - LLM_API_KEY (required)
       - LLM_MODEL (default: gpt-4.1-mini; change to your gateway model)
+      - LLM_TEMPERATURE (default: 0)
       - LLM_TIMEOUT_SEC (default: 60)
       - LLM_STREAM (default: disabled; set to 1/true to stream tokens to stdout)
+      - LLM_HTTP2 (default: disabled; needs the `h2` package, falls back to HTTP/1.1)
+      - LLM_MAX_CONNECTIONS (default: 20) keep-alive pool size shared by all calls
+      - LLM_MAX_RETRIES (default: 4) retries on 429/5xx/transport errors
+      - LLM_BACKOFF_BASE_SEC / LLM_BACKOFF_MAX_SEC (default: 0.5 / 30) jittered exponential backoff;
+        the max also caps waits requested by Retry-After
+      - LLM_RPM / LLM_TPM (default: 0 = unlimited) client-side requests/tokens per minute
     """
 
-    def __init__(self) -> None:
-        self.base_url = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1").rstrip("/")
-        self.api_key = os.getenv("LLM_API_KEY", "")
-        self.model = os.getenv("LLM_MODEL", "gpt-4.1-mini")
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, model: str | None = None,
+                 temperature: float | None = None) -> None:
+        self.base_url = (base_url or os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+        self.api_key = api_key or os.getenv("LLM_API_KEY", "")
+        self.model = model or os.getenv("LLM_MODEL", "gpt-4.1-mini")
+        self.temperature = float(temperature if temperature is not None else os.getenv("LLM_TEMPERATURE", "0"))
         self.timeout = float(os.getenv("LLM_TIMEOUT_SEC", "60"))
         self.stream = _env_flag("LLM_STREAM", False)
+        self.http2 = _env_flag("LLM_HTTP2", False) and importlib.util.find_spec("h2") is not None
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.backoff_base = float(os.getenv("LLM_BACKOFF_BASE_SEC", "0.5"))
+        self.backoff_max = float(os.getenv("LLM_BACKOFF_MAX_SEC", "30"))
+        self.rate_limiter = RateLimiter(float(os.getenv("LLM_RPM", "0")), float(os.getenv("LLM_TPM", "0")))
+        self._client: httpx.AsyncClient | None = None
+        # prompt-cache effectiveness, from the gateway's usage report and stream timing
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.first_token_sec: Deque[float] = deque(maxlen=200)
 
         if not self.api_key:
             raise RuntimeError("LLM_API_KEY is required for OpenAICompatProvider")
 
-    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
-        url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+    def cache_identity(self) -> dict:
+        identity = super().cache_identity()
+        identity["base_url"] = self.base_url
+        return identity
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)  # a huge Retry-After must not stall a worker
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _build_payload(self, system_prompt: str, user_prompt: str, stream: bool) -> dict:
         payload = {
             "model": self.model,
-            "temperature": 0,
+            "temperature": self.temperature,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
         }
-        if self.stream:
+        if stream:
             payload["stream"] = True
+            if self.rate_limiter.enabled:
+                # final chunk carries usage, so the token reservation can be reconciled as in complete_json
+                payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    async def _wait_before_retry(self, attempt: int, response: httpx.Response | None) -> None:
+        delay = self._backoff(attempt, response)
+        print(f"[LLM] retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+              + (f" (HTTP {response.status_code})" if response is not None else ""), file=sys.stderr)
+        await asyncio.sleep(delay)
+
+    def _record_usage(self, usage: dict) -> None:
+        self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+        details = usage.get("prompt_tokens_details") or {}
+        self.cached_prompt_tokens += int(details.get("cached_tokens") or 0)
+
+    def stats_lines(self) -> List[str]:
+        lines = []
+        if self.prompt_tokens:
+            share = self.cached_prompt_tokens / self.prompt_tokens
+            lines.append(f"[LLM] {self.model}: {self.prompt_tokens} prompt tokens, "
+                         f"{self.cached_prompt_tokens} served from prefix cache ({share:.0%})")
+        if self.first_token_sec:
+            ordered = sorted(self.first_token_sec)
+            lines.append(f"[LLM] {self.model}: time to first token p50 {ordered[len(ordered) // 2]:.2f}s "
+                         f"over {len(ordered)} streams")
+        return lines
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.stream
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        if self.stream:
+            return "".join([piece async for piece in self.stream_json(system_prompt, user_prompt)])
+
+        url = f"{self.base_url}/chat/completions"
+        payload = self._build_payload(system_prompt, user_prompt, stream=False)
+        estimated = _estimate_tokens(system_prompt, user_prompt)
+        client = self._get_client()
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated)
+            response: httpx.Response | None = None
+            try:
+                response = await client.post(url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+                usage = data.get("usage") or {}
+                self._record_usage(usage)
+                if usage.get("total_tokens"):
+                    self.rate_limiter.adjust(int(usage["total_tokens"]) - estimated)
+                return data["choices"][0]["message"]["content"]
+            except httpx.HTTPStatusError as exc:
+                response = exc.response
+                if response.status_code not in _RETRY_STATUS or attempt >= self.max_retries:
+                    raise
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            await self._wait_before_retry(attempt, response)
+            attempt += 1
+
+    async def stream_json(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream content deltas (echoed to stdout); retries only until the first delta arrives."""
+        url = f"{self.base_url}/chat/completions"
+        payload = self._build_payload(system_prompt, user_prompt, stream=True)
+        estimated = _estimate_tokens(system_prompt, user_prompt)
+        client = self._get_client()
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated)
+            response: httpx.Response | None = None
+            yielded = False
+            try:
+                async for piece in self._stream_completion(client, url, payload, estimated):
+                    yielded = True
+                    yield piece
+                return
+            except httpx.HTTPStatusError as exc:
+                response = exc.response
+                if yielded or response.status_code not in _RETRY_STATUS or attempt >= self.max_retries:
+                    raise
+            except httpx.TransportError:
+                if yielded or attempt >= self.max_retries:
+                    raise
+            await self._wait_before_retry(attempt, response)
+            attempt += 1
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            if self.stream:
-                return await self._stream_completion(client, url, headers, payload)
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            return data["choices"][0]["message"]["content"]
-
-    async def _stream_completion(self, client, url: str, headers: dict, payload: dict) -> str:
-        chunks: list[str] = []
-        async with client.stream("POST", url, headers=headers, json=payload) as response:
-            response.raise_for_status()
-            async for line in response.aiter_lines():
-                if not line or not line.startswith("data: "):
-                    continue
-                data_str = line[len("data: "):].strip()
-                if not data_str:
-                    continue
-                if data_str == "[DONE]":
-                    break
-                try:
-                    payload_json = json.loads(data_str)
-                except json.JSONDecodeError:
-                    continue
-                delta = payload_json.get("choices", [{}])[0].get("delta", {})
-                content = delta.get("content")
-                if content:
-                    sys.stdout.write(content)
-                    sys.stdout.flush()
-                    chunks.append(content)
-        if chunks:
-            sys.stdout.write("\n")
-            sys.stdout.flush()
-        return ''.join(chunks)
+    async def _stream_completion(self, client, url: str, payload: dict, estimated: int = 0) -> AsyncIterator[str]:
+        received = False
+        started = time.perf_counter()
+        try:
+            async with client.stream("POST", url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line or not line.startswith("data: "):
+                        continue
+                    data_str = line[len("data: "):].strip()
+                    if not data_str:
+                        continue
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        payload_json = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+                    usage = payload_json.get("usage")
+                    if usage:
+                        self._record_usage(usage)
+                        if usage.get("total_tokens"):
+                            self.rate_limiter.adjust(int(usage["total_tokens"]) - estimated)
+                    delta = (payload_json.get("choices") or [{}])[0].get("delta", {})
+                    content = delta.get("content")
+                    if content:
+                        if not received:
+                            self.first_token_sec.append(time.perf_counter() - started)
+                        sys.stdout.write(content)
+                        sys.stdout.flush()
+                        received = True
+                        yield content
+        finally:
+            if received:
+                sys.stdout.write("\n")
+                sys.stdout.flush()
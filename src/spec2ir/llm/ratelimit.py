@@ -0,0 +1,71 @@
+from __future__ import annotations
+import asyncio
+import time
+
+
+class _Bucket:
+    """Token bucket refilled continuously at `per_minute / 60` units per second."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)  # an oversized request must still be able to run
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Remove `amount` (may go negative as debt); a negative amount refunds, up to capacity."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """Client-side requests-per-minute and tokens-per-minute limiter (0 disables a limit).
+
+    Callers reserve an estimated token count up front and correct it with
+    `adjust()` once the real usage is known; overspend becomes debt that
+    delays later requests instead of being rejected by the gateway.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> None:
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        async with self._lock:
+            while True:
+                wait = 0.0
+                if self._requests is not None:
+                    wait = max(wait, self._requests.wait_time(1))
+                if self._tokens is not None and tokens:
+                    wait = max(wait, self._tokens.wait_time(tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None and tokens:
+                self._tokens.take(tokens)
+
+    def adjust(self, tokens: int) -> None:
+        """Charge (positive) or refund (negative) tokens after the actual usage is known."""
+        if self._tokens is not None and tokens:
+            self._tokens.take(tokens)
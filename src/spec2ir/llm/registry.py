@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import statistics
+import sys
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+import yaml
+
+from spec2ir.llm.base import LLMProvider
+
+
+def _openai_compat(**options) -> LLMProvider:
+    from spec2ir.llm.openai_compat import OpenAICompatProvider
+    return OpenAICompatProvider(**options)
+
+
+PROVIDERS: Dict[str, Callable[..., LLMProvider]] = {"openai_compat": _openai_compat}
+
+
+def register_provider(name: str, factory: Callable[..., LLMProvider]) -> None:
+    PROVIDERS[name] = factory
+
+
+def create_provider(name: str, **options) -> LLMProvider:
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown provider: {name} (known: {', '.join(sorted(PROVIDERS))})")
+    return PROVIDERS[name](**options)
+
+
+_MIN_SAMPLES = 5
+_TRACKED_PROMPTS = 1024  # prompts remembered for discard() and rerouting
+
+
+@dataclass
+class ProviderStats:
+    name: str
+    calls: int = 0
+    errors: int = 0
+    invalid: int = 0
+    wins: int = 0
+    cancelled: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200))  # completed calls only
+    outcomes: Deque[bool] = field(default_factory=lambda: deque(maxlen=50))  # recent ok/failed
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < _MIN_SAMPLES:
+            return None
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(q * 100) - 1]
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return len(self.outcomes) < _MIN_SAMPLES or self.error_rate < 0.5
+
+    def record(self, ok: bool, latency: Optional[float] = None) -> None:
+        self.calls += 1
+        self.outcomes.append(ok)
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def __str__(self) -> str:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        timing = f"p50 {p50:.2f}s p95 {p95:.2f}s" if p50 is not None else f"{len(self.latencies)} samples"
+        return (
+            f"[LLM] {self.name}: {self.calls} calls, {self.wins} wins, {timing}, "
+            f"{self.errors} errors, {self.invalid} invalid, {self.cancelled} hedges cancelled"
+        )
+
+
+@dataclass
+class _Member:
+    name: str
+    provider: LLMProvider
+    stats: ProviderStats
+
+
+class MultiProvider(LLMProvider):
+    """Routes each completion over several providers.
+
+    mode="fallback": providers are tried one after another (configured order,
+    unhealthy ones last) until one returns output that passes `validate`.
+    mode="hedge": the best-ranked provider (by recent p50 latency, unhealthy
+    ones last) starts; if it has not answered by its p95 latency (or
+    `hedge_delay_sec` until enough samples exist) the next one is started as
+    well, and the first valid answer wins while the rest are cancelled. A
+    failed answer starts the next provider immediately.
+
+    `validate` raises ValueError for unusable output (e.g. converter.validate_completion).
+    Output later rejected via discard() counts against the provider that
+    produced it, and the same prompt is then routed elsewhere first.
+    """
+
+    def __init__(self, members: Dict[str, LLMProvider], mode: str = "fallback",
+                 validate: Optional[Callable[[str], Any]] = None, hedge_delay_sec: float = 5.0) -> None:
+        if mode not in ("fallback", "hedge"):
+            raise ValueError(f"Unknown routing mode: {mode}")
+        if not members:
+            raise ValueError("MultiProvider needs at least one provider")
+        self.mode = mode
+        self.validate = validate
+        self.hedge_delay_sec = hedge_delay_sec
+        self.members = [_Member(name, p, ProviderStats(name)) for name, p in members.items()]
+        self.hedges = 0
+        self._answered_by: "OrderedDict[str, str]" = OrderedDict()
+        self._rejected: "OrderedDict[str, Set[str]]" = OrderedDict()
+
+    @staticmethod
+    def _key(system_prompt: str, user_prompt: str) -> str:
+        return hashlib.sha256(f"{system_prompt}\0{user_prompt}".encode("utf-8")).hexdigest()
+
+    def cache_identity(self) -> dict:
+        return {
+            "provider": type(self).__name__,
+            "mode": self.mode,
+            "members": [m.provider.cache_identity() for m in self.members],
+        }
+
+    def _ranked(self, key: str) -> List[_Member]:
+        rejected = self._rejected.get(key, set())
+        if self.mode == "hedge":
+            def expected(m: _Member) -> float:
+                p50 = m.stats.quantile(0.5)
+                return p50 if p50 is not None else self.hedge_delay_sec
+            order = sorted(self.members, key=lambda m: (not m.stats.healthy, expected(m)))
+        else:
+            order = sorted(self.members, key=lambda m: not m.stats.healthy)
+        return sorted(order, key=lambda m: m.name in rejected)
+
+    def _hedge_after(self, member: _Member) -> float:
+        p95 = member.stats.quantile(0.95)
+        return p95 if p95 is not None else self.hedge_delay_sec
+
+    async def _attempt(self, member: _Member, system_prompt: str, user_prompt: str) -> str:
+        started = time.perf_counter()
+        try:
+            text = await member.provider.complete_json(system_prompt, user_prompt)
+        except asyncio.CancelledError:
+            # lost a hedge race: the elapsed time is only a lower bound on its latency, and mixing it into
+            # `latencies` would pull a slow provider's p50 down, so only the cancellation is counted
+            member.stats.cancelled += 1
+            raise
+        except Exception:
+            member.stats.errors += 1
+            member.stats.record(False)
+            raise
+        latency = time.perf_counter() - started
+        if self.validate is not None:
+            try:
+                self.validate(text)
+            except ValueError:
+                member.stats.invalid += 1
+                member.stats.record(False, latency)
+                member.provider.discard(system_prompt, user_prompt)
+                raise
+        member.stats.record(True, latency)
+        return text
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key: str, value: Any) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > _TRACKED_PROMPTS:
+            entries.popitem(last=False)
+
+    def _won(self, member: _Member, key: str) -> None:
+        member.stats.wins += 1
+        self._remember(self._answered_by, key, member.name)
+
+    async def _fallback(self, order: List[_Member], key: str, system_prompt: str, user_prompt: str) -> str:
+        last_exc: Optional[BaseException] = None
+        for member in order:
+            try:
+                text = await self._attempt(member, system_prompt, user_prompt)
+            except Exception as exc:
+                last_exc = exc
+                print(f"[LLM] {member.name} failed ({type(exc).__name__}); falling back", file=sys.stderr)
+                continue
+            self._won(member, key)
+            return text
+        raise last_exc  # type: ignore[misc]
+
+    async def _hedge(self, order: List[_Member], key: str, system_prompt: str, user_prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Task, _Member] = {}
+        queue = list(order)
+        last_exc: Optional[BaseException] = None
+        hedge_at = 0.0
+
+        def launch() -> None:
+            nonlocal hedge_at
+            member = queue.pop(0)
+            pending[asyncio.create_task(self._attempt(member, system_prompt, user_prompt))] = member
+            hedge_at = loop.time() + self._hedge_after(member)
+
+        launch()
+        try:
+            while pending:
+                timeout = max(0.0, hedge_at - loop.time()) if queue else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    member = pending.pop(task)
+                    try:
+                        text = task.result()
+                    except Exception as exc:
+                        last_exc = exc
+                        continue
+                    self._won(member, key)
+                    return text
+                if queue:
+                    launch()  # something failed: don't wait for the deadline to try the next one
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise last_exc  # type: ignore[misc]
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        key = self._key(system_prompt, user_prompt)
+        order = self._ranked(key)
+        if self.mode == "hedge":
+            return await self._hedge(order, key, system_prompt, user_prompt)
+        return await self._fallback(order, key, system_prompt, user_prompt)
+
+    def discard(self, system_prompt: str, user_prompt: str) -> None:
+        key = self._key(system_prompt, user_prompt)
+        name = self._answered_by.pop(key, None)
+        for member in self.members:
+            if member.name == name:
+                member.stats.invalid += 1
+                member.stats.wins -= 1
+                member.stats.outcomes.append(False)
+                member.provider.discard(system_prompt, user_prompt)
+                self._remember(self._rejected, key, self._rejected.get(key, set()) | {name})
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(m.provider.aclose() for m in self.members))
+
+    def stats_lines(self) -> List[str]:
+        lines = [str(m.stats) for m in self.members]
+        for member in self.members:
+            lines += getattr(member.provider, "stats_lines", list)()
+        if self.mode == "hedge":
+            lines.append(f"[LLM] hedged requests: {self.hedges}")
+        return lines
+
+
+def load_multi_provider(path: str, validate: Optional[Callable[[str], Any]] = None) -> MultiProvider:
+    """Build a MultiProvider from YAML:
+
+        mode: hedge            # or fallback
+        hedge_delay_sec: 5     # hedge deadline until a provider has a p95
+        providers:
+          - name: gw-a
+            type: openai_compat
+            base_url: https://gw-a/v1
+            api_key_env: GW_A_KEY   # or api_key
+            model: gpt-4.1-mini
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    members: Dict[str, LLMProvider] = {}
+    for i, entry in enumerate(cfg.get("providers") or []):
+        options = dict(entry)
+        name = options.pop("name", f"provider{i + 1}")
+        kind = options.pop("type", "openai_compat")
+        key_env = options.pop("api_key_env", None)
+        if key_env:
+            options["api_key"] = os.getenv(key_env, "")
+        members[name] = create_provider(kind, **options)
+    return MultiProvider(members, cfg.get("mode", "fallback"), validate,
+                         float(cfg.get("hedge_delay_sec", os.getenv("SPEC2IR_HEDGE_DELAY_SEC", "5"))))
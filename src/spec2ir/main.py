@@ -1,8 +1,7 @@
 from __future__ import annotations
 import argparse
-import asyncio
-import yaml
-from pydantic import TypeAdapter
+import os
+import sys
 
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -24,59 +23,196 @@ def _load_env():
     else:
         load_dotenv()
 
-from spec2ir.spec_model import SpecCase
-from spec2ir.converter import spec_to_ir
-from spec2ir.ui_context import (
-    extract_first_url,
-    capture_a11y_tree,
-    a11y_tree_to_compact_json,
-    A11yCaptureOptions,
-)
+# Heavy modules (pydantic models, httpx, Playwright) are imported inside the code
+# paths that need them so `--help` and argument errors stay fast.
 
 
-def _get_llm(provider: str):
-    if provider == "openai_compat":
-        from spec2ir.llm.openai_compat import OpenAICompatProvider
-        return OpenAICompatProvider()
-    raise ValueError(f"Unknown provider: {provider}")
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "off")
 
 
-async def _run(spec_path: str, provider: str, out_path: str | None, capture_a11y: bool, a11y_url: str | None):
-    with open(spec_path, "r", encoding="utf-8") as f:
-        spec_yaml = yaml.safe_load(f)
-    spec = TypeAdapter(SpecCase).validate_python(spec_yaml)
+def _get_llm(provider: str, use_cache: bool = True, refresh: bool = False):
+    """`provider` is a registered provider name or a YAML routing config (see spec2ir.llm.registry)."""
+    if provider.endswith((".yaml", ".yml")):
+        from spec2ir.converter import validate_completion
+        from spec2ir.llm.registry import load_multi_provider
+        llm = load_multi_provider(provider, validate=validate_completion)
+    else:
+        from spec2ir.llm.registry import create_provider
+        llm = create_provider(provider)
+    if use_cache:
+        from spec2ir.llm.cache import CachedProvider
+        llm = CachedProvider(llm, refresh=refresh)
+    return llm
+
+
+def _snapshot_cache():
+    from spec2ir.a11y_cache import A11ySnapshotCache
+    return A11ySnapshotCache()
+
+
+def _print_cache_stats(llm) -> None:
+    stats = getattr(llm, "stats", None)
+    if stats is not None:
+        print(stats)
+    stats_lines = getattr(getattr(llm, "inner", llm), "stats_lines", None)
+    lines = stats_lines() if stats_lines is not None else []
+    if lines:
+        print("\n".join(lines))
+
+
+async def _run(spec_path: str, provider: str, out_path: str | None, capture_a11y: bool, a11y_url: str | None,
+               use_cache: bool = True, refresh: bool = False, a11y_token_budget: int | None = None,
+               net_profile: str | None = None, use_rules: bool = True, incremental: bool = True,
+               a11y_cache: bool = True, capture_flow: bool = False):
+    import yaml
+    from spec2ir.batch import load_previous_ir, load_spec, write_ir
+    from spec2ir.converter import spec_to_ir
+    from spec2ir.rules import convert_spec
+
+    spec = load_spec(spec_path)
 
     a11y_json = None
     if capture_a11y:
+        from spec2ir.ui_context import (
+            A11yCaptureOptions,
+            a11y_tree_to_compact_json,
+            capture_a11y_tree,
+            extract_first_url,
+            spec_focus_text,
+        )
+
         url = a11y_url or extract_first_url(spec.prepare)
         if not url:
             raise RuntimeError("capture-a11y enabled but no URL found in prepare; pass --a11y-url")
-        tree = await capture_a11y_tree(url, A11yCaptureOptions(ignore_https_errors=True))
-        a11y_json = a11y_tree_to_compact_json(tree)
-
-    llm = _get_llm(provider)
-    ir = await spec_to_ir(spec, llm, a11y_tree_json=a11y_json)
+        opts = A11yCaptureOptions(ignore_https_errors=True, token_budget=a11y_token_budget,
+                                  focus_text=spec_focus_text(spec), net_profile=net_profile)
+        if capture_flow:
+            from spec2ir.flow_capture import capture_flow as walk_flow
+            pages, _ = await walk_flow(spec, opts, url=url)
+            a11y_json = a11y_tree_to_compact_json(pages)
+        else:
+            cache = _snapshot_cache() if a11y_cache else None
+            tree = await capture_a11y_tree(url, opts, cache=cache)
+            a11y_json = a11y_tree_to_compact_json(tree)
+            if cache is not None:
+                print(cache.stats, file=sys.stderr)
+
+    llm = _get_llm(provider, use_cache, refresh)
+    try:
+        previous = load_previous_ir(out_path) if out_path and incremental else None
+        if use_rules or previous is not None:
+            ir, _ = await convert_spec(spec, llm, a11y_tree_json=a11y_json, use_rules=use_rules, previous=previous)
+        else:
+            ir = await spec_to_ir(spec, llm, a11y_tree_json=a11y_json)
+    finally:
+        await llm.aclose()
 
     ir_dict = ir.model_dump()
     if out_path:
-        with open(out_path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(ir_dict, f, allow_unicode=True, sort_keys=False)
+        write_ir(ir_dict, out_path)
         print(f"[OK] IR written to {out_path}")
+        _print_cache_stats(llm)
     else:
         print(yaml.safe_dump(ir_dict, allow_unicode=True, sort_keys=False))
 
 
+async def _run_batch(pattern: str, provider: str, out_dir: str | None, concurrency: int,
+                     capture_a11y: bool, a11y_url: str | None,
+                     use_cache: bool = True, refresh: bool = False,
+                     a11y_token_budget: int | None = None, net_profile: str | None = None,
+                     use_rules: bool = True, incremental: bool = True, pack: int = 1,
+                     a11y_cache: bool = True, capture_flow: bool = False) -> bool:
+    from spec2ir.batch import collect_spec_paths, convert_batch
+
+    spec_paths = collect_spec_paths(pattern)
+    if not spec_paths:
+        raise RuntimeError(f"No spec files matched: {pattern}")
+
+    llm = _get_llm(provider, use_cache, refresh)
+    try:
+        result = await convert_batch(
+            spec_paths,
+            llm,
+            out_dir=out_dir,
+            concurrency=concurrency,
+            capture_a11y=capture_a11y,
+            a11y_url=a11y_url,
+            a11y_token_budget=a11y_token_budget,
+            net_profile=net_profile,
+            use_rules=use_rules,
+            incremental=incremental,
+            pack=pack,
+            a11y_cache=_snapshot_cache() if a11y_cache else None,
+            capture_flow=capture_flow,
+        )
+    finally:
+        await llm.aclose()
+    print(result.summary())
+    _print_cache_stats(llm)
+    return not result.failed
+
+
 def main():
     _load_env()
     p = argparse.ArgumentParser()
-    p.add_argument("--spec", required=True, help="Path to spec yaml")
-    p.add_argument("--provider", default="openai_compat", choices=["openai_compat"])
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--spec", help="Path to spec yaml")
+    src.add_argument("--batch", help="Directory or glob of spec yaml files to convert concurrently")
+    src.add_argument("--invalidate-a11y-cache", nargs="?", const="", metavar="URL",
+                     help="Drop cached a11y snapshots of URL (all snapshots without URL) and exit")
+    p.add_argument("--provider", default=os.getenv("SPEC2IR_PROVIDER", "openai_compat"),
+                   help="LLM provider name, or a YAML routing config for hedged/fallback providers")
     p.add_argument("--out", default=None, help="Output IR yaml path")
+    p.add_argument("--out-dir", default=None, help="Batch mode: directory for .ir.yaml outputs (default: next to each spec)")
+    p.add_argument("--concurrency", type=int, default=int(os.getenv("SPEC2IR_CONCURRENCY", "4")),
+                   help="Batch mode: max specs converted at once")
+    p.add_argument("--pack", type=int, default=int(os.getenv("SPEC2IR_PACK_SPECS", "1")),
+                   help="Batch mode: send up to N specs sharing an a11y capture in one LLM request")
     p.add_argument("--capture-a11y", action="store_true", help="Capture a11y tree with Playwright and feed it to LLM")
+    p.add_argument("--capture-flow", action="store_true",
+                   help="Like --capture-a11y, but follow the spec's steps and snapshot every page reached")
     p.add_argument("--a11y-url", default=None, help="Override URL for a11y capture if not found in prepare")
+    p.add_argument("--a11y-token-budget", type=int,
+                   default=int(os.getenv("SPEC2IR_A11Y_TOKEN_BUDGET", "0")) or None,
+                   help="Prune the a11y tree by relevance to the spec within this many tokens")
+    p.add_argument("--net-profile", default=None,
+                   help="Block requests during a11y capture: none|lean|minimal or a custom profile "
+                        "(default: SPEC2IR_NET_PROFILE)")
+    p.add_argument("--no-rules", action="store_true", default=not _env_flag("SPEC2IR_RULES", True),
+                   help="Send every step to the LLM instead of compiling boilerplate steps with rules")
+    p.add_argument("--no-incremental", action="store_true", default=not _env_flag("SPEC2IR_INCREMENTAL", True),
+                   help="Regenerate the whole IR even if an earlier IR at the output path has unchanged steps")
+    p.add_argument("--no-a11y-cache", action="store_true", default=not _env_flag("SPEC2IR_A11Y_CACHE", True),
+                   help="Capture the a11y tree every time instead of reusing snapshots of the same URL")
+    p.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM completion cache")
+    p.add_argument("--refresh", action="store_true", help="Ignore cached completions but store fresh ones")
     args = p.parse_args()
 
-    asyncio.run(_run(args.spec, args.provider, args.out, args.capture_a11y, args.a11y_url))
+    if args.invalidate_a11y_cache is not None:
+        removed = _snapshot_cache().invalidate(args.invalidate_a11y_cache or None)
+        print(f"[A11Y] removed {removed} cached snapshot(s)")
+        return
+
+    import asyncio
+
+    capture_a11y = args.capture_a11y or args.capture_flow
+    if args.batch:
+        ok = asyncio.run(_run_batch(args.batch, args.provider, args.out_dir, args.concurrency,
+                                    capture_a11y, args.a11y_url,
+                                    not args.no_cache, args.refresh, args.a11y_token_budget,
+                                    args.net_profile, not args.no_rules, not args.no_incremental, args.pack,
+                                    not args.no_a11y_cache, args.capture_flow))
+        if not ok:
+            sys.exit(1)
+        return
+
+    asyncio.run(_run(args.spec, args.provider, args.out, capture_a11y, args.a11y_url,
+                     not args.no_cache, args.refresh, args.a11y_token_budget, args.net_profile,
+                     not args.no_rules, not args.no_incremental, not args.no_a11y_cache, args.capture_flow))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import yaml
+
+
+_ANALYTICS_PATTERNS = [
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+    "*hm.baidu.com/*", "*cnzz.com/*", "*growingio.com/*", "*sentry.io/*",
+    "*/collect?*", "*/beacon*", "*/track?*",
+]
+
+@dataclass
+class NetworkProfile:
+    name: str
+    block_resource_types: List[str] = field(default_factory=list)
+    block_url_patterns: List[str] = field(default_factory=list)
+    block_third_party: bool = False
+
+    @property
+    def active(self) -> bool:
+        return bool(self.block_resource_types or self.block_url_patterns or self.block_third_party)
+
+    def should_block(self, url: str, resource_type: str, first_party_hosts: Iterable[str] = ()) -> bool:
+        if resource_type == "document":
+            return False
+        if resource_type in self.block_resource_types:
+            return True
+        if any(fnmatch.fnmatchcase(url, p) for p in self.block_url_patterns):
+            return True
+        if self.block_third_party and first_party_hosts:
+            host = urlparse(url).hostname or ""
+            return not any(host == h or host.endswith(f".{h}") for h in first_party_hosts)
+        return False
+
+
+PROFILES: Dict[str, NetworkProfile] = {
+    "none": NetworkProfile("none"),
+    "lean": NetworkProfile("lean", ["image", "media", "font"], list(_ANALYTICS_PATTERNS)),
+    "minimal": NetworkProfile("minimal", ["image", "media", "font", "stylesheet"],
+                              list(_ANALYTICS_PATTERNS), block_third_party=True),
+}
+
+
+_loaded_files: set = set()
+
+
+def load_profiles(path: str) -> None:
+    """Register profiles from YAML: {name: {block_resource_types: [...], block_url_patterns: [...], ...}}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    for name, cfg in data.items():
+        PROFILES[name] = NetworkProfile(name, **(cfg or {}))
+
+
+def get_profile(name: Optional[str]) -> Optional[NetworkProfile]:
+    """Resolve a profile by name (SPEC2IR_NET_PROFILE when None); extra profiles come from SPEC2IR_NET_PROFILES."""
+    extra = os.getenv("SPEC2IR_NET_PROFILES")
+    if extra and extra not in _loaded_files:
+        load_profiles(extra)
+        _loaded_files.add(extra)
+    name = name or os.getenv("SPEC2IR_NET_PROFILE")
+    if not name:
+        return None
+    if name not in PROFILES:
+        raise ValueError(f"Unknown network profile: {name} (known: {', '.join(sorted(PROFILES))})")
+    profile = PROFILES[name]
+    return profile if profile.active else None
+
+
+def profile_for_tags(tags: Iterable[str], default: Optional[NetworkProfile]) -> Optional[NetworkProfile]:
+    """An IR tag `net:<profile>` overrides the run-wide profile."""
+    for tag in tags:
+        if tag.startswith("net:"):
+            return get_profile(tag[len("net:"):])
+    return default
+
+
+@dataclass
+class NetworkStats:
+    requests: int = 0
+    blocked: Counter = field(default_factory=Counter)
+
+    @property
+    def blocked_requests(self) -> int:
+        return sum(self.blocked.values())
+
+    def merge(self, other: "NetworkStats") -> None:
+        self.requests += other.requests
+        self.blocked.update(other.blocked)
+
+    def __str__(self) -> str:
+        by_type = ", ".join(f"{t}={n}" for t, n in self.blocked.most_common())
+        return (
+            f"[NET] blocked {self.blocked_requests}/{self.requests} requests"
+            f"{': ' + by_type if by_type else ''}"
+        )
+
+
+async def apply_profile(context, profile: NetworkProfile, stats: Optional[NetworkStats] = None,
+                        first_party_urls: Iterable[str] = ()) -> None:
+    """Install a context-wide route that aborts requests the profile blocks."""
+    hosts = {urlparse(u).hostname for u in first_party_urls if urlparse(u).hostname}
+
+    async def handle(route, request) -> None:
+        if stats is not None:
+            stats.requests += 1
+        if profile.should_block(request.url, request.resource_type, hosts):
+            if stats is not None:
+                stats.blocked[request.resource_type] += 1
+            await route.abort("blockedbyclient")
+            return
+        await route.continue_()
+
+    await context.route("**/*", handle)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from spec2ir.converter import spec_to_ir, specs_to_irs
+from spec2ir.ir_model import TestIR
+from spec2ir.llm.base import LLMProvider
+from spec2ir.spec_model import SpecCase
+
+
+@dataclass
+class PackStats:
+    specs: int = 0
+    requests: int = 0
+    retried: int = 0  # specs whose part of a packed answer was unusable
+
+    def __str__(self) -> str:
+        return (
+            f"[PACK] {self.specs} specs in {self.requests} LLM requests, "
+            f"{self.retried} retried alone"
+        )
+
+
+_Waiter = Tuple[SpecCase, "asyncio.Future[TestIR]"]
+
+
+class SpecPacker:
+    """Packs concurrent conversions that share an a11y capture into one LLM request.
+
+    convert() calls arriving within `window_sec` of each other with the same
+    a11y tree (or none) are sent together via specs_to_irs, up to `max_specs`
+    per request; a full group is sent at once. Specs whose IR does not come
+    back valid are retried alone with spec_to_ir, so one bad spec never fails
+    its neighbours. With max_specs <= 1 every call is a plain spec_to_ir.
+    """
+
+    def __init__(self, llm: LLMProvider, max_specs: int, window_sec: Optional[float] = None) -> None:
+        self.llm = llm
+        self.max_specs = max_specs
+        self.window_sec = window_sec if window_sec is not None else float(
+            os.getenv("SPEC2IR_PACK_WINDOW_SEC", "0.2"))
+        self.stats = PackStats()
+        self._groups: Dict[Optional[str], List[_Waiter]] = {}
+        self._timers: Dict[Optional[str], asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def convert(self, spec: SpecCase, a11y_tree_json: Optional[str] = None) -> TestIR:
+        if self.max_specs <= 1:
+            self.stats.specs += 1
+            self.stats.requests += 1
+            return await spec_to_ir(spec, self.llm, a11y_tree_json=a11y_tree_json)
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[TestIR] = loop.create_future()
+        group = self._groups.setdefault(a11y_tree_json, [])
+        group.append((spec, future))
+        if len(group) >= self.max_specs:
+            self._flush(a11y_tree_json)
+        elif len(group) == 1:
+            self._timers[a11y_tree_json] = loop.call_later(self.window_sec, self._flush, a11y_tree_json)
+        return await future
+
+    def _flush(self, key: Optional[str]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, None)
+        if group:
+            task = asyncio.create_task(self._send(group, key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group: List[_Waiter], a11y_tree_json: Optional[str]) -> None:
+        specs = [spec for spec, _ in group]
+        self.stats.specs += len(specs)
+        irs: List[Optional[TestIR]] = [None] * len(specs)
+        if len(specs) > 1:
+            self.stats.requests += 1
+            try:
+                irs = await specs_to_irs(specs, self.llm, a11y_tree_json)
+            except Exception:
+                pass  # every spec is retried alone below and reports its own error
+
+        async def settle(waiter: _Waiter, ir: Optional[TestIR]) -> None:
+            spec, future = waiter
+            if ir is None:
+                if len(group) > 1:
+                    self.stats.retried += 1
+                self.stats.requests += 1
+                try:
+                    ir = await spec_to_ir(spec, self.llm, a11y_tree_json=a11y_tree_json)
+                except Exception as exc:
+                    if not future.done():
+                        future.set_exception(exc)
+                    return
+            if not future.done():
+                future.set_result(ir)
+
+        await asyncio.gather(*(settle(w, ir) for w, ir in zip(group, irs)))
@@ -1,5 +1,8 @@
 from __future__ import annotations
 from textwrap import dedent
+from typing import List, Tuple
+
+from spec2ir.a11y_budget import estimate_tokens
 from spec2ir.spec_model import SpecCase
 
 
@@ -13,35 +16,75 @@ Rules:
 - Prefer robust locators:
   1) testid (if mentioned) 2) role+name 3) label 4) text 5) css/xpath (last resort).
 - Use the provided accessibility tree (a11y tree) as primary evidence for role/name/label.
+- If A11Y_TREE_JSON is a list of role "page" nodes, they are the pages reached in order by following the spec
+  (after_step = spec line that led there). A page with delta=true lists only nodes added since the previous
+  page (unchanged nodes still apply) and, under removed, nodes that are gone; other pages are complete.
 - For URLs:
   - Put base URL into env_base_url
   - Use full URLs only for goto; expects/waits should prefer path/glob patterns (e.g. **/statistics*) so hash/query variations still match.
 - If Spec says "wait page loaded", use wait_until=domcontentloaded and/or a wait_for step.
+- Set each action's step to the number of the prepare/steps line it implements.
 """).strip()
 
+_INSTRUCTION = "Now produce ONLY a JSON object conforming to the schema."
 
-def build_user_prompt(spec: SpecCase, schema_json: str, a11y_tree_json: str | None) -> str:
-    a11y_part = ""
+
+def prompt_sections(spec: SpecCase, schema_json: str, a11y_tree_json: str | None) -> List[Tuple[str, str]]:
+    """(name, text) parts of the user prompt, most static first.
+
+    Prefix-caching gateways reuse the longest identical leading part of a
+    request, so the schema (identical for every spec) goes first, the a11y
+    tree (shared by specs of the same page) next and the spec itself last.
+    """
+    sections = [("schema", f"OUTPUT SCHEMA (JSON):\n{schema_json}")]
     if a11y_tree_json:
-        a11y_part = dedent(f"""
-        A11Y_TREE_JSON (from Playwright accessibility.snapshot):
-        {a11y_tree_json}
-        """).strip()
+        sections.append(("a11y", f"A11Y_TREE_JSON (from Playwright accessibility.snapshot):\n{a11y_tree_json}"))
+    sections.append(("spec", f"{_spec_text(spec, 'SPEC')}\n\n{_INSTRUCTION}"))
+    return sections
 
-    return dedent(f"""
-    SPEC:
-    id: {spec.id}
-    desc: {spec.desc}
-    prepare:
-    {chr(10).join([f"- {x}" for x in spec.prepare])}
-    steps:
-    {chr(10).join([f"- {s.action}" for s in spec.steps])}
-    expect: {spec.expect}
 
-    {a11y_part}
+def _spec_text(spec: SpecCase, heading: str) -> str:
+    prepare = "\n".join(f"{i}. {x}" for i, x in enumerate(spec.prepare, 1))
+    steps = "\n".join(f"{i}. {s.action}" for i, s in enumerate(spec.steps, len(spec.prepare) + 1))
+    return f"{heading}:\nid: {spec.id}\ndesc: {spec.desc}\nprepare:\n{prepare}\nsteps:\n{steps}\nexpect: {spec.expect}"
+
+
+def build_user_prompt(spec: SpecCase, schema_json: str, a11y_tree_json: str | None) -> str:
+    return "\n\n".join(text for _, text in prompt_sections(spec, schema_json, a11y_tree_json))
 
-    OUTPUT SCHEMA (JSON):
-    {schema_json}
 
-    Now produce ONLY a JSON object conforming to the schema.
+def build_packed_user_prompt(specs: list[SpecCase], schema_json: str, a11y_tree_json: str | None) -> str:
+    """One prompt for several specs of the same page; the answer is {"irs": [...]} in SPEC order.
+
+    Keeps the static-first layout of prompt_sections, so the schema and the
+    shared a11y tree are paid for once instead of once per spec.
+    """
+    parts = [text for name, text in prompt_sections(specs[0], schema_json, a11y_tree_json) if name != "spec"]
+    parts += [_spec_text(spec, f"SPEC {i}") for i, spec in enumerate(specs, 1)]
+    parts.append(
+        f'Now produce ONLY a JSON object {{"irs": [...]}} with exactly {len(specs)} entries: irs[0] is the '
+        "schema-conforming object for SPEC 1, irs[1] for SPEC 2, and so on. Number steps per spec."
+    )
+    return "\n\n".join(parts)
+
+
+def prompt_token_report(spec: SpecCase, schema_json: str, a11y_tree_json: str | None) -> str:
+    """One [PROMPT] line with estimated tokens per section and the cacheable static share."""
+    counts = [("system", estimate_tokens(SYSTEM_PROMPT))]
+    counts += [(name, estimate_tokens(text)) for name, text in prompt_sections(spec, schema_json, a11y_tree_json)]
+    total = sum(n for _, n in counts)
+    static = sum(n for name, n in counts if name in ("system", "schema"))
+    parts = ", ".join(f"{name} {n}" for name, n in counts)
+    return f"[PROMPT] {spec.id}: ~{total} tokens ({parts}); static prefix {static} ({static / total:.0%})"
+
+
+def build_locator_feedback(user_prompt: str, missing: list[str]) -> str:
+    """Re-ask prompt after locator validation: the original prompt plus the locators not found in the a11y tree."""
+    lines = "\n".join(f"- {m}" for m in missing)
+    return dedent(f"""
+    {user_prompt}
+
+    PREVIOUS ATTEMPT USED LOCATORS THAT DO NOT EXIST IN A11Y_TREE_JSON:
+    {lines}
+    Use only role/name, label and text values that appear in A11Y_TREE_JSON for these steps.
     """).strip()
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import yaml
+from pydantic import TypeAdapter
+
+from spec2ir.a11y_index import A11yIndex, is_flow_capture
+from spec2ir.converter import normalize_fill_value, spec_to_ir
+from spec2ir.ir_model import (
+    Action, Click, Expectation, ExpectURL, ExpectVisibleText, Fill, Goto, Locator, TestIR, WaitFor,
+)
+from spec2ir.llm.base import LLMProvider
+from spec2ir.packing import SpecPacker
+from spec2ir.spec_model import SpecCase, SpecStep, spec_lines, step_hashes
+
+
+@dataclass
+class RuleContext:
+    index: Optional[A11yIndex] = None
+
+
+BuildFn = Callable[[re.Match, RuleContext], Optional[List[Action]]]
+
+
+@dataclass
+class StepRule:
+    """`pattern` is matched against a stripped spec line; `build` may still decline by returning None."""
+    name: str
+    pattern: re.Pattern
+    build: BuildFn
+
+
+RULES: List[StepRule] = []
+EXPECT_RULES: List[Tuple[re.Pattern, Callable[[re.Match], Expectation]]] = []
+
+
+def step_rule(name: str, pattern: str):
+    """Register a step compiler; rules are tried in registration order."""
+    def register(fn: BuildFn) -> BuildFn:
+        RULES.append(StepRule(name, re.compile(pattern, re.IGNORECASE), fn))
+        return fn
+    return register
+
+
+_PASSWORD_RE = re.compile(r"密码|口令|password|passwd", re.IGNORECASE)
+_CLICK_ROLES = {
+    "按钮": ["button"], "button": ["button"],
+    "链接": ["link"], "link": ["link"],
+    "菜单": ["menuitem", "link"], "menu": ["menuitem", "link"],
+    "标签页": ["tab"], "tab": ["tab"],
+}
+_DEFAULT_CLICK_ROLES = ["button", "link", "menuitem", "tab", "checkbox", "radio"]
+
+
+@step_rule("open", r"^(?:打开|访问|进入|前往|open|visit|go to|navigate to)\s*(?P<url>https?://[^\s，,。]+)")
+def _open(m: re.Match, ctx: RuleContext) -> Optional[List[Action]]:
+    return [Goto(url=m.group("url").rstrip("，,。."), wait_until="domcontentloaded")]
+
+
+@step_rule("fill", r"^(?:输入|填写|填入|enter|type|fill(?: in)?)\s*(?P<field>[^\s:：=]+?)"
+                   r"(?:(?:\s+|\s*(?:为|[:：=])\s*)(?P<value>\S+))?$")
+def _fill(m: re.Match, ctx: RuleContext) -> Optional[List[Action]]:
+    label = ctx.index.resolve_label(m.group("field")) if ctx.index else None
+    if label is None:
+        return None
+    value = m.group("value")
+    if _PASSWORD_RE.search(m.group("field")):
+        value = "${ADMIN_PASS}"  # never copy a raw password from the spec
+    elif value is None:
+        return None
+    return [Fill(locator=Locator(kind="label", value=label), value=normalize_fill_value(value))]
+
+
+@step_rule("click", r"^(?:点击|单击|click(?: on)?|press)\s*[「『“\"']?(?P<target>.+?)[」』”\"']?\s*"
+                    r"(?P<kind>按钮|链接|菜单|标签页|button|link|menu|tab)?$")
+def _click(m: re.Match, ctx: RuleContext) -> Optional[List[Action]]:
+    if ctx.index is None:
+        return None
+    roles = _CLICK_ROLES.get((m.group("kind") or "").lower(), _DEFAULT_CLICK_ROLES)
+    found = ctx.index.resolve_named(m.group("target"), roles)
+    if found is None:
+        return None
+    return [Click(locator=Locator(kind="role", value=found[0], name=found[1]))]
+
+
+@step_rule("wait_url", r"^(?:等待)?(?:页面)?(?:跳转|重定向|进入)(?:到|至)\s*(?P<path>/[^\s，,。]*)$")
+def _wait_url(m: re.Match, ctx: RuleContext) -> Optional[List[Action]]:
+    return [WaitFor(target="url", value=f"**{m.group('path').rstrip('/') or '/'}*")]
+
+
+@step_rule("wait_text", r"^等待\s*[「“\"]?(?P<text>.+?)[」”\"]?\s*(?:出现|显示)$")
+def _wait_text(m: re.Match, ctx: RuleContext) -> Optional[List[Action]]:
+    return [WaitFor(target="text", value=m.group("text"))]
+
+
+EXPECT_RULES.extend([
+    (re.compile(r"^(?:页面)?(?:跳转|重定向|进入|到达)(?:到|至)?\s*(?P<path>/[^\s，,。]*)$"),
+     lambda m: ExpectURL(value=m.group("path"))),
+    (re.compile(r"^(?:页面)?(?:显示|出现|看到|包含)\s*[「“\"]?(?P<text>.+?)[」”\"]?$"),
+     lambda m: ExpectVisibleText(value=m.group("text"))),
+])
+# clause separators: punctuation, 并且/and, and a bare 并 only when another expectation verb follows it,
+# so text such as "显示并发数" stays one clause
+_EXPECT_SPLIT_RE = re.compile(r"[，,；;]|并且|\band\b|并(?=\s*(?:页面)?(?:显示|出现|看到|包含|跳转|重定向|进入|到达))")
+
+
+_ACTIONS_ADAPTER = TypeAdapter(List[Action])
+_loaded_files: set = set()
+
+
+def _format(template, groups: Dict[str, str]):
+    if isinstance(template, str):
+        return template.format(**groups)
+    if isinstance(template, dict):
+        return {k: _format(v, groups) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_format(v, groups) for v in template]
+    return template
+
+
+def load_rules(path: str) -> None:
+    """Prepend rules from YAML: [{name, pattern, actions: [action templates with {group} fields]}]."""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = yaml.safe_load(f) or []
+    for entry in reversed(entries):
+        templates = entry["actions"]
+
+        def build(m: re.Match, ctx: RuleContext, templates=templates) -> Optional[List[Action]]:
+            groups = {k: v or "" for k, v in m.groupdict().items()}
+            return _ACTIONS_ADAPTER.validate_python(_format(templates, groups))
+
+        RULES.insert(0, StepRule(entry.get("name", entry["pattern"]), re.compile(entry["pattern"], re.IGNORECASE),
+                                 build))
+
+
+def _ensure_custom_rules() -> None:
+    path = os.getenv("SPEC2IR_RULES_FILE")
+    if path and path not in _loaded_files:
+        load_rules(path)
+        _loaded_files.add(path)
+
+
+def compile_step(line: str, ctx: RuleContext) -> Optional[List[Action]]:
+    _ensure_custom_rules()
+    text = line.strip()
+    for rule in RULES:
+        m = rule.pattern.search(text)
+        if m is None:
+            continue
+        actions = rule.build(m, ctx)
+        if actions is not None:
+            return actions
+    return None
+
+
+def compile_expect(expect: str) -> Optional[List[Expectation]]:
+    """All clauses of `expect` must match an expectation rule, otherwise None."""
+    out: List[Expectation] = []
+    for clause in _EXPECT_SPLIT_RE.split(expect):
+        clause = clause.strip().rstrip("。.")
+        if not clause:
+            continue
+        for pattern, build in EXPECT_RULES:
+            m = pattern.match(clause)
+            if m:
+                out.append(build(m))
+                break
+        else:
+            return None
+    return out or None
+
+
+@dataclass
+class RuleReport:
+    steps: int = 0
+    compiled: int = 0
+    reused: int = 0
+    expect_compiled: bool = False
+    llm_calls: int = 0
+
+    @property
+    def ratio(self) -> float:
+        return (self.compiled + self.reused) / self.steps if self.steps else 1.0
+
+    def merge(self, other: "RuleReport") -> None:
+        self.steps += other.steps
+        self.compiled += other.compiled
+        self.reused += other.reused
+        self.llm_calls += other.llm_calls
+
+    def __str__(self) -> str:
+        return (
+            f"[RULES] {self.compiled + self.reused}/{self.steps} steps without LLM ({self.ratio * 100:.0f}%: "
+            f"{self.compiled} compiled by rules, {self.reused} reused from previous IR), LLM calls: {self.llm_calls}"
+        )
+
+
+@dataclass
+class _Range:
+    start: int
+    end: int  # exclusive
+    with_expect: bool = False
+    result: Optional[TestIR] = None
+    actions: List[Action] = field(default_factory=list)
+
+
+def _uncovered_ranges(compiled: List[Optional[List[Action]]]) -> List[_Range]:
+    ranges: List[_Range] = []
+    for i, actions in enumerate(compiled):
+        if actions is not None:
+            continue
+        if ranges and ranges[-1].end == i:
+            ranges[-1].end = i + 1
+        else:
+            ranges.append(_Range(i, i + 1))
+    return ranges
+
+
+def _same_url(url: str, other: str, base_url: str) -> bool:
+    return urljoin(base_url, url).rstrip("/") == urljoin(base_url, other).rstrip("/")
+
+
+def _navigated(compiled: List[Optional[List[Action]]]) -> bool:
+    gotos = 0
+    for actions in compiled:
+        for action in actions or ():
+            if isinstance(action, Goto):
+                gotos += 1
+            if gotos > 1 or (isinstance(action, WaitFor) and action.target == "url"):
+                return True
+    return False
+
+
+def _previous_steps(previous: Optional[TestIR]) -> Dict[str, List[Action]]:
+    """Previous actions grouped by step hash; unattributed ones go with the preceding step (or the first one)."""
+    groups: Dict[str, List[Action]] = {}
+    leading: List[Action] = []
+    last = None
+    for action in previous.actions if previous is not None else ():
+        step = action.step or last
+        if step is None:
+            leading.append(action)
+            continue
+        group = groups.setdefault(step, [])
+        if leading:
+            group.extend(leading)
+            leading = []
+        group.append(action)
+        last = step
+    return groups
+
+
+async def convert_spec(spec: SpecCase, llm: LLMProvider, a11y_tree_json: Optional[str] = None,
+                       index: Optional[A11yIndex] = None, *, use_rules: bool = True,
+                       previous: Optional[TestIR] = None,
+                       packer: Optional[SpecPacker] = None) -> Tuple[TestIR, RuleReport]:
+    """Build the IR line by line and send only lines nothing else covers to the LLM.
+
+    Each spec line (prepare + steps) is, in order of preference: reused from
+    `previous` when its step hash is unchanged, compiled by RULES, or left for
+    the LLM. Each contiguous run of LLM lines becomes one sub-spec for
+    spec_to_ir (earlier lines are passed as completed context; runs convert
+    concurrently, or through `packer` to share requests with other specs) and
+    its actions are spliced back in place. Extra rules can be loaded from
+    SPEC2IR_RULES_FILE.
+    """
+    if previous is not None and previous.id != spec.id:
+        previous = None
+    if index is None and a11y_tree_json and use_rules:
+        index = A11yIndex.from_json(a11y_tree_json)
+    ctx = RuleContext(index)
+    # a single-page index only describes the first page: after a compiled navigation, click/fill rules
+    # must not resolve against it (same gate as the tree offered to the LLM in convert_range)
+    off_page = ctx if index is None or index.pages > 1 else RuleContext()
+    lines = spec_lines(spec)
+    hashes = step_hashes(lines)
+    expect_hash = step_hashes([spec.expect])[0]
+    reusable = _previous_steps(previous)
+    report = RuleReport(steps=len(lines))
+
+    compiled: List[Optional[List[Action]]] = []
+    for line, h in zip(lines, hashes):
+        actions = [a.model_copy(update={"step": h}) for a in reusable[h]] if h in reusable else None
+        if actions is not None:
+            report.reused += 1
+        elif use_rules:
+            actions = compile_step(line, off_page if _navigated(compiled) else ctx)
+            if actions is not None:
+                actions = [a.model_copy(update={"step": h}) for a in actions]
+                report.compiled += 1
+        compiled.append(actions)
+
+    expects = None
+    if previous is not None and previous.expects and all(e.step == expect_hash for e in previous.expects):
+        expects = list(previous.expects)
+    elif use_rules:
+        expects = compile_expect(spec.expect)
+        if expects is not None:
+            expects = [e.model_copy(update={"step": expect_hash}) for e in expects]
+    report.expect_compiled = expects is not None
+
+    ranges = _uncovered_ranges(compiled)
+    if expects is None:
+        if ranges:
+            ranges[-1].with_expect = True
+        else:
+            ranges.append(_Range(len(lines), len(lines), with_expect=True))
+    gotos = [a for actions in compiled if actions for a in actions if isinstance(a, Goto)]
+    if not gotos and not ranges and previous is None:
+        ranges.append(_Range(len(lines), len(lines)))  # nothing tells us env_base_url
+
+    async def convert_range(r: _Range) -> None:
+        done = [f"（已完成）{line}" for line in lines[:r.start]]
+        sub = SpecCase(id=spec.id, desc=spec.desc, prepare=done,
+                       steps=[SpecStep(action=line) for line in lines[r.start:r.end]],
+                       expect=spec.expect if r.with_expect else "（无，仅转换以上步骤）")
+        # a single-page tree only describes that page; don't offer it once compiled steps navigated away
+        tree = a11y_tree_json if is_flow_capture(a11y_tree_json) or not _navigated(compiled[:r.start]) else None
+        if packer is not None:
+            r.result = await packer.convert(sub, tree)
+        else:
+            r.result = await spec_to_ir(sub, llm, a11y_tree_json=tree)
+        # sub-spec lines keep the original numbering, but "done" lines are reworded: map hashes back
+        to_original = dict(zip(step_hashes(spec_lines(sub)), hashes))
+        own = set(hashes[r.start:r.end])
+        kept = []
+        for action in r.result.actions:
+            step = to_original.get(action.step) if action.step else None
+            if step is not None and step not in own:
+                continue  # the LLM repeated a step that is already covered
+            if step is None and r.start < r.end:
+                # attribute to the preceding action's line so incremental runs can find it again
+                step = kept[-1].step if kept else hashes[r.start]
+            kept.append(action.model_copy(update={"step": step}))
+        r.actions = kept
+
+    await asyncio.gather(*(convert_range(r) for r in ranges))
+    report.llm_calls = len(ranges)
+
+    actions: List[Action] = []
+    by_start = {r.start: r for r in ranges if r.start < r.end}
+    for i, line_actions in enumerate(compiled):
+        if line_actions is not None:
+            actions.extend(line_actions)
+        elif i in by_start:
+            llm_actions = by_start[i].actions
+            last_goto = next((a for a in reversed(actions) if isinstance(a, Goto)), None)
+            if (llm_actions and isinstance(llm_actions[0], Goto) and last_goto is not None
+                    and _same_url(llm_actions[0].url, last_goto.url, by_start[i].result.env_base_url)):
+                llm_actions = llm_actions[1:]  # the LLM re-opened the page the previous step is already on
+            actions.extend(llm_actions)
+
+    results = [r.result for r in ranges if r.result is not None]
+    if expects is None:
+        expects = list(next(r.result for r in ranges if r.with_expect).expects)
+    if gotos:
+        origin = urlparse(gotos[0].url)
+        base_url = f"{origin.scheme}://{origin.netloc}"
+    else:
+        base_url = results[0].env_base_url if results else previous.env_base_url
+    base = results[0] if results else previous
+    # fresh LLM output decides the tags; the previous IR's only stand when nothing was sent to the LLM
+    tags = sorted({t for r in results for t in r.tags} if results
+                  else set(previous.tags if previous is not None else ()))
+    ir = TestIR(id=spec.id, desc=spec.desc, env_base_url=base_url,
+                ignore_https_errors=base.ignore_https_errors if base is not None else True,
+                actions=actions, expects=expects, tags=tags)
+    print(report, file=sys.stderr)
+    return ir, report
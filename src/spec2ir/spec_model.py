@@ -1,4 +1,6 @@
 from __future__ import annotations
+import hashlib
+import re
 from pydantic import BaseModel, Field
 from typing import List
 
@@ -13,3 +15,20 @@ class SpecCase(BaseModel):
     prepare: List[str] = Field(default_factory=list)
     steps: List[SpecStep] = Field(default_factory=list)
     expect: str
+
+
+def spec_lines(spec: SpecCase) -> List[str]:
+    """prepare + steps, in the order (and 1-based numbering) the prompt shows them."""
+    return list(spec.prepare) + [s.action for s in spec.steps]
+
+
+def step_hashes(lines: List[str]) -> List[str]:
+    """Stable id per line: whitespace-normalized text plus its occurrence number among identical lines."""
+    seen: dict = {}
+    out = []
+    for line in lines:
+        text = re.sub(r"\s+", " ", line).strip()
+        n = seen.get(text, 0)
+        seen[text] = n + 1
+        out.append(hashlib.sha256(f"{text}#{n}".encode("utf-8")).hexdigest()[:12])
+    return out
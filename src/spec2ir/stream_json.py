@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class StreamValidationError(ValueError):
+    """Raised as soon as a streamed LLM answer can no longer become a valid IR."""
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "expect_key")
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind            # "obj" | "arr"
+        self.key: Optional[str] = None
+        self.expect_key = kind == "obj"
+
+
+class IncrementalJSONParser:
+    """Character-level scanner that emits elements of selected root arrays as soon as they close.
+
+    Only the first top-level JSON object is considered; chatter and ``` fences
+    before it are skipped. `sections` names root keys whose array items are
+    emitted as `(section, item)` once complete. `checks` maps a key path inside
+    an item, e.g. ("actions", "op") or ("actions", "locator", "kind"), to the
+    allowed string values; a violation raises StreamValidationError while the
+    item is still being generated.
+    """
+
+    def __init__(self, sections: Iterable[str], checks: Optional[Dict[Tuple[str, ...], Set[str]]] = None) -> None:
+        self.sections = set(sections)
+        self.checks = checks or {}
+        self.text: List[str] = []
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []
+        self._section: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._pos = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def _path(self) -> Tuple[str, ...]:
+        # keys from the item object (depth 3) down to the current frame
+        return (self._section or "",) + tuple(f.key or "" for f in self._stack[2:])
+
+    def _check_value(self, value: str) -> None:
+        allowed = self.checks.get(self._path())
+        if allowed is not None and value not in allowed:
+            path = ".".join(self._path())
+            raise StreamValidationError(f"invalid value {value!r} for {path}; expected one of {sorted(allowed)}")
+
+    def _end_string(self) -> None:
+        value = "".join(self._string)
+        try:
+            value = json.loads(f'"{value}"')
+        except ValueError:
+            pass
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame.kind == "obj" and frame.expect_key:
+            frame.key = value
+        elif self._section is not None and len(self._stack) >= 3:
+            self._check_value(value)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume more text; return the array items completed by it."""
+        out: List[Tuple[str, Any]] = []
+        for ch in chunk:
+            self.text.append(ch)
+            pos = self._pos
+            self._pos += 1
+            if self._done:
+                continue
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append(_Frame("obj"))
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                    self._string.append(ch)
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string()
+                else:
+                    self._string.append(ch)
+                continue
+
+            top = self._stack[-1]
+            if ch == '"':
+                if self._section is not None and len(self._stack) == 2:
+                    raise StreamValidationError(f"{self._section} items must be JSON objects")
+                self._in_string = True
+                self._string = []
+                continue
+            if ch in "{[":
+                if self._section is not None and len(self._stack) == 2:
+                    if ch == "[":
+                        raise StreamValidationError(f"{self._section} items must be JSON objects")
+                    self._item_start = pos
+                elif len(self._stack) == 1 and ch == "[" and top.key in self.sections:
+                    self._section = top.key
+                self._stack.append(_Frame("obj" if ch == "{" else "arr"))
+                continue
+            if ch in "}]":
+                self._stack.pop()
+                if self._section is not None and len(self._stack) == 2 and ch == "}" and self._item_start is not None:
+                    item_text = "".join(self.text[self._item_start:pos + 1])
+                    self._item_start = None
+                    try:
+                        out.append((self._section, json.loads(item_text)))
+                    except ValueError as exc:
+                        raise StreamValidationError(f"malformed {self._section} item: {exc}") from exc
+                elif self._section is not None and len(self._stack) == 1:
+                    self._section = None
+                if not self._stack:
+                    self._done = True
+                continue
+            if ch == ":":
+                top.expect_key = False
+                continue
+            if ch == ",":
+                if top.kind == "obj":
+                    top.expect_key = True
+                    top.key = None
+                continue
+            if ch.isspace():
+                continue
+            if self._section is not None and len(self._stack) == 2:
+                raise StreamValidationError(f"{self._section} items must be JSON objects")
+        return out
+
+    def full_text(self) -> str:
+        return "".join(self.text)
@@ -3,15 +3,28 @@ from __future__ import annotations
 import json
 import os
 import re
+import sys
+import time
+import tracemalloc
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import yaml
-from playwright.async_api import async_playwright
+
+from spec2ir.a11y_budget import A11Y_NODE_KEYS, estimate_tokens, prune_a11y_tree_to_budget
+from spec2ir.a11y_cache import A11ySnapshotCache
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.netprofile import NetworkStats, apply_profile, get_profile
+from spec2ir.spec_model import SpecCase
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
 
 
 _URL_RE = re.compile(r"(https?://[^\s，,]+)", re.IGNORECASE)
 _ARIA_ENTRY_RE = re.compile(r'^(?P<role>[^\s\"]+)(?:\s+"(?P<name>.*)")?$')
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAML_RESOLVER = yaml.resolver.Resolver()  # the implicit tags safe_load applies
 
 
 def extract_first_url(lines: list[str]) -> Optional[str]:
@@ -29,32 +42,41 @@ def _env_flag(name: str, default: bool) -> bool:
     return raw.strip().lower() not in ("0", "false", "no", "off")
 
 
-def _prune_a11y_tree(node: Any, max_depth: int, max_children: int, depth: int = 0) -> Any:
-    """Prune the a11y tree to keep prompts small and stable."""
-    if node is None or depth >= max_depth:
-        return None
-    if isinstance(node, dict):
-        out: Dict[str, Any] = {}
-        for k in ("role", "name", "value", "description", "keyshortcuts",
-                  "checked", "pressed", "expanded", "level"):
-            if k in node and node[k] not in (None, "", []):
-                out[k] = node[k]
-
-        children = node.get("children") or []
-        if isinstance(children, list) and children:
-            pruned_children = []
-            for c in children[:max_children]:
-                pc = _prune_a11y_tree(c, max_depth, max_children, depth + 1)
-                if pc is not None:
-                    pruned_children.append(pc)
-            if pruned_children:
-                out["children"] = pruned_children
-        return out
-
-    if isinstance(node, list):
-        return [_prune_a11y_tree(x, max_depth, max_children, depth) for x in node[:max_children]]
+def _prune_nodes(node: Any, max_depth: int, max_children: int,
+                 max_nodes: Optional[int] = None) -> Tuple[Any, int, bool]:
+    """Iterative depth/children/node-budget prune in document order: (tree, nodes kept, hit the budget)."""
+    holder: List[Any] = []
+    stack: List[Tuple[Any, int, Any]] = [(node, 0, holder)]  # (node, depth, parent dict or list)
+    kept = 0
+    truncated = False
+    while stack:
+        cur, depth, parent = stack.pop()
+        if cur is None or depth >= max_depth:
+            continue
+        if isinstance(cur, dict):
+            if max_nodes is not None and kept >= max_nodes:
+                truncated = True
+                break
+            kept += 1
+            copy = {k: cur[k] for k in A11Y_NODE_KEYS if k in cur and cur[k] not in (None, "", [])}
+            children = cur.get("children")
+            if isinstance(children, list):
+                stack.extend((c, depth + 1, copy) for c in reversed(children[:max_children]))
+        elif isinstance(cur, list):
+            copy = []
+            stack.extend((c, depth, copy) for c in reversed(cur[:max_children]))
+        else:
+            copy = cur
+        if isinstance(parent, list):
+            parent.append(copy)
+        else:
+            parent.setdefault("children", []).append(copy)
+    return (holder[0] if holder else None), kept, truncated
 
-    return node
+
+def _prune_a11y_tree(node: Any, max_depth: int, max_children: int, max_nodes: Optional[int] = None) -> Any:
+    """Prune the a11y tree to keep prompts small and stable."""
+    return _prune_nodes(node, max_depth, max_children, max_nodes)[0]
 
 
 def _split_role_and_name(raw: str) -> tuple[str, Optional[str]]:
@@ -71,56 +93,169 @@ def _split_role_and_name(raw: str) -> tuple[str, Optional[str]]:
     return role, name or None
 
 
-def _normalize_aria_snapshot(node: Any) -> Any:
-    if isinstance(node, str):
-        role, name = _split_role_and_name(node)
-        normalized: Dict[str, Any] = {"role": role or "text"}
-        if name:
-            normalized["name"] = name
-        return normalized
-    if isinstance(node, dict):
-        items: List[Any] = []
-        for key, value in node.items():
-            role, name = _split_role_and_name(key)
-            child = _normalize_aria_snapshot(value)
-            normalized: Dict[str, Any] = {"role": role or "text"}
-            if name:
-                normalized["name"] = name
-            if isinstance(child, list):
-                if child:
-                    normalized["children"] = child
-            elif isinstance(child, dict):
-                normalized["children"] = [child]
-            elif child not in (None, ""):
-                normalized["value"] = child
-            items.append(normalized)
-        if len(items) == 1:
-            return items[0]
-        return items
-    if isinstance(node, list):
-        out: List[Any] = []
-        for item in node:
-            child = _normalize_aria_snapshot(item)
-            if not child:
-                continue
-            if isinstance(child, list):
-                out.extend(child)
-            else:
-                out.append(child)
-        return out
+def _aria_node(raw: str) -> Dict[str, Any]:
+    role, name = _split_role_and_name(raw)
+    node: Dict[str, Any] = {"role": role or "text"}
+    if name:
+        node["name"] = name
     return node
 
 
-def _aria_snapshot_yaml_to_tree(snapshot_yaml: str) -> Any:
+def _scalar(event: yaml.ScalarEvent) -> Any:
+    if not event.implicit[0]:
+        return event.value  # quoted: always a string
+    tag = _YAML_RESOLVER.resolve(yaml.ScalarNode, event.value, event.implicit)
+    if tag == "tag:yaml.org,2002:str":
+        return event.value
+    if tag == "tag:yaml.org,2002:null":
+        return None
+    return yaml.load(event.value, Loader=_YAML_LOADER)  # numbers/booleans, as safe_load would
+
+
+class _AriaBuilder:
+    """Builds normalized nodes straight from aria_snapshot YAML parse events.
+
+    A YAML sequence is a list of entries; a bare scalar entry is one node
+    ('button "OK"') and a one-key mapping is a node whose value is its text
+    or its children. Lists from multi-key mappings are spliced into the
+    parent. No intermediate YAML document is built, so parsing can stop as
+    soon as `max_nodes` nodes exist.
+    """
+
+    def __init__(self, max_nodes: Optional[int]) -> None:
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.result: Any = None
+        # ["seq", entries] or ["map", items, key, has_key]
+        self.stack: List[list] = []
+
+    @property
+    def full(self) -> bool:
+        return self.max_nodes is not None and self.nodes >= self.max_nodes
+
+    def _node(self, raw: Any) -> Dict[str, Any]:
+        self.nodes += 1
+        return _aria_node(str(raw))
+
+    def _emit(self, value: Any) -> None:
+        if not self.stack:
+            self.result = value
+            return
+        frame = self.stack[-1]
+        if frame[0] == "seq":
+            if isinstance(value, list):
+                frame[1].extend(value)
+            elif value:
+                frame[1].append(value)
+        elif not frame[3]:
+            frame[2], frame[3] = value, True
+        else:
+            item = self._node(frame[2])
+            if isinstance(value, list):
+                if value:
+                    item["children"] = value
+            elif isinstance(value, dict):
+                item["children"] = [value]
+            elif value not in (None, ""):
+                item["value"] = value
+            frame[1].append(item)
+            frame[2], frame[3] = None, False
+
+    def _close(self) -> None:
+        frame = self.stack.pop()
+        if frame[0] == "seq":
+            self._emit(frame[1])
+        else:
+            self._emit(frame[1][0] if len(frame[1]) == 1 else frame[1])
+
+    def feed(self, event: yaml.Event) -> None:
+        if isinstance(event, yaml.SequenceStartEvent):
+            self.stack.append(["seq", []])
+        elif isinstance(event, yaml.MappingStartEvent):
+            self.stack.append(["map", [], None, False])
+        elif isinstance(event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+            self._close()
+        elif isinstance(event, yaml.ScalarEvent):
+            value = _scalar(event)
+            key = bool(self.stack) and self.stack[-1][0] == "map" and not self.stack[-1][3]
+            self._emit(self._node(value) if isinstance(value, str) and not key else value)
+        elif isinstance(event, yaml.AliasEvent):
+            self._emit(None)
+
+    def finish(self) -> Any:
+        """Close whatever is still open (after a budget stop) and return the tree."""
+        while self.stack:
+            frame = self.stack[-1]
+            if frame[0] == "map" and frame[3]:
+                self._emit(None)  # keep the entry whose children were cut off
+            self._close()
+        return self.result
+
+
+def _normalize_aria_yaml(snapshot_yaml: str, max_nodes: Optional[int] = None) -> Tuple[Any, int, bool]:
+    """(tree, nodes, truncated) for aria_snapshot YAML; stops parsing at `max_nodes`."""
     if not snapshot_yaml:
-        return {}
+        return {}, 0, False
+    builder = _AriaBuilder(max_nodes)
+    truncated = False
     try:
-        parsed = yaml.safe_load(snapshot_yaml)
+        for event in yaml.parse(snapshot_yaml, Loader=_YAML_LOADER):
+            if builder.full:
+                truncated = True
+                break
+            builder.feed(event)
     except yaml.YAMLError:
-        return {"aria_snapshot": snapshot_yaml}
-    if parsed is None:
-        return {}
-    return _normalize_aria_snapshot(parsed)
+        return {"aria_snapshot": snapshot_yaml}, 0, False
+    tree = builder.finish()
+    return (tree if tree is not None else {}), builder.nodes, truncated
+
+
+def _aria_snapshot_yaml_to_tree(snapshot_yaml: str, max_nodes: Optional[int] = None) -> Any:
+    return _normalize_aria_yaml(snapshot_yaml, max_nodes)[0]
+
+
+@dataclass
+class SnapshotReport:
+    source: str  # "aria_snapshot" (YAML) or "accessibility" (dict)
+    input_chars: int
+    nodes: int
+    truncated: bool
+    max_nodes: Optional[int]
+    elapsed_ms: float
+    peak_bytes: Optional[int] = None  # only with SPEC2IR_A11Y_MEMSTATS=1
+
+    def __str__(self) -> str:
+        cut = f" (stopped at budget {self.max_nodes})" if self.truncated else ""
+        size = f" from {self.input_chars / 1000:.0f}k chars of YAML" if self.input_chars else ""
+        peak = f", peak {self.peak_bytes / (1024 * 1024):.1f} MB" if self.peak_bytes is not None else ""
+        return (
+            f"[A11Y] snapshot: {self.nodes} nodes{cut}{size} via {self.source} in {self.elapsed_ms:.1f} ms{peak}"
+        )
+
+
+def _measured(source: str, input_chars: int, max_nodes: Optional[int], fn,
+              memstats: Optional[bool] = None) -> Tuple[Any, SnapshotReport]:
+    """Time a synchronous normalizer; fn returns (tree, nodes, truncated).
+
+    Peak memory needs tracemalloc, which makes the normalization several
+    times slower, so it is only measured with `memstats` (default
+    SPEC2IR_A11Y_MEMSTATS) and never when the caller is already tracing,
+    whose peak statistics resetting would clobber.
+    """
+    if memstats is None:
+        memstats = _env_flag("SPEC2IR_A11Y_MEMSTATS", False)
+    memstats = memstats and not tracemalloc.is_tracing()
+    if memstats:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        tree, nodes, truncated = fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        peak = tracemalloc.get_traced_memory()[1] if memstats else None
+    finally:
+        if memstats:
+            tracemalloc.stop()
+    return tree, SnapshotReport(source, input_chars, nodes, truncated, max_nodes, elapsed_ms, peak)
 
 
 @dataclass
@@ -130,32 +265,95 @@ class A11yCaptureOptions:
     timeout_ms: int = 20000
     max_depth: int = 10
     max_children: int = 40
+    token_budget: Optional[int] = None  # set to prune by relevance to focus_text instead of depth/children
+    focus_text: str = ""
+    net_profile: Optional[str] = None  # request-blocking profile name (see spec2ir.netprofile)
+    max_nodes: Optional[int] = None  # stop reading the snapshot after this many nodes (default: SPEC2IR_A11Y_MAX_NODES)
 
 
-async def capture_a11y_tree(url: str, opts: A11yCaptureOptions) -> dict:
-    async with async_playwright() as p:
-        headless = _env_flag("SPEC2IR_HEADLESS", True)
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context(ignore_https_errors=opts.ignore_https_errors)
-        page = await context.new_page()
-        await page.goto(url, wait_until=opts.wait_until, timeout=opts.timeout_ms)
+def spec_focus_text(spec: SpecCase) -> str:
+    """Spec text used to rank a11y nodes for token-budgeted pruning."""
+    return "\n".join([s.action for s in spec.steps] + [spec.expect])
 
-        tree_data = None
-        accessibility_api = getattr(page, "accessibility", None)
-        snapshot_fn = getattr(accessibility_api, "snapshot", None) if accessibility_api else None
-        if snapshot_fn:
-            tree_data = await snapshot_fn()
-        else:
-            snapshot_yaml = await page.locator("body").aria_snapshot()
-            tree_data = _aria_snapshot_yaml_to_tree(snapshot_yaml)
 
-        tree = _prune_a11y_tree(tree_data, max_depth=opts.max_depth, max_children=opts.max_children) or {}
+async def _snapshot_page(context: BrowserContext, url: str, opts: A11yCaptureOptions) -> Any:
+    """Raw (unpruned) snapshot of `url`."""
+    profile = get_profile(opts.net_profile)
+    net_stats = NetworkStats()
+    if profile is not None:
+        await apply_profile(context, profile, net_stats, first_party_urls=[url])
+    page = await context.new_page()
+    await page.goto(url, wait_until=opts.wait_until, timeout=opts.timeout_ms)
+    if profile is not None:
+        print(net_stats, file=sys.stderr)
 
-        await context.close()
-        await browser.close()
+    return await page_a11y_snapshot(page, opts.max_nodes)
 
+
+def _node_budget(max_nodes: Optional[int]) -> Optional[int]:
+    if max_nodes is None:
+        max_nodes = int(os.getenv("SPEC2IR_A11Y_MAX_NODES", "20000"))
+    return max_nodes or None
+
+
+async def page_a11y_snapshot(page: Page, max_nodes: Optional[int] = None) -> Any:
+    """Raw (unpruned) snapshot of whatever `page` currently shows, cut off after `max_nodes` nodes.
+
+    Prints a SnapshotReport (nodes and time of the normalization, plus peak
+    memory with SPEC2IR_A11Y_MEMSTATS=1).
+    """
+    budget = _node_budget(max_nodes)
+    accessibility_api = getattr(page, "accessibility", None)
+    snapshot_fn = getattr(accessibility_api, "snapshot", None) if accessibility_api else None
+    if snapshot_fn:
+        data = await snapshot_fn()
+        tree, report = _measured("accessibility", 0, budget,
+                                 lambda: _prune_nodes(data, sys.maxsize, sys.maxsize, budget))
+    else:
+        snapshot_yaml = await page.locator("body").aria_snapshot()
+        tree, report = _measured("aria_snapshot", len(snapshot_yaml), budget,
+                                 lambda: _normalize_aria_yaml(snapshot_yaml, budget))
+    print(report, file=sys.stderr)
+    return tree
+
+
+def shape_a11y_tree(tree_data: Any, opts: A11yCaptureOptions) -> dict:
+    """Prune a raw snapshot per `opts`: fixed depth/children, or relevance within token_budget."""
+    tree = _prune_a11y_tree(tree_data, max_depth=opts.max_depth, max_children=opts.max_children) or {}
+    if opts.token_budget:
+        baseline = estimate_tokens(a11y_tree_to_compact_json(tree))
+        tree, report = prune_a11y_tree_to_budget(tree_data or {}, opts.focus_text, opts.token_budget, baseline)
+        print(report, file=sys.stderr)
     return tree
 
 
+async def _capture_raw(url: str, opts: A11yCaptureOptions, pool: Optional[BrowserPool]) -> Any:
+    if pool is not None:
+        async with pool.context(ignore_https_errors=opts.ignore_https_errors) as context:
+            return await _snapshot_page(context, url, opts)
+    async with BrowserPool(size=1) as own_pool:
+        async with own_pool.context(ignore_https_errors=opts.ignore_https_errors) as context:
+            return await _snapshot_page(context, url, opts)
+
+
+async def capture_a11y_tree(url: str, opts: A11yCaptureOptions, pool: Optional[BrowserPool] = None,
+                            cache: Optional[A11ySnapshotCache] = None) -> dict:
+    """Snapshot `url` in a fresh context; pass `pool` to reuse warm browsers across captures.
+
+    With `cache`, the raw snapshot is shared by every capture of the same URL
+    and page-affecting options; pruning still runs per call.
+    """
+    if cache is None:
+        return shape_a11y_tree(await _capture_raw(url, opts, pool), opts)
+    page_options = {
+        "ignore_https_errors": opts.ignore_https_errors,
+        "wait_until": opts.wait_until,
+        "net_profile": opts.net_profile or os.getenv("SPEC2IR_NET_PROFILE"),
+        "max_nodes": _node_budget(opts.max_nodes),
+    }
+    tree_data = await cache.get(url, page_options, lambda: _capture_raw(url, opts, pool))
+    return shape_a11y_tree(tree_data, opts)
+
+
 def a11y_tree_to_compact_json(tree: dict) -> str:
     return json.dumps(tree, ensure_ascii=False, separators=(",", ":"))
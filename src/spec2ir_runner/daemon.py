@@ -0,0 +1,440 @@
+"""Long-running local API for conversion, a11y capture and IR execution.
+
+One process keeps a warm BrowserPool, the pooled LLM HTTP client and the LLM
+cache between requests, so CI agents can POST work instead of spawning CLIs:
+
+    python -m spec2ir_runner.daemon --port 8765
+    python -m spec2ir_runner.daemon --unix-socket /tmp/spec2ir.sock
+    curl -s localhost:8765/convert -d '{"spec_path": "specs/waf_login_1.yaml"}'
+
+Endpoints (JSON in, JSON out):
+  POST /convert  {"spec": {...}} or {"spec_path": ...}; optional capture_a11y (or capture_flow), a11y_url,
+                 a11y_token_budget, net_profile, rules (default true), out,
+                 previous_ir or incremental (default true: reuse steps from the IR at `out`)
+  POST /capture  {"url": ...}; optional focus_text, token_budget, net_profile
+  POST /run      {"ir": {...}} or {"ir_path": ...}; optional net_profile, trace,
+                 record_har or replay_har (directory of <id>.har), har_ignore_query, har_not_found
+  POST /a11y/invalidate  {"url": ...} drops cached snapshots of url ({} drops all)
+  GET  /health, GET /metrics
+
+File paths in requests (spec_path, out, ir_path, record_har, replay_har) are
+resolved against --workdir and must stay inside it. With --token (or
+SPEC2IR_DAEMON_TOKEN), every request needs "Authorization: Bearer <token>";
+listening on a non-loopback --host requires a token.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+try:
+    from dotenv import load_dotenv, find_dotenv
+except ImportError:  # pragma: no cover
+    def load_dotenv(*_, **__):  # type: ignore
+        return False
+
+    def find_dotenv(*_, **__):  # type: ignore
+        return ""
+
+from spec2ir.a11y_cache import A11ySnapshotCache
+from spec2ir.batch import load_previous_ir, load_spec, write_ir
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.converter import spec_to_ir
+from spec2ir.flow_capture import capture_flow
+from spec2ir.har import HarMatchOptions, HarMode
+from spec2ir.netprofile import NetworkStats, get_profile
+from spec2ir.rules import convert_spec
+from spec2ir.spec_model import SpecCase
+from spec2ir.ui_context import (
+    A11yCaptureOptions,
+    a11y_tree_to_compact_json,
+    capture_a11y_tree,
+    extract_first_url,
+    spec_focus_text,
+)
+from spec2ir_runner.loader import IR_ADAPTER
+from spec2ir_runner.plan import PLAN_CACHE
+from spec2ir_runner.runner import load_ir, run_ir
+from spec2ir_runner.trace import RunTrace
+
+
+_MAX_BODY_BYTES = 16 * 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _load_env():
+    try:
+        path = find_dotenv(usecwd=True)
+    except Exception:
+        path = ""
+    if path:
+        load_dotenv(path)
+    else:
+        load_dotenv()
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+@dataclass
+class DaemonMetrics:
+    started_at: float = field(default_factory=time.time)
+    requests: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    busy_sec: Counter = field(default_factory=Counter)
+    in_flight: int = 0
+    queued: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "avg_sec": {k: round(self.busy_sec[k] / n, 3) for k, n in self.requests.items() if n},
+        }
+
+
+class Spec2IRDaemon:
+    """Shared state plus request handlers; work endpoints run at most `concurrency` at once.
+
+    Request paths are confined to `workdir` (default: the current directory);
+    `token`, when set, must be presented as a bearer token on every request.
+    """
+
+    def __init__(self, concurrency: int = 4, provider: str = "openai_compat", use_cache: bool = True,
+                 warm_browsers: int = 0, a11y_cache: bool = True, workdir: Optional[str] = None,
+                 token: Optional[str] = None) -> None:
+        self.concurrency = max(1, concurrency)
+        self.workdir = os.path.realpath(workdir or os.getcwd())
+        self.token = token or None
+        self.provider = provider
+        self.use_cache = use_cache
+        self.warm_browsers = warm_browsers
+        self.metrics = DaemonMetrics()
+        self.pool = BrowserPool()
+        self.a11y_cache = A11ySnapshotCache() if a11y_cache else None
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._llm = None
+        self._routes: Dict[Tuple[str, str], Callable[[dict], Awaitable[dict]]] = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.get_metrics,
+            ("POST", "/convert"): self.convert,
+            ("POST", "/capture"): self.capture,
+            ("POST", "/run"): self.run,
+            ("POST", "/a11y/invalidate"): self.invalidate_a11y,
+        }
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            if self.provider.endswith((".yaml", ".yml")):
+                from spec2ir.converter import validate_completion
+                from spec2ir.llm.registry import load_multi_provider
+                llm = load_multi_provider(self.provider, validate=validate_completion)
+            else:
+                from spec2ir.llm.registry import create_provider
+                llm = create_provider(self.provider)
+            if self.use_cache:
+                from spec2ir.llm.cache import CachedProvider
+                llm = CachedProvider(llm)
+            self._llm = llm
+        return self._llm
+
+    def _path(self, body: dict, key: str) -> str:
+        """body[key] resolved against the workdir; anything (including symlinks) leading outside it is refused."""
+        value = body[key]
+        if not isinstance(value, str) or not value:
+            raise BadRequest(f"'{key}' must be a non-empty path")
+        path = os.path.realpath(os.path.join(self.workdir, value))
+        if os.path.commonpath([path, self.workdir]) != self.workdir:
+            raise BadRequest(f"'{key}' resolves outside the daemon workdir")
+        return path
+
+    def authorized(self, headers: Dict[str, str]) -> bool:
+        if self.token is None:
+            return True
+        scheme, _, credentials = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), self.token.encode())
+
+    async def start(self) -> None:
+        if self.warm_browsers:
+            await self.pool.start(warm=self.warm_browsers)
+
+    async def close(self) -> None:
+        if self._llm is not None:
+            await self._llm.aclose()
+        await self.pool.close()
+
+    async def dispatch(self, method: str, path: str, body: dict) -> Tuple[int, dict]:
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        handler = self._routes.get((method, path))
+        if handler is None:
+            known = any(p == path for _, p in self._routes)
+            return (405, {"error": f"{method} not allowed"}) if known else (404, {"error": f"no route {path}"})
+        if method == "GET":
+            return 200, await handler(body)
+        name = path.lstrip("/")
+        self.metrics.requests[name] += 1
+        self.metrics.queued += 1
+        async with self._sem:
+            self.metrics.queued -= 1
+            self.metrics.in_flight += 1
+            started = time.perf_counter()
+            try:
+                return 200, await handler(body)
+            except (BadRequest, ValidationError) as exc:
+                self.metrics.errors[name] += 1
+                return 400, {"error": f"{type(exc).__name__}: {exc}"}
+            except Exception as exc:
+                self.metrics.errors[name] += 1
+                return 500, {"error": f"{type(exc).__name__}: {exc}"}
+            finally:
+                self.metrics.in_flight -= 1
+                self.metrics.busy_sec[name] += time.perf_counter() - started
+
+    async def health(self, _: dict) -> dict:
+        return {"status": "ok", "pid": os.getpid(), "uptime_sec": round(time.time() - self.metrics.started_at, 1)}
+
+    async def get_metrics(self, _: dict) -> dict:
+        data = self.metrics.to_dict()
+        data["concurrency"] = self.concurrency
+        data["browser_pool"] = asdict(self.pool.stats)
+        data["plan_cache"] = asdict(PLAN_CACHE.stats)
+        if self.a11y_cache is not None:
+            data["a11y_cache"] = asdict(self.a11y_cache.stats)
+        cache_stats = getattr(self._llm, "stats", None)
+        if cache_stats is not None:
+            data["llm_cache"] = asdict(cache_stats)
+        members = getattr(getattr(self._llm, "inner", self._llm), "members", None)
+        if members:
+            data["llm_providers"] = {
+                m.name: {"calls": m.stats.calls, "wins": m.stats.wins, "errors": m.stats.errors,
+                         "invalid": m.stats.invalid, "error_rate": round(m.stats.error_rate, 3),
+                         "p50_sec": m.stats.quantile(0.5), "p95_sec": m.stats.quantile(0.95)}
+                for m in members
+            }
+        return data
+
+    async def convert(self, body: dict) -> dict:
+        out = self._path(body, "out") if body.get("out") else None
+        if "spec" in body:
+            spec = TypeAdapter(SpecCase).validate_python(body["spec"])
+        elif "spec_path" in body:
+            spec = load_spec(self._path(body, "spec_path"))
+        else:
+            raise BadRequest("convert needs 'spec' or 'spec_path'")
+        result: Dict[str, Any] = {}
+        a11y_json = None
+        if body.get("capture_a11y") or body.get("capture_flow"):
+            url = body.get("a11y_url") or extract_first_url(spec.prepare)
+            if not url:
+                raise BadRequest("capture_a11y set but no URL found in prepare; pass a11y_url")
+            opts = A11yCaptureOptions(ignore_https_errors=True, token_budget=body.get("a11y_token_budget"),
+                                      focus_text=spec_focus_text(spec), net_profile=body.get("net_profile"))
+            if body.get("capture_flow"):
+                pages, flow = await capture_flow(spec, opts, pool=self.pool, url=url)
+                a11y_json = a11y_tree_to_compact_json(pages)
+                result["flow"] = asdict(flow)
+            else:
+                tree = await capture_a11y_tree(url, opts, pool=self.pool, cache=self.a11y_cache)
+                a11y_json = a11y_tree_to_compact_json(tree)
+        use_rules = body.get("rules", True)
+        previous = None
+        if body.get("previous_ir"):
+            previous = IR_ADAPTER.validate_python(body["previous_ir"])
+        elif out and body.get("incremental", True):
+            previous = load_previous_ir(out)
+        if use_rules or previous is not None:
+            ir, rules = await convert_spec(spec, self.llm, a11y_tree_json=a11y_json, use_rules=use_rules,
+                                           previous=previous)
+            result["rules"] = asdict(rules)
+        else:
+            ir = await spec_to_ir(spec, self.llm, a11y_tree_json=a11y_json)
+        result["ir"] = ir.model_dump()
+        if out:
+            write_ir(result["ir"], out)
+        return result
+
+    async def capture(self, body: dict) -> dict:
+        if not body.get("url"):
+            raise BadRequest("capture needs 'url'")
+        opts = A11yCaptureOptions(ignore_https_errors=True, token_budget=body.get("token_budget"),
+                                  focus_text=body.get("focus_text", ""), net_profile=body.get("net_profile"))
+        return {"tree": await capture_a11y_tree(body["url"], opts, pool=self.pool, cache=self.a11y_cache)}
+
+    async def invalidate_a11y(self, body: dict) -> dict:
+        removed = self.a11y_cache.invalidate(body.get("url")) if self.a11y_cache is not None else 0
+        return {"removed": removed}
+
+    async def run(self, body: dict) -> dict:
+        if "ir" in body:
+            ir = IR_ADAPTER.validate_python(body["ir"])
+        elif "ir_path" in body:
+            ir = load_ir(self._path(body, "ir_path"))
+        else:
+            raise BadRequest("run needs 'ir' or 'ir_path'")
+        if body.get("record_har") and body.get("replay_har"):
+            raise BadRequest("run takes either 'record_har' or 'replay_har'")
+        har = None
+        if body.get("record_har") or body.get("replay_har"):
+            mode = "record" if body.get("record_har") else "replay"
+            har = HarMode(mode, self._path(body, f"{mode}_har"),
+                          HarMatchOptions.from_env(ignore_query=body.get("har_ignore_query"),
+                                                   not_found=body.get("har_not_found")))
+        trace = RunTrace(ir.id, source=body.get("ir_path", "")) if body.get("trace") else None
+        net = NetworkStats()
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"id": ir.id, "ok": True, "error": None}
+        try:
+            await run_ir(ir, pool=self.pool, trace=trace, net_profile=get_profile(body.get("net_profile")),
+                         net_stats=net, har=har)
+        except Exception as exc:  # a failing test is a result, not a server error
+            result.update(ok=False, error=f"{type(exc).__name__}: {exc}")
+        result["elapsed_sec"] = round(time.perf_counter() - started, 3)
+        if net.requests:
+            result["net"] = {"requests": net.requests, "blocked": dict(net.blocked)}
+        if har is not None:
+            result["har"] = {"mode": har.mode, "path": har.path_for(ir.id)}
+            if har.mode == "replay":
+                result["har"].update(requests=har.stats.requests, served=har.stats.served,
+                                     missed=dict(har.stats.missed))
+        if trace is not None:
+            result["trace"] = trace.to_chrome_trace()
+        return result
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Minimal HTTP/1.1 with keep-alive; bodies are JSON objects."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # the body cannot be framed, so the connection cannot be reused either
+                    status, payload = 400, {"error": "invalid Content-Length"}
+                    headers["connection"] = "close"
+                elif length > _MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "request body too large"}
+                    headers["connection"] = "close"
+                elif not self.authorized(headers):
+                    await reader.readexactly(length)  # keep the connection in sync for the next request
+                    status, payload = 401, {"error": "missing or invalid bearer token"}
+                else:
+                    raw = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw) if raw else {}
+                        if not isinstance(body, dict):
+                            raise ValueError("body must be a JSON object")
+                    except ValueError as exc:
+                        status, payload = 400, {"error": f"invalid JSON: {exc}"}
+                    else:
+                        status, payload = await self.dispatch(method.upper(), path, body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(daemon: Spec2IRDaemon, host: str = "127.0.0.1", port: int = 8765,
+                unix_socket: Optional[str] = None) -> None:
+    await daemon.start()
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = await asyncio.start_unix_server(daemon.handle_connection, path=unix_socket)
+        where = f"unix:{unix_socket}"
+    else:
+        server = await asyncio.start_server(daemon.handle_connection, host, port)
+        where = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+    print(f"[DAEMON] listening on {where} (concurrency {daemon.concurrency})", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await daemon.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+
+
+def main():
+    _load_env()
+    p = argparse.ArgumentParser(description="Serve spec2ir conversion, a11y capture and IR execution over HTTP")
+    p.add_argument("--host", default="127.0.0.1",
+                   help="Listen address; anything but loopback requires --token")
+    p.add_argument("--port", type=int, default=int(os.getenv("SPEC2IR_DAEMON_PORT", "8765")))
+    p.add_argument("--unix-socket", default=os.getenv("SPEC2IR_DAEMON_SOCKET"),
+                   help="Listen on this Unix socket instead of TCP")
+    p.add_argument("--concurrency", type=int, default=int(os.getenv("SPEC2IR_CONCURRENCY", "4")),
+                   help="Max conversions/captures/runs in progress; the rest queue")
+    p.add_argument("--warm", type=int, default=1, help="Browsers to launch at startup (0: on first use)")
+    p.add_argument("--provider", default=os.getenv("SPEC2IR_PROVIDER", "openai_compat"),
+                   help="LLM provider name, or a YAML routing config for hedged/fallback providers")
+    p.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM completion cache")
+    p.add_argument("--no-a11y-cache", action="store_true", help="Capture the a11y tree for every request")
+    p.add_argument("--workdir", default=os.getenv("SPEC2IR_DAEMON_WORKDIR"),
+                   help="Root for spec/IR/output/HAR paths in requests (default: current directory)")
+    p.add_argument("--token", default=os.getenv("SPEC2IR_DAEMON_TOKEN"),
+                   help="Require 'Authorization: Bearer <token>' on every request")
+    args = p.parse_args()
+    if not args.unix_socket and not args.token and not is_loopback(args.host):
+        p.error(f"--host {args.host} is not a loopback address; set --token (or SPEC2IR_DAEMON_TOKEN) first")
+
+    daemon = Spec2IRDaemon(args.concurrency, args.provider, not args.no_cache, args.warm, not args.no_a11y_cache,
+                           workdir=args.workdir, token=args.token)
+    try:
+        asyncio.run(serve(daemon, args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        print("[DAEMON] stopped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterable, List, Optional, Tuple, Union
+
+import yaml
+from pydantic import TypeAdapter
+
+from spec2ir.ir_model import TestIR
+
+
+IR_ADAPTER = TypeAdapter(TestIR)
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+BUNDLE_SUFFIX = ".irs.jsonl"
+_BUNDLE_HEADER = "#spec2ir-ir-bundle 1"
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in _TRUE_VALUES
+
+
+def _default_cache_dir() -> str:
+    root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "spec2ir", "ir")
+
+
+@functools.lru_cache(maxsize=1)
+def _schema_fingerprint() -> bytes:
+    """Changes whenever TestIR does, so cached IRs validated against an older model are not reused."""
+    schema = json.dumps(TestIR.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).digest()
+
+
+def is_bundle(path: str) -> bool:
+    return path.endswith(BUNDLE_SUFFIX)
+
+
+def bundle_entry_name(path: str, lineno: int) -> str:
+    """Name of the IR on line `lineno` (1-based, the header is line 1) of a bundle."""
+    return f"{path}:{lineno}"
+
+
+def _bundle_lines(path: str, f) -> Iterable[Tuple[int, bytes]]:
+    """(line number, line) for the non-empty IR lines of an open bundle, after checking its header."""
+    header = f.readline().rstrip(b"\r\n").decode("utf-8")
+    if header != _BUNDLE_HEADER:
+        raise ValueError(f"{path} is not an IR bundle (header {header!r})")
+    for lineno, line in enumerate(f, start=2):
+        line = line.rstrip(b"\r\n")
+        if line:
+            yield lineno, line
+
+
+def bundle_line_numbers(path: str) -> List[int]:
+    """Line numbers of the IRs in a bundle, without parsing them."""
+    with open(path, "rb") as f:
+        return [lineno for lineno, _ in _bundle_lines(path, f)]
+
+
+@dataclass
+class LoadStats:
+    files: int = 0
+    bundles: int = 0
+    irs: int = 0
+    memory_hits: int = 0  # returned without parsing or validation
+    disk_hits: int = 0    # rebuilt from cached canonical JSON, no YAML parsing
+    parsed: int = 0       # YAML parsed and validated
+    failed: int = 0
+    elapsed_ms: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"[LOAD] {self.irs} IRs from {self.files} files and {self.bundles} bundles in {self.elapsed_ms:.1f} ms: "
+            f"{self.parsed} parsed, {self.disk_hits} from cache dir, {self.memory_hits} in memory, "
+            f"{self.failed} failed"
+        )
+
+
+class IRLoader:
+    """Loads IR YAML files and bundles, reusing validated content by hash.
+
+    A file's cache key is the SHA-256 of its bytes (plus a fingerprint of the
+    TestIR schema). The last `max_memory` IRs are kept in memory and,
+    unless disabled, as canonical JSON under `cache_dir`, which is rebuilt
+    through pydantic-core's JSON validator instead of parsing YAML again.
+    Returned IRs may be shared between calls; treat them as read-only.
+    Configure via env:
+      - SPEC2IR_IR_CACHE=0 disables the cache directory
+      - SPEC2IR_IR_CACHE_DIR (default: $XDG_CACHE_HOME/spec2ir/ir)
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, use_disk: Optional[bool] = None,
+                 max_memory: int = 4096) -> None:
+        self.max_memory = max_memory
+        self.use_disk = use_disk if use_disk is not None else _env_flag("SPEC2IR_IR_CACHE", True)
+        self.cache_dir = cache_dir or os.getenv("SPEC2IR_IR_CACHE_DIR") or _default_cache_dir()
+        self.stats = LoadStats()
+        self._memory: "OrderedDict[str, TestIR]" = OrderedDict()
+
+    def _key(self, content: bytes) -> str:
+        return hashlib.sha256(_schema_fingerprint() + content).hexdigest()
+
+    def _cached(self, key: str) -> Optional[TestIR]:
+        ir = self._memory.get(key)
+        if ir is not None:
+            self.stats.memory_hits += 1
+            self._memory.move_to_end(key)
+        return ir
+
+    def _remember(self, key: str, ir: TestIR) -> None:
+        self._memory[key] = ir
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[TestIR]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return IR_ADAPTER.validate_json(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, ir: TestIR) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(ir.model_dump_json())
+            os.replace(tmp, path)
+        except OSError:
+            pass  # an unwritable cache only costs a reparse next run
+
+    def load(self, path: str) -> TestIR:
+        """One IR YAML file."""
+        with open(path, "rb") as f:
+            content = f.read()
+        self.stats.files += 1
+        key = self._key(content)
+        ir = self._cached(key)
+        if ir is None:
+            ir = self._read(key) if self.use_disk else None
+            if ir is not None:
+                self.stats.disk_hits += 1
+            else:
+                ir = IR_ADAPTER.validate_python(yaml.load(content, Loader=_YAML_LOADER))
+                self.stats.parsed += 1
+                if self.use_disk:
+                    self._write(key, ir)
+            self._remember(key, ir)
+        self.stats.irs += 1
+        return ir
+
+    def load_bundle(self, path: str, lines: Optional[Collection[int]] = None
+                    ) -> List[Tuple[str, Union[TestIR, Exception]]]:
+        """(name, IR or the error loading it) for every IR in a bundle, or only those on `lines`.
+
+        Names are `<bundle>:<line number>` (see bundle_entry_name), so IRs
+        sharing an id stay apart; an invalid line fails only its own entry.
+        """
+        self.stats.bundles += 1
+        out: List[Tuple[str, Union[TestIR, Exception]]] = []
+        with open(path, "rb") as f:
+            for lineno, line in _bundle_lines(path, f):
+                if lines is not None and lineno not in lines:
+                    continue
+                name = bundle_entry_name(path, lineno)
+                key = self._key(line)
+                ir = self._cached(key)
+                if ir is None:
+                    try:
+                        ir = IR_ADAPTER.validate_json(line)
+                    except ValueError as exc:
+                        self.stats.failed += 1
+                        out.append((name, exc))
+                        continue
+                    self.stats.parsed += 1
+                    self._remember(key, ir)
+                self.stats.irs += 1
+                out.append((name, ir))
+        return out
+
+    def load_all(self, paths: Iterable[str], bundle_lines: Optional[Dict[str, Collection[int]]] = None
+                 ) -> List[Tuple[str, Union[TestIR, Exception]]]:
+        """(name, IR or the error loading it) for IR files and bundles, in order; bundles expand in place.
+
+        `bundle_lines` restricts a bundle to the IRs on those lines (see load_bundle).
+        """
+        started = time.perf_counter()
+        out: List[Tuple[str, Union[TestIR, Exception]]] = []
+        for path in paths:
+            try:
+                if is_bundle(path):
+                    out.extend(self.load_bundle(path, (bundle_lines or {}).get(path)))
+                else:
+                    out.append((path, self.load(path)))
+            except Exception as exc:
+                self.stats.failed += 1
+                out.append((path, exc))
+        self.stats.elapsed_ms += (time.perf_counter() - started) * 1000
+        return out
+
+
+def write_bundle(irs: Iterable[TestIR], path: str) -> int:
+    """Write IRs as one JSON-lines bundle (canonical JSON per line); returns how many were written."""
+    count = 0
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(_BUNDLE_HEADER + "\n")
+        for ir in irs:
+            f.write(ir.model_dump_json() + "\n")
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+
+_DEFAULT_LOADER: Optional[IRLoader] = None
+
+
+def default_loader() -> IRLoader:
+    global _DEFAULT_LOADER
+    if _DEFAULT_LOADER is None:
+        _DEFAULT_LOADER = IRLoader()
+    return _DEFAULT_LOADER
@@ -1,9 +1,8 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
-import yaml
-from pydantic import TypeAdapter
+import os
+import sys
 
 try:
     from dotenv import load_dotenv, find_dotenv
@@ -25,29 +24,149 @@ def _load_env():
     else:
         load_dotenv()
 
-from spec2ir.ir_model import TestIR
-from spec2ir_runner.runner import run_ir
+# Runner modules pull in pydantic and Playwright; import them only once arguments are parsed.
 
 
-def load_ir(path: str) -> TestIR:
-    with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
-    adapter = TypeAdapter(TestIR)
-    return adapter.validate_python(data)
+def _har_mode(record: str | None, replay: str | None, ignore_query: bool, fallback: bool):
+    if not (record or replay):
+        return None
+    from spec2ir.har import HarMatchOptions, HarMode
 
+    options = HarMatchOptions.from_env(ignore_query=True if ignore_query else None,
+                                       not_found="fallback" if fallback else None)
+    return HarMode("record" if record else "replay", record or replay, options)
+
+
+async def _main(ir_path: str, trace_dir: str | None = None, net_profile: str | None = None, har=None):
+    from spec2ir.netprofile import NetworkStats, get_profile
+    from spec2ir_runner.runner import load_ir, run_ir
+    from spec2ir_runner.trace import RunTrace, format_slowest, suite_report, write_trace
 
-async def _main(ir_path: str):
     ir = load_ir(ir_path)
-    await run_ir(ir)
+    trace = RunTrace(ir.id, source=ir_path) if trace_dir else None
+    net = NetworkStats()
+    try:
+        await run_ir(ir, trace=trace, net_profile=get_profile(net_profile), net_stats=net, har=har)
+    finally:
+        if net.requests:
+            print(net)
+        if har is not None:
+            print(har.stats if har.mode == "replay" else f"[HAR] recorded to {har.path_for(ir.id)}")
+        if trace is not None:
+            print(f"[TRACE] written to {write_trace(trace, trace_dir)}")
+            print(format_slowest(suite_report([trace])))
+
+
+def _suite(inputs: list[str], concurrency: int, workers: int, trace_dir: str | None = None,
+           share_prefix: bool = False, session_ttl_sec: float | None = None,
+           net_profile: str | None = None, har=None) -> bool:
+    import asyncio
+    from spec2ir_runner.suite import collect_ir_paths, run_suite, run_suite_processes, write_suite_report
+
+    paths = collect_ir_paths(inputs)
+    if not paths:
+        raise RuntimeError(f"No IR files matched: {' '.join(inputs)}")
+    if workers > 1:
+        result = run_suite_processes(paths, workers, concurrency, trace_dir, share_prefix, session_ttl_sec,
+                                     net_profile, har)
+    else:
+        result = asyncio.run(run_suite(paths, concurrency, trace_dir=trace_dir, share_prefix=share_prefix,
+                                       session_ttl_sec=session_ttl_sec, net_profile=net_profile, har=har))
+    print(result.summary())
+    if trace_dir:
+        print(write_suite_report(result, trace_dir))
+    return not result.failed
+
+
+def _emit_scripts(inputs: list[str], out_dir: str) -> None:
+    from spec2ir_runner.loader import IRLoader
+    from spec2ir_runner.plan import compile_plan
+    from spec2ir_runner.script import write_script
+    from spec2ir_runner.suite import collect_ir_paths
+
+    paths = collect_ir_paths(inputs)
+    if not paths:
+        raise RuntimeError(f"No IR files matched: {' '.join(inputs)}")
+    taken: set = set()
+    for name, ir in IRLoader().load_all(paths):
+        if isinstance(ir, Exception):
+            raise ir
+        print(f"[SCRIPT] {name} -> {write_script(compile_plan(ir), out_dir, source=name, taken=taken)}")
+
+
+def _bundle(inputs: list[str], out: str) -> None:
+    from spec2ir.ir_model import TestIR
+    from spec2ir_runner.loader import IRLoader, write_bundle
+    from spec2ir_runner.suite import collect_ir_paths
+
+    paths = collect_ir_paths(inputs)
+    if not paths:
+        raise RuntimeError(f"No IR files matched: {' '.join(inputs)}")
+    loader = IRLoader()
+    entries = loader.load_all(p for p in paths if os.path.abspath(p) != os.path.abspath(out))
+    for name, ir in entries:
+        if not isinstance(ir, TestIR):
+            print(f"[FAIL] {name}: {type(ir).__name__}: {ir}")
+    count = write_bundle((ir for _, ir in entries if isinstance(ir, TestIR)), out)
+    print(loader.stats)
+    print(f"[BUNDLE] {count} IRs -> {out}")
+    if loader.stats.failed:
+        sys.exit(1)
 
 
 def main():
     _load_env()
     parser = argparse.ArgumentParser(description="Execute Test IR via Playwright")
-    parser.add_argument("--ir", required=True, help="Path to Test IR YAML")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--ir", help="Path to Test IR YAML")
+    src.add_argument("--suite", nargs="+", help="IR files, directories or globs to run concurrently")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SPEC2IR_CONCURRENCY", "4")),
+                        help="Suite mode: isolated contexts per browser")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Suite mode: worker processes, each with its own browser")
+    parser.add_argument("--trace-dir", default=None,
+                        help="Write per-run Chrome trace JSON (and suite-report.json in suite mode) here")
+    parser.add_argument("--share-prefix", action="store_true",
+                        help="Suite mode: run common action prefixes (e.g. login) once and reuse the session")
+    parser.add_argument("--session-ttl", type=float, default=None,
+                        help="Seconds a shared-prefix session stays valid (default: SPEC2IR_SESSION_TTL_SEC or 600)")
+    parser.add_argument("--net-profile", default=None,
+                        help="Block requests: none|lean|minimal or a custom profile (default: SPEC2IR_NET_PROFILE); "
+                             "an IR tag net:<profile> overrides it")
+    parser.add_argument("--emit-script", metavar="DIR", default=None,
+                        help="Write a standalone Playwright script per IR into DIR instead of running")
+    parser.add_argument("--bundle", metavar="OUT", default=None,
+                        help="Pack the IRs into one JSON-lines bundle (*.irs.jsonl) for --suite instead of running")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", metavar="DIR", default=None,
+                     help="Record each IR's network traffic to DIR/<id>.har")
+    har.add_argument("--replay-har", metavar="DIR", default=None,
+                     help="Serve responses from DIR/<id>.har instead of the target server")
+    parser.add_argument("--har-ignore-query", action="store_true",
+                        help="Replay: match URLs without their query string (default: SPEC2IR_HAR_IGNORE_QUERY)")
+    parser.add_argument("--har-fallback", action="store_true",
+                        help="Replay: send requests missing from the HAR to the network instead of aborting them")
     args = parser.parse_args()
+    if args.share_prefix and (args.record_har or args.replay_har):
+        parser.error("--share-prefix cannot be combined with --record-har/--replay-har")
+
+    if args.emit_script:
+        _emit_scripts(args.suite or [args.ir], args.emit_script)
+        return
+    if args.bundle:
+        _bundle(args.suite or [args.ir], args.bundle)
+        return
+
+    import asyncio
+
+    har_mode = _har_mode(args.record_har, args.replay_har, args.har_ignore_query, args.har_fallback)
+    if args.suite:
+        if not _suite(args.suite, args.concurrency, args.workers, args.trace_dir,
+                      args.share_prefix, args.session_ttl, args.net_profile, har_mode):
+            sys.exit(1)
+        return
 
-    asyncio.run(_main(args.ir))
+    asyncio.run(_main(args.ir, args.trace_dir, args.net_profile, har_mode))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from operator import methodcaller
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from spec2ir.ir_model import Click, ExpectURL, ExpectVisibleText, Fill, Goto, Locator, TestIR, WaitFor
+from spec2ir_runner.trace import StepTimer, describe_step, phase
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+
+_VAR_RE = re.compile(r"\$\{(\w+)\}")
+
+
+def absolute_url(base: str, url: str) -> str:
+    if url.startswith("http"):
+        return url
+    return f"{base.rstrip('/')}/{url.lstrip('/')}"
+
+
+def env_var_name(value: str) -> Optional[str]:
+    """VAR for a whole-value ${VAR} placeholder, else None."""
+    if isinstance(value, str) and value.startswith("${") and value.endswith("}"):
+        return value[2:-1]
+    return None
+
+
+def fill_value(value: str) -> str:
+    """Text a fill types: a whole-value ${VAR} is read from the environment (left as is when unset)."""
+    env = env_var_name(value)
+    return os.getenv(env, value) if env else value
+
+
+def url_pattern(pattern: str, base_url: str = "") -> str:
+    """wait_for URL glob as handed to page.wait_for_url, which applies Playwright's own glob rules.
+
+    Only a pattern starting with '/' is resolved against `base_url`, since
+    runner contexts have no Playwright base_url to resolve it against.
+    """
+    if pattern.startswith("/") and base_url:
+        return absolute_url(base_url, pattern)
+    return pattern
+
+
+def url_suffix(value: str) -> str:
+    """Suffix a url_is expectation checks: the value without a leading ** and trailing *."""
+    if value.startswith("**"):
+        value = value[2:]
+    if value.endswith("*"):
+        value = value[:-1]
+    return value
+
+
+# locator kind -> (Page method, argument builder); shared by compiled plans and emitted scripts
+_LOCATORS: Dict[str, Tuple[str, Callable[[Locator], Tuple[tuple, dict]]]] = {
+    "role": ("get_by_role", lambda loc: ((loc.value,), {"name": loc.name})),
+    "label": ("get_by_label", lambda loc: ((loc.value,), {})),
+    "text": ("get_by_text", lambda loc: ((loc.value,), {})),
+    "testid": ("get_by_test_id", lambda loc: ((loc.value,), {})),
+    "css": ("locator", lambda loc: ((loc.value,), {})),
+    "xpath": ("locator", lambda loc: ((f"xpath={loc.value}",), {})),
+}
+
+
+def locator_call(locator: Locator) -> Tuple[str, tuple, dict]:
+    """(Page method, args, kwargs) that build `locator`."""
+    if locator.kind not in _LOCATORS:
+        raise ValueError(f"Unsupported locator kind: {locator.kind}")
+    method, build = _LOCATORS[locator.kind]
+    args, kwargs = build(locator)
+    return method, args, kwargs
+
+
+StepHandler = Callable[["Page", "PlanStep", Optional[StepTimer]], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    """One action or expectation with everything it needs precomputed.
+
+    `value` is the resolved URL, fill text (${VAR} already substituted),
+    URL glob, selector or expected text/URL suffix; `locate`
+    builds the Playwright locator from a page; `env` keeps the placeholder
+    name so emitted scripts read it at run time instead of embedding it.
+    """
+    kind: str  # "action" | "expect"
+    op: str    # goto|fill|click|wait_url|wait_selector|url_is|visible_text
+    label: Tuple[str, str]  # (op, target) for traces, as describe_step gives for the IR step
+    value: str = ""
+    raw: str = ""  # value as written in the IR
+    locator: Optional[Locator] = None
+    locate: Optional[Callable[[Any], Any]] = field(default=None, compare=False, repr=False)
+    wait_until: str = "domcontentloaded"
+    timeout_ms: Optional[int] = None
+    env: Optional[str] = None
+    handler: Optional[StepHandler] = field(default=None, compare=False, repr=False)
+
+    async def execute(self, page: Page, timer: Optional[StepTimer] = None) -> None:
+        await self.handler(page, self, timer)
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    ir_id: str
+    desc: str
+    base_url: str
+    ignore_https_errors: bool
+    tags: Tuple[str, ...]
+    actions: Tuple[PlanStep, ...]
+    expects: Tuple[PlanStep, ...]
+
+
+async def _goto(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    with phase(timer, "act"):
+        await page.goto(step.value, wait_until=step.wait_until)
+
+
+async def _fill_or_click(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    with phase(timer, "resolve"):
+        locator = step.locate(page)
+    # Playwright's actionability wait happens inside fill/click and counts as "act"; a separate
+    # wait_for() here would wait for a different condition than untraced runs do
+    with phase(timer, "act"):
+        if step.op == "fill":
+            await locator.fill(step.value)
+        else:
+            await locator.click()
+
+
+async def _wait_url(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    with phase(timer, "wait"):
+        await page.wait_for_url(step.value, timeout=step.timeout_ms)
+
+
+async def _wait_selector(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    with phase(timer, "wait"):
+        await page.wait_for_selector(step.value, timeout=step.timeout_ms)
+
+
+async def _expect_url(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    current = page.url
+    if step.value and not current.endswith(step.value):
+        raise AssertionError(f"URL mismatch. expected suffix {step.raw}, got {current}")
+
+
+async def _expect_text(page: Page, step: PlanStep, timer: Optional[StepTimer]) -> None:
+    with phase(timer, "wait"):
+        await step.locate(page).wait_for()
+
+
+def _compile_action(ir: TestIR, action) -> PlanStep:
+    label = describe_step(action)
+    if isinstance(action, Goto):
+        url = absolute_url(ir.env_base_url, action.url)
+        return PlanStep("action", "goto", (label[0], url), url, action.url, wait_until=action.wait_until,
+                        handler=_goto)
+    if isinstance(action, (Fill, Click)):
+        method, args, kwargs = locator_call(action.locator)
+        locate = methodcaller(method, *args, **kwargs)
+        if isinstance(action, Click):
+            return PlanStep("action", "click", label, locator=action.locator, locate=locate,
+                            handler=_fill_or_click)
+        return PlanStep("action", "fill", label, fill_value(action.value), action.value, action.locator, locate,
+                        env=env_var_name(action.value), handler=_fill_or_click)
+    if isinstance(action, WaitFor):
+        if action.target == "url":
+            return PlanStep("action", "wait_url", label, url_pattern(action.value, ir.env_base_url),
+                            action.value, timeout_ms=action.timeout_ms, handler=_wait_url)
+        selector = f"text={action.value}" if action.target == "text" else action.value
+        return PlanStep("action", "wait_selector", label, selector, action.value, timeout_ms=action.timeout_ms,
+                        handler=_wait_selector)
+    raise ValueError(f"Unsupported action: {action}")
+
+
+def _compile_expect(expect) -> PlanStep:
+    label = describe_step(expect)
+    if isinstance(expect, ExpectURL):
+        return PlanStep("expect", "url_is", label, url_suffix(expect.value), expect.value, handler=_expect_url)
+    if isinstance(expect, ExpectVisibleText):
+        return PlanStep("expect", "visible_text", label, expect.value, expect.value,
+                        locate=methodcaller("get_by_text", expect.value), handler=_expect_text)
+    raise ValueError(f"Unsupported expectation: {expect}")
+
+
+def compile_plan(ir: TestIR) -> ExecutionPlan:
+    """Turn a validated IR into an immutable plan; the IR itself is left untouched.
+
+    Goto URLs are resolved against env_base_url, ${VAR} fill values are read
+    from the environment now, locator factories are bound and wait_for URL
+    globs starting with '/' made absolute, so executing a step does no
+    dispatch or parsing.
+    """
+    return ExecutionPlan(
+        ir_id=ir.id,
+        desc=ir.desc,
+        base_url=ir.env_base_url,
+        ignore_https_errors=ir.ignore_https_errors,
+        tags=tuple(ir.tags),
+        actions=tuple(_compile_action(ir, a) for a in ir.actions),
+        expects=tuple(_compile_expect(e) for e in ir.expects),
+    )
+
+
+@dataclass
+class PlanCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def __str__(self) -> str:
+        return f"[PLAN] {self.misses} IRs compiled, {self.hits} plans reused"
+
+
+class PlanCache:
+    """Compiled plans keyed by IR content plus the values of the ${VAR}s it references."""
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self.stats = PlanCacheStats()
+        self._plans: "OrderedDict[str, ExecutionPlan]" = OrderedDict()
+
+    @staticmethod
+    def key(ir: TestIR) -> str:
+        material = ir.model_dump_json()
+        env = sorted((name, os.getenv(name)) for name in set(_VAR_RE.findall(material)))
+        return hashlib.sha256(f"{material}\0{env!r}".encode("utf-8")).hexdigest()
+
+    def get(self, ir: TestIR) -> ExecutionPlan:
+        key = self.key(ir)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self.stats.hits += 1
+            self._plans.move_to_end(key)
+            return plan
+        self.stats.misses += 1
+        plan = compile_plan(ir)
+        self._plans[key] = plan
+        while len(self._plans) > self.max_entries:
+            self._plans.popitem(last=False)
+        return plan
+
+
+PLAN_CACHE = PlanCache()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.ir_model import Goto, TestIR, WaitFor
+from spec2ir.netprofile import NetworkProfile, apply_profile, profile_for_tags
+from spec2ir_runner.plan import PLAN_CACHE, absolute_url
+from spec2ir_runner.runner import SessionSeed, launch_browser
+
+
+def _action_key(ir: TestIR, action) -> str:
+    data = action.model_dump(exclude={"step"})
+    if isinstance(action, Goto):
+        data["url"] = absolute_url(ir.env_base_url, action.url)
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
+
+
+def _prefix_ids(ir: TestIR, net_profile: Optional[NetworkProfile] = None) -> List[str]:
+    """Rolling hash per prefix length: ids[i] identifies ir.actions[:i + 1] (plus browser context settings).
+
+    The context settings include the request-blocking profile the IR resolves
+    to, so IRs tagged with different `net:` profiles never share a session.
+    """
+    # the name profile_for_tags() resolves to; an unknown one then fails in that IR's own run, not here
+    profile = next((t[len("net:"):] for t in ir.tags if t.startswith("net:")),
+                   net_profile.name if net_profile is not None else None)
+    context = [ir.env_base_url.rstrip("/"), ir.ignore_https_errors, profile]
+    h = hashlib.sha256(json.dumps(context).encode("utf-8"))
+    ids = []
+    for action in ir.actions:
+        h.update(_action_key(ir, action).encode("utf-8"))
+        ids.append(h.copy().hexdigest())
+    return ids
+
+
+def plan_shared_prefixes(irs: Dict[str, TestIR], min_shared: int = 2, min_length: int = 2,
+                         net_profile: Optional[NetworkProfile] = None) -> Dict[str, Tuple[str, int]]:
+    """Map IR path -> (prefix id, length) for the longest prefix shared by at least `min_shared` IRs.
+
+    Prefixes may only end after a goto or wait_for, where the page has settled
+    and its URL is a meaningful place to resume from.
+    """
+    ids = {path: _prefix_ids(ir, net_profile) for path, ir in irs.items()}
+    counts = Counter(pid for pids in ids.values() for pid in pids)
+    plans: Dict[str, Tuple[str, int]] = {}
+    for path, ir in irs.items():
+        for i in range(len(ir.actions) - 1, min_length - 2, -1):
+            if not isinstance(ir.actions[i], (Goto, WaitFor)):
+                continue
+            if counts[ids[path][i]] >= min_shared:
+                plans[path] = (ids[path][i], i + 1)
+                break
+    return plans
+
+
+@dataclass
+class PrefixStats:
+    prefixes: int = 0
+    hits: int = 0
+    misses: int = 0
+    failures: int = 0
+    actions_skipped: int = 0
+    fallbacks: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"[PREFIX] {self.prefixes} shared prefixes, sessions reused {self.hits}x, captured {self.misses}x, "
+            f"{self.actions_skipped} actions skipped, {self.failures} capture failures, {self.fallbacks} full reruns"
+        )
+
+
+class SharedPrefixRunner:
+    """Runs each shared action prefix once, caches its storage_state, and seeds later IRs with it.
+
+    Cached sessions expire after `ttl_sec` (default SPEC2IR_SESSION_TTL_SEC or
+    600s) and are then captured again. Concurrent requests for the same prefix
+    wait for a single capture.
+    """
+
+    def __init__(self, pool: BrowserPool, ttl_sec: Optional[float] = None, min_shared: int = 2,
+                 net_profile: Optional[NetworkProfile] = None) -> None:
+        self.pool = pool
+        self.net_profile = net_profile
+        self.ttl_sec = ttl_sec if ttl_sec is not None else float(os.getenv("SPEC2IR_SESSION_TTL_SEC", "600"))
+        self.min_shared = min_shared
+        self.stats = PrefixStats()
+        self._plans: Dict[str, Tuple[str, int]] = {}
+        self._sessions: Dict[str, SessionSeed] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._failed: set = set()
+
+    def plan(self, irs: Dict[str, TestIR]) -> None:
+        self._plans = plan_shared_prefixes(irs, self.min_shared, net_profile=self.net_profile)
+        self.stats.prefixes = len({pid for pid, _ in self._plans.values()})
+
+    async def _capture(self, ir: TestIR, length: int) -> SessionSeed:
+        async with launch_browser(self.pool) as page:
+            profile = profile_for_tags(ir.tags, self.net_profile)
+            if profile is not None:
+                await apply_profile(page.context, profile, first_party_urls=[ir.env_base_url])
+            for step in PLAN_CACHE.get(ir).actions[:length]:
+                await step.execute(page)
+            state = await page.context.storage_state()
+            return SessionSeed(state, page.url, length, time.time())
+
+    async def seed_for(self, path: str, ir: TestIR) -> Optional[SessionSeed]:
+        plan = self._plans.get(path)
+        if plan is None:
+            return None
+        prefix_id, length = plan
+        if prefix_id in self._failed:
+            return None
+        lock = self._locks.setdefault(prefix_id, asyncio.Lock())
+        async with lock:
+            seed = self._sessions.get(prefix_id)
+            if seed is not None and time.time() - seed.created_at < self.ttl_sec:
+                self.stats.hits += 1
+                self.stats.actions_skipped += length
+            else:
+                try:
+                    seed = await self._capture(ir, length)
+                except Exception:
+                    self.stats.failures += 1
+                    self._failed.add(prefix_id)
+                    return None
+                self._sessions[prefix_id] = seed
+                self.stats.misses += 1
+        return seed
@@ -3,11 +3,19 @@ from __future__ import annotations
 import asyncio
 import os
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Optional
 
-from playwright.async_api import async_playwright, Page
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.har import HarMode, HarReplayer, record_context_kwargs
+from spec2ir.ir_model import TestIR
+from spec2ir.netprofile import NetworkProfile, NetworkStats, apply_profile, profile_for_tags
+from spec2ir_runner.loader import default_loader
+from spec2ir_runner.plan import PLAN_CACHE, ExecutionPlan
+from spec2ir_runner.trace import RunTrace
 
-from spec2ir.ir_model import TestIR, Goto, Fill, Click, WaitFor, ExpectURL, ExpectVisibleText
+if TYPE_CHECKING:
+    from playwright.async_api import Page
 
 
 _TRUE_VALUES = {"1", "true", "yes", "on"}
@@ -20,91 +28,89 @@ def _env_flag(name: str, default: bool = False) -> bool:
     return raw.strip().lower() in _TRUE_VALUES
 
 
+@dataclass
+class SessionSeed:
+    """Browser state captured after running the first `actions` steps of an IR."""
+    storage_state: Dict[str, Any]
+    url: str
+    actions: int
+    created_at: float = 0.0
+
+
+class SeedRejected(RuntimeError):
+    """A seeded run could not resume: restoring the session failed or the seed URL redirected elsewhere."""
+
+
 @asynccontextmanager
-async def launch_browser() -> AsyncIterator[Page]:
-    headless = _env_flag("SPEC2IR_HEADLESS", True)
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context(ignore_https_errors=True)
-        page = await context.new_page()
-        try:
-            yield page
-        finally:
-            await context.close()
-            await browser.close()
-
-
-def _resolve_value(value: str) -> str:
-    if isinstance(value, str) and value.startswith("${") and value.endswith("}"):
-        key = value[2:-1]
-        return os.getenv(key, value)
-    return value
-
-
-async def _run_action(page: Page, action):
-    if isinstance(action, Goto):
-        await page.goto(action.url, wait_until=action.wait_until)
-        return
-    if isinstance(action, Fill):
-        locator = _resolve_locator(page, action.locator)
-        await locator.fill(_resolve_value(action.value))
+async def launch_browser(pool: Optional[BrowserPool] = None, **context_kwargs) -> AsyncIterator[Page]:
+    """Yield a page in a fresh context, borrowed from `pool` when one is given."""
+    context_kwargs.setdefault("ignore_https_errors", True)
+    if pool is not None:
+        async with pool.context(**context_kwargs) as context:
+            yield await context.new_page()
         return
-    if isinstance(action, Click):
-        locator = _resolve_locator(page, action.locator)
-        await locator.click()
-        return
-    if isinstance(action, WaitFor):
-        if action.target == "url":
-            await page.wait_for_url(action.value, timeout=action.timeout_ms)
-        elif action.target == "text":
-            await page.wait_for_selector(f"text={action.value}", timeout=action.timeout_ms)
-        else:  # selector
-            await page.wait_for_selector(action.value, timeout=action.timeout_ms)
-        return
-    raise ValueError(f"Unsupported action: {action}")
-
-
-def _resolve_locator(page: Page, locator):
-    kind = locator.kind
-    value = locator.value
-    if kind == "role":
-        return page.get_by_role(value, name=locator.name)
-    if kind == "label":
-        return page.get_by_label(value)
-    if kind == "text":
-        return page.get_by_text(value)
-    if kind == "testid":
-        return page.get_by_test_id(value)
-    if kind == "css":
-        return page.locator(value)
-    if kind == "xpath":
-        return page.locator(f"xpath={value}")
-    raise ValueError(f"Unsupported locator kind: {kind}")
-
-
-async def _verify_expectation(page: Page, expect):
-    if isinstance(expect, ExpectURL):
-        current = page.url
-        expected = expect.value
-        if expected.startswith("**"):
-            expected = expected[2:]
-        if expected.endswith("*"):
-            expected = expected[:-1]
-        if expected and not current.endswith(expected):
-            raise AssertionError(f"URL mismatch. expected suffix {expect.value}, got {current}")
-        return
-    if isinstance(expect, ExpectVisibleText):
-        await page.get_by_text(expect.value).wait_for()
-        return
-    raise ValueError(f"Unsupported expectation: {expect}")
-
-
-async def run_ir(ir: TestIR) -> None:
-    async with launch_browser() as page:
-        base = ir.env_base_url.rstrip("/")
-        for action in ir.actions:
-            if isinstance(action, Goto) and not action.url.startswith("http"):
-                action.url = f"{base}/{action.url.lstrip('/')}"
-            await _run_action(page, action)
-        for expect in ir.expects:
-            await _verify_expectation(page, expect)
+    headless = _env_flag("SPEC2IR_HEADLESS", True)
+    async with BrowserPool(size=1, headless=headless) as own_pool:
+        async with own_pool.context(**context_kwargs) as context:
+            yield await context.new_page()
+
+
+def load_ir(path: str) -> TestIR:
+    return default_loader().load(path)
+
+
+async def run_ir(ir: TestIR, pool: Optional[BrowserPool] = None, trace: Optional[RunTrace] = None,
+                 seed: Optional[SessionSeed] = None, net_profile: Optional[NetworkProfile] = None,
+                 net_stats: Optional[NetworkStats] = None, har: Optional[HarMode] = None) -> None:
+    """Execute `ir` via its compiled plan (reused from PLAN_CACHE for an unchanged IR); see run_plan."""
+    await run_plan(PLAN_CACHE.get(ir), pool, trace, seed, net_profile, net_stats, har)
+
+
+async def run_plan(plan: ExecutionPlan, pool: Optional[BrowserPool] = None, trace: Optional[RunTrace] = None,
+                   seed: Optional[SessionSeed] = None, net_profile: Optional[NetworkProfile] = None,
+                   net_stats: Optional[NetworkStats] = None, har: Optional[HarMode] = None) -> None:
+    """Execute `plan`; when `trace` is given, per-step resolve/wait/act wall time is recorded into it.
+
+    With `seed`, the context starts from the seed's storage_state at the seed's
+    URL and the first `seed.actions` actions are skipped; SeedRejected is
+    raised if the page does not come up at that URL (an expired session
+    usually redirects to the login page). `net_profile` (or an
+    IR tag `net:<profile>`) blocks matching requests; counts go to `net_stats`.
+    With `har`, the run's traffic is recorded to, or served from, the IR's HAR
+    file instead of the target server (see spec2ir.har).
+    """
+    context_kwargs = {"storage_state": seed.storage_state} if seed is not None else {}
+    replayer = None
+    if har is not None and har.mode == "record":
+        context_kwargs.update(record_context_kwargs(har.path_for(plan.ir_id)))
+    elif har is not None:
+        replayer = HarReplayer(har.path_for(plan.ir_id), har.options)
+    async with launch_browser(pool, **context_kwargs) as page:
+        profile = profile_for_tags(plan.tags, net_profile)
+        if profile is not None:
+            await apply_profile(page.context, profile, net_stats, first_party_urls=[plan.base_url])
+        if replayer is not None:
+            # registered last so it sees requests first; unmatched ones are aborted, or with
+            # not_found="fallback" passed on to the profile route
+            await replayer.attach(page.context, har.stats)
+        start = 0
+        if seed is not None:
+            try:
+                await page.goto(seed.url, wait_until="domcontentloaded")
+            except Exception as exc:
+                raise SeedRejected(f"could not restore session at {seed.url}: {exc}") from exc
+            if page.url != seed.url:
+                raise SeedRejected(f"restored session landed on {page.url} instead of {seed.url}")
+            start = seed.actions
+        for i, step in enumerate(plan.actions[start:], start):
+            if trace is None:
+                await step.execute(page)
+                continue
+            with trace.step("action", i, step) as timer:
+                await step.execute(page, timer)
+        for i, step in enumerate(plan.expects):
+            if trace is None:
+                await step.execute(page)
+                continue
+            with trace.step("expect", i, step) as timer:
+                await step.execute(page, timer)
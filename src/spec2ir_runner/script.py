@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import List, Optional, Set
+
+from spec2ir_runner.plan import ExecutionPlan, PlanStep, locator_call
+
+
+_HEADER = '''#!/usr/bin/env python3
+"""{ir_id}: {desc}
+
+Generated by spec2ir_runner from {source}; needs only Playwright
+(pip install playwright && playwright install chromium). ${{VAR}} fill
+values are read from the environment; SPEC2IR_HEADLESS=0 shows the browser.
+"""
+import os
+
+from playwright.sync_api import sync_playwright
+
+
+def main() -> None:
+    headless = os.getenv("SPEC2IR_HEADLESS", "1").strip().lower() in ("1", "true", "yes", "on")
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        context = browser.new_context(ignore_https_errors={ignore_https_errors!r})
+        page = context.new_page()
+'''
+
+_FOOTER = '''        browser.close()
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+def _call(method: str, args: tuple, kwargs: dict) -> str:
+    params = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items() if v is not None]
+    return f"{method}({', '.join(params)})"
+
+
+def _statement(step: PlanStep) -> str:
+    if step.op == "goto":
+        return f"page.goto({step.value!r}, wait_until={step.wait_until!r})"
+    if step.op in ("fill", "click"):
+        target = f"page.{_call(*locator_call(step.locator))}"
+        if step.op == "click":
+            return f"{target}.click()"
+        value = f"os.getenv({step.env!r}, {step.raw!r})" if step.env else repr(step.raw)
+        return f"{target}.fill({value})"
+    if step.op == "wait_url":
+        return f"page.wait_for_url({step.value!r}, timeout={step.timeout_ms})"
+    if step.op == "wait_selector":
+        return f"page.wait_for_selector({step.value!r}, timeout={step.timeout_ms})"
+    if step.op == "url_is":
+        if not step.value:
+            return "pass"
+        message = f"URL mismatch. expected suffix {step.raw}, got "
+        return (f"if not page.url.endswith({step.value!r}):\n"
+                f"    raise AssertionError({message!r} + page.url)")
+    if step.op == "visible_text":
+        return f"page.get_by_text({step.value!r}).wait_for()"
+    raise ValueError(f"Unsupported plan step: {step.op}")
+
+
+def _docstring_text(text: str) -> str:
+    """`text` made safe to place inside the generated script's triple-quoted docstring."""
+    return text.replace('"""', "'''").replace("\\", "\\\\")
+
+
+def plan_to_script(plan: ExecutionPlan, source: str = "IR") -> str:
+    """Standalone Playwright (sync API) script performing `plan`; it imports neither pydantic nor spec2ir.
+
+    Request-blocking profiles and shared-prefix sessions are runner features
+    and are not part of the script.
+    """
+    lines: List[str] = [_HEADER.format(ir_id=_docstring_text(plan.ir_id), desc=_docstring_text(plan.desc),
+                                       source=_docstring_text(source),
+                                       ignore_https_errors=plan.ignore_https_errors)]
+    for i, step in enumerate(plan.actions + plan.expects):
+        index = i if step.kind == "action" else i - len(plan.actions)
+        comment = f"{step.kind}[{index}] {step.label[0]} {step.label[1]}".replace("\n", " ")
+        lines.append(f"        # {comment}\n")
+        lines.extend(f"        {line}\n" for line in _statement(step).splitlines())
+    lines.append(_FOOTER)
+    return "".join(lines)
+
+
+def script_file_name(ir_id: str, taken: Optional[Set[str]] = None) -> str:
+    """`<id>.py`; with `taken`, numbered (`<id>_2.py`, ...) when already used, and recorded there."""
+    stem = re.sub(r"[^A-Za-z0-9_]+", "_", ir_id)
+    name = f"{stem}.py"
+    if taken is not None:
+        n = 2
+        while name in taken:
+            name = f"{stem}_{n}.py"
+            n += 1
+        taken.add(name)
+    return name
+
+
+def write_script(plan: ExecutionPlan, directory: str, source: str = "IR", taken: Optional[Set[str]] = None) -> str:
+    """Write `plan`'s script into `directory`; share `taken` across one run so no script overwrites another."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, script_file_name(plan.ir_id, taken))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(plan_to_script(plan, source))
+    return path
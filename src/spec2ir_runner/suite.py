@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Collection, Dict, Iterable, List, Optional, Tuple, Union
+
+from spec2ir.browser_pool import BrowserPool
+from spec2ir.har import HarMode
+from spec2ir.ir_model import TestIR
+from spec2ir.netprofile import NetworkProfile, NetworkStats, get_profile
+from spec2ir_runner.loader import BUNDLE_SUFFIX, IRLoader, bundle_entry_name, bundle_line_numbers, is_bundle
+from spec2ir_runner.prefix import SharedPrefixRunner
+from spec2ir_runner.runner import SeedRejected, load_ir, run_ir
+from spec2ir_runner.trace import RunTrace, format_slowest, suite_report, write_trace
+
+
+_IR_SUFFIXES = (".ir.yaml", ".ir.yml", BUNDLE_SUFFIX)
+
+
+def collect_ir_paths(inputs: Iterable[str]) -> List[str]:
+    """Expand files, directories (IR YAML and bundles inside) and globs into a de-duplicated, sorted list."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                found.update(os.path.join(root, f) for f in files if f.endswith(_IR_SUFFIXES))
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            found.update(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(found)
+
+
+@dataclass
+class IRResult:
+    path: str
+    ok: bool
+    elapsed_sec: float
+    error: Optional[str] = None
+    trace: Optional[RunTrace] = None
+    net: Optional[NetworkStats] = None
+
+
+@dataclass
+class SuiteResult:
+    items: List[IRResult] = field(default_factory=list)
+    wall_sec: float = 0.0
+
+    @property
+    def passed(self) -> List[IRResult]:
+        return [x for x in self.items if x.ok]
+
+    @property
+    def failed(self) -> List[IRResult]:
+        return [x for x in self.items if not x.ok]
+
+    @property
+    def tests_per_minute(self) -> float:
+        return len(self.items) / self.wall_sec * 60 if self.wall_sec else 0.0
+
+    @property
+    def traces(self) -> List[RunTrace]:
+        return [x.trace for x in self.items if x.trace is not None]
+
+    @property
+    def net_stats(self) -> Optional[NetworkStats]:
+        stats = [x.net for x in self.items if x.net is not None]
+        if not stats:
+            return None
+        total = NetworkStats()
+        for s in stats:
+            total.merge(s)
+        return total
+
+    def summary(self) -> str:
+        line = (
+            f"[SUITE] {len(self.passed)} passed, {len(self.failed)} failed, {len(self.items)} total "
+            f"in {self.wall_sec:.2f}s ({self.tests_per_minute:.1f} tests/min)"
+        )
+        net = self.net_stats
+        return f"{line}\n{net}" if net is not None and net.requests else line
+
+
+async def _run_one(path: str, pool: BrowserPool, trace_dir: Optional[str] = None,
+                   ir: Union[TestIR, Exception, None] = None, prefixes: Optional[SharedPrefixRunner] = None,
+                   net_profile: Optional[NetworkProfile] = None, har: Optional[HarMode] = None) -> IRResult:
+    started = time.perf_counter()
+    trace = None
+    net = NetworkStats()
+    try:
+        if isinstance(ir, Exception):
+            raise ir  # failed in the bulk load
+        ir = ir or load_ir(path)
+        trace = RunTrace(ir.id, source=path) if trace_dir else None
+        seed = await prefixes.seed_for(path, ir) if prefixes is not None else None
+        try:
+            await run_ir(ir, pool=pool, trace=trace, seed=seed, net_profile=net_profile, net_stats=net, har=har)
+        except SeedRejected:
+            # only a session that could not be resumed is retried; failures after that are the IR's own
+            prefixes.stats.fallbacks += 1
+            trace = RunTrace(ir.id, source=path) if trace_dir else None
+            await run_ir(ir, pool=pool, trace=trace, net_profile=net_profile, net_stats=net)
+    except Exception as exc:
+        result = IRResult(path, False, time.perf_counter() - started, f"{type(exc).__name__}: {exc}", trace, net)
+        print(f"[FAIL] {path}: {result.error}", flush=True)
+    else:
+        result = IRResult(path, True, time.perf_counter() - started, trace=trace, net=net)
+        print(f"[PASS] {path} ({result.elapsed_sec:.2f}s)", flush=True)
+    if trace is not None:
+        write_trace(trace, trace_dir)
+    return result
+
+
+async def run_suite(paths: List[str], concurrency: int = 4, pool: Optional[BrowserPool] = None,
+                    trace_dir: Optional[str] = None, share_prefix: bool = False,
+                    session_ttl_sec: Optional[float] = None, net_profile: Optional[str] = None,
+                    har: Optional[HarMode] = None,
+                    bundle_lines: Optional[Dict[str, Collection[int]]] = None) -> SuiteResult:
+    """Run IRs as up to `concurrency` isolated contexts; one IR failing never aborts the others.
+
+    IR files and bundles are loaded up front through one IRLoader; a bundle
+    contributes one result per IR, named `<bundle>:<line>`. With `share_prefix`,
+    action prefixes common to several IRs (typically the login sequence) run
+    once and later IRs start from the saved storage_state. `net_profile` names
+    a request-blocking profile (IR tags `net:<name>` override it). `har`
+    records each IR's traffic or replays it offline; it cannot be combined
+    with `share_prefix`, whose seeded runs skip part of the traffic.
+    `bundle_lines` limits a bundle to some of its IRs (see IRLoader.load_all).
+    """
+    if har is not None and share_prefix:
+        raise ValueError("HAR record/replay cannot be combined with shared prefixes")
+    sem = asyncio.Semaphore(max(1, concurrency))
+    profile = get_profile(net_profile)
+    loader = IRLoader()
+    entries = loader.load_all(paths, bundle_lines)
+    print(loader.stats, flush=True)
+
+    async def run_all(pool: BrowserPool) -> List[IRResult]:
+        prefixes = None
+        if share_prefix:
+            prefixes = SharedPrefixRunner(pool, session_ttl_sec, net_profile=profile)
+            prefixes.plan({name: ir for name, ir in entries if isinstance(ir, TestIR)})
+
+        async def guarded(name: str, ir: Union[TestIR, Exception]) -> IRResult:
+            async with sem:
+                return await _run_one(name, pool, trace_dir, ir, prefixes, profile, har)
+
+        results = await asyncio.gather(*(guarded(name, ir) for name, ir in entries))
+        if prefixes is not None:
+            print(prefixes.stats, flush=True)
+        if har is not None and har.mode == "replay":
+            print(har.stats, flush=True)
+        return list(results)
+
+    started = time.perf_counter()
+    if pool is not None:
+        items = await run_all(pool)
+    else:
+        async with BrowserPool(size=1, max_contexts_per_browser=concurrency) as own_pool:
+            items = await run_all(own_pool)
+    return SuiteResult(items=items, wall_sec=time.perf_counter() - started)
+
+
+_WorkItem = Tuple[str, Optional[int]]  # (IR file, None) or (bundle, line number of one IR in it)
+
+
+def _work_items(paths: List[str]) -> List[_WorkItem]:
+    """One item per IR, so a large bundle is spread over workers like the files are."""
+    items: List[_WorkItem] = []
+    for path in paths:
+        try:
+            lines = bundle_line_numbers(path) if is_bundle(path) else None
+        except (OSError, ValueError):
+            lines = None  # loading it again in a worker reports the error
+        if lines is None:
+            items.append((path, None))
+        else:
+            items.extend((path, lineno) for lineno in lines)
+    return items
+
+
+def _run_chunk(chunk: List[_WorkItem], concurrency: int, trace_dir: Optional[str], share_prefix: bool,
+               session_ttl_sec: Optional[float], net_profile: Optional[str],
+               har: Optional[HarMode]) -> List[IRResult]:
+    paths = list(dict.fromkeys(path for path, _ in chunk))
+    bundle_lines: Dict[str, set] = {}
+    for path, line in chunk:
+        if line is not None:
+            bundle_lines.setdefault(path, set()).add(line)
+    return asyncio.run(run_suite(paths, concurrency, trace_dir=trace_dir, share_prefix=share_prefix,
+                                 session_ttl_sec=session_ttl_sec, net_profile=net_profile, har=har,
+                                 bundle_lines=bundle_lines)).items
+
+
+def run_suite_processes(paths: List[str], workers: int, concurrency: int = 1,
+                        trace_dir: Optional[str] = None, share_prefix: bool = False,
+                        session_ttl_sec: Optional[float] = None, net_profile: Optional[str] = None,
+                        har: Optional[HarMode] = None) -> SuiteResult:
+    """Split the suite across `workers` processes, each with its own browser and `concurrency` contexts.
+
+    Bundles are split IR by IR, so one bundle still uses every worker.
+    """
+    items = _work_items(paths)
+    workers = max(1, min(workers, len(items)))
+    chunks = [items[i::workers] for i in range(workers)]
+    started = time.perf_counter()
+    results: List[IRResult] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_chunk, chunk, concurrency, trace_dir, share_prefix, session_ttl_sec,
+                                   net_profile, har) for chunk in chunks if chunk]
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.extend(future.result())
+            except Exception as exc:
+                results.extend(IRResult(p if line is None else bundle_entry_name(p, line), False, 0.0,
+                                        f"worker crashed: {type(exc).__name__}: {exc}") for p, line in chunk)
+    results.sort(key=lambda r: r.path)
+    return SuiteResult(items=results, wall_sec=time.perf_counter() - started)
+
+
+def write_suite_report(result: SuiteResult, trace_dir: str, top: int = 20) -> str:
+    """Write suite-report.json (slowest steps, per-op totals) and return the console summary."""
+    report = suite_report(result.traces, top=top)
+    report["wall_sec"] = result.wall_sec
+    report["tests_per_minute"] = result.tests_per_minute
+    os.makedirs(trace_dir, exist_ok=True)
+    with open(os.path.join(trace_dir, "suite-report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return format_slowest(report)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, List, Optional
+
+
+@dataclass
+class StepTiming:
+    kind: str            # "action" | "expect"
+    index: int
+    op: str
+    target: str
+    start_ms: float      # relative to the start of the run
+    resolve_ms: float = 0.0
+    wait_ms: float = 0.0
+    act_ms: float = 0.0
+    ok: bool = True
+    error: Optional[str] = None
+
+    @property
+    def total_ms(self) -> float:
+        return self.resolve_ms + self.wait_ms + self.act_ms
+
+
+class StepTimer:
+    """Accumulates wall time per phase (resolve / wait / act) of one step."""
+
+    def __init__(self, timing: StepTiming) -> None:
+        self.timing = timing
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            attr = f"{name}_ms"
+            setattr(self.timing, attr, getattr(self.timing, attr) + (time.perf_counter() - started) * 1000)
+
+
+def phase(timer: Optional[StepTimer], name: str):
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+def describe_step(step) -> tuple[str, str]:
+    """(op, target) label for an action or expectation (or a compiled PlanStep)."""
+    label = getattr(step, "label", None)
+    if label is not None:
+        return label
+    op = getattr(step, "op", None) or getattr(step, "kind", type(step).__name__)
+    locator = getattr(step, "locator", None)
+    if locator is not None:
+        target = f"{locator.kind}={locator.value}" + (f"[name={locator.name}]" if locator.name else "")
+    elif hasattr(step, "url"):
+        target = step.url
+    elif hasattr(step, "target"):
+        target = f"{step.target}:{step.value}"
+    else:
+        target = str(getattr(step, "value", ""))
+    return op, target
+
+
+@dataclass
+class RunTrace:
+    ir_id: str
+    source: str = ""
+    started_at: float = field(default_factory=time.time)
+    total_ms: float = 0.0
+    steps: List[StepTiming] = field(default_factory=list)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+
+    @contextmanager
+    def step(self, kind: str, index: int, step) -> Iterator[StepTimer]:
+        op, target = describe_step(step)
+        timing = StepTiming(kind, index, op, target, (time.perf_counter() - self._t0) * 1000)
+        self.steps.append(timing)
+        try:
+            yield StepTimer(timing)
+        except BaseException as exc:
+            timing.ok = False
+            timing.error = f"{type(exc).__name__}: {exc}".splitlines()[0]
+            raise
+        finally:
+            self.total_ms = (time.perf_counter() - self._t0) * 1000
+
+    def to_chrome_trace(self) -> dict:
+        """Chrome trace-event format (load in chrome://tracing or Perfetto)."""
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": self.ir_id}}]
+        for s in self.steps:
+            ts = s.start_ms * 1000
+            events.append({
+                "name": f"{s.kind}[{s.index}] {s.op}", "cat": s.kind, "ph": "X", "pid": 1, "tid": 1,
+                "ts": ts, "dur": s.total_ms * 1000,
+                "args": {"target": s.target, "ok": s.ok, "error": s.error},
+            })
+            for name in ("resolve", "wait", "act"):
+                dur = getattr(s, f"{name}_ms") * 1000
+                if dur > 0:
+                    events.append({"name": name, "cat": "phase", "ph": "X", "pid": 1, "tid": 1,
+                                   "ts": ts, "dur": dur})
+                    ts += dur
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"ir_id": self.ir_id, "source": self.source, "total_ms": self.total_ms}}
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("_t0", None)
+        return data
+
+
+def trace_file_name(ir_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", ir_id) + ".trace.json"
+
+
+def write_trace(trace: RunTrace, directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, trace_file_name(trace.ir_id))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_chrome_trace(), f, ensure_ascii=False)
+    return path
+
+
+def suite_report(traces: List[RunTrace], top: int = 20) -> dict:
+    """Aggregate traces: slowest individual steps plus totals per op."""
+    steps = [(t, s) for t in traces for s in t.steps]
+    steps.sort(key=lambda ts: ts[1].total_ms, reverse=True)
+    by_op: dict = {}
+    for _, s in steps:
+        agg = by_op.setdefault(s.op, {"count": 0, "total_ms": 0.0, "wait_ms": 0.0, "act_ms": 0.0, "resolve_ms": 0.0})
+        agg["count"] += 1
+        for key in ("total_ms", "wait_ms", "act_ms", "resolve_ms"):
+            agg[key] += getattr(s, key)
+    return {
+        "runs": [{"ir_id": t.ir_id, "source": t.source, "total_ms": t.total_ms} for t in traces],
+        "slowest_steps": [
+            {"ir_id": t.ir_id, "source": t.source, **asdict(s), "total_ms": s.total_ms}
+            for t, s in steps[:top]
+        ],
+        "by_op": by_op,
+    }
+
+
+def format_slowest(report: dict, top: int = 10) -> str:
+    lines = ["[TRACE] slowest steps:"]
+    for s in report["slowest_steps"][:top]:
+        lines.append(
+            f"  {s['total_ms']:9.1f} ms  (wait {s['wait_ms']:.0f} / act {s['act_ms']:.0f})  "
+            f"{s['ir_id']} {s['kind']}[{s['index']}] {s['op']} {s['target']}"
+        )
+    return "\n".join(lines)
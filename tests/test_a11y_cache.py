@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from spec2ir.a11y_cache import A11ySnapshotCache
+
+
+def test_concurrent_gets_share_one_capture(tmp_path) -> None:
+    cache = A11ySnapshotCache(cache_dir=str(tmp_path), ttl_sec=60)
+    captures = []
+
+    async def capture():
+        captures.append(1)
+        await asyncio.sleep(0.01)
+        return {"role": "main"}
+
+    async def main():
+        return await asyncio.gather(*(cache.get("http://app.test/", {}, capture) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"role": "main"}] * 5
+    assert len(captures) == 1 and cache.stats.coalesced == 4
+
+
+def test_waiter_recaptures_when_the_capturing_task_is_cancelled(tmp_path) -> None:
+    cache = A11ySnapshotCache(cache_dir=str(tmp_path), ttl_sec=60)
+    started = []
+
+    async def capture():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return len(started)
+
+    async def main():
+        first = asyncio.create_task(cache.get("u", {}, capture))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get("u", {}, capture))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await waiter
+
+    assert asyncio.run(main()) == 2
+    assert cache.stats.misses == 2
+
+
+def test_expired_files_are_deleted(tmp_path) -> None:
+    cache = A11ySnapshotCache(cache_dir=str(tmp_path), ttl_sec=60)
+
+    async def capture():
+        return {"role": "main"}
+
+    asyncio.run(cache.get("old", {}, capture))
+    old = cache._path(cache.cache_key("old", {}))
+    stale = time.time() - 3600
+    os.utime(old, (stale, stale))
+    later = A11ySnapshotCache(cache_dir=str(tmp_path), ttl_sec=60)
+    asyncio.run(later.get("new", {}, capture))  # first write sweeps
+    assert not os.path.exists(old)
+
+    cache._write(cache.cache_key("other", {}), "other", time.time() - 3600, {})
+    other = cache._path(cache.cache_key("other", {}))
+    assert os.path.exists(other)
+    assert cache._read(cache.cache_key("other", {})) is None and not os.path.exists(other)
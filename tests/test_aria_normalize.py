@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import random
+from typing import Any, Dict, List
+
+import pytest
+import yaml
+
+from spec2ir.a11y_budget import A11Y_NODE_KEYS
+from spec2ir.ui_context import _normalize_aria_yaml, _prune_nodes, _split_role_and_name
+
+
+# the recursive implementations the iterative ones replaced, kept as the reference output
+
+def _old_normalize(node: Any) -> Any:
+    if isinstance(node, str):
+        role, name = _split_role_and_name(node)
+        normalized: Dict[str, Any] = {"role": role or "text"}
+        if name:
+            normalized["name"] = name
+        return normalized
+    if isinstance(node, dict):
+        items: List[Any] = []
+        for key, value in node.items():
+            role, name = _split_role_and_name(key)
+            child = _old_normalize(value)
+            normalized = {"role": role or "text"}
+            if name:
+                normalized["name"] = name
+            if isinstance(child, list):
+                if child:
+                    normalized["children"] = child
+            elif isinstance(child, dict):
+                normalized["children"] = [child]
+            elif child not in (None, ""):
+                normalized["value"] = child
+            items.append(normalized)
+        return items[0] if len(items) == 1 else items
+    if isinstance(node, list):
+        out: List[Any] = []
+        for item in node:
+            child = _old_normalize(item)
+            if not child:
+                continue
+            if isinstance(child, list):
+                out.extend(child)
+            else:
+                out.append(child)
+        return out
+    return node
+
+
+def _old_prune(node: Any, max_depth: int, max_children: int, depth: int = 0) -> Any:
+    if node is None or depth >= max_depth:
+        return None
+    if isinstance(node, dict):
+        out: Dict[str, Any] = {k: node[k] for k in A11Y_NODE_KEYS if k in node and node[k] not in (None, "", [])}
+        children = node.get("children") or []
+        if isinstance(children, list) and children:
+            kept = [c for c in (_old_prune(c, max_depth, max_children, depth + 1) for c in children[:max_children])
+                    if c is not None]
+            if kept:
+                out["children"] = kept
+        return out
+    if isinstance(node, list):
+        return [_old_prune(x, max_depth, max_children, depth) for x in node[:max_children]]
+    return node
+
+
+_SAMPLES = [
+    '- button "OK"',
+    '- banner:\n  - heading "Dashboard" [level=1]\n  - link "Home":\n    - /url: /home',
+    '- main:\n  - textbox "用户名": admin\n  - checkbox "Remember" [checked]\n  - text: 42\n  - paragraph: "yes"',
+    '- list:\n  - listitem: one\n  - listitem:\n    - link "two"\n- contentinfo: null',
+]
+
+
+def _random_snapshot(rng: random.Random, depth: int = 0) -> str:
+    lines = []
+    for i in range(rng.randint(1, 5)):
+        indent = "  " * depth
+        if depth < 5 and rng.random() < 0.4:
+            lines.append(f'{indent}- group "g{depth}-{i}":')
+            lines.append(_random_snapshot(rng, depth + 1))
+        else:
+            lines.append(f'{indent}- {rng.choice(["button", "link", "text"])} "n{depth}-{i}"')
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("snapshot", _SAMPLES + [_random_snapshot(random.Random(seed)) for seed in range(20)])
+def test_matches_the_recursive_implementation(snapshot: str) -> None:
+    tree, nodes, truncated = _normalize_aria_yaml(snapshot)
+    assert tree == _old_normalize(yaml.safe_load(snapshot)) and not truncated
+    for depth, children in ((10, 40), (3, 2), (1, 1)):
+        assert _prune_nodes(tree, depth, children)[0] == _old_prune(tree, depth, children)
+
+
+def test_node_budget_stops_parsing_and_pruning() -> None:
+    snapshot = "\n".join(f'- button "b{i}"' for i in range(1000))
+    tree, nodes, truncated = _normalize_aria_yaml(snapshot, max_nodes=50)
+    assert truncated and nodes == 50 and len(tree) == 50
+    pruned, kept, cut = _prune_nodes(tree, 10, 1000, max_nodes=10)
+    assert cut and kept == 10 and len(pruned) == 10
+
+
+def test_deep_snapshots_do_not_recurse() -> None:
+    depth = 3000
+    snapshot = "\n".join(f'{"  " * i}- group "g{i}":' for i in range(depth)) + f'\n{"  " * depth}- button "deep"'
+    tree, nodes, _ = _normalize_aria_yaml(snapshot)
+    assert nodes == depth + 1
+    assert _prune_nodes(tree, depth + 5, 40)[1] == depth + 1
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from spec2ir_runner.daemon import BadRequest, Spec2IRDaemon, is_loopback
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    root = tmp_path / "work"
+    (root / "specs").mkdir(parents=True)
+    (tmp_path / "secret.yaml").write_text("id: x\n", encoding="utf-8")
+    os.symlink(tmp_path / "secret.yaml", root / "specs" / "link.yaml")
+    return Spec2IRDaemon(workdir=str(root), token="s3cret", a11y_cache=False)
+
+
+def test_paths_are_confined_to_the_workdir(daemon, tmp_path) -> None:
+    assert daemon._path({"p": "specs/a.yaml"}, "p") == os.path.join(daemon.workdir, "specs", "a.yaml")
+    for escape in ("../secret.yaml", str(tmp_path / "secret.yaml"), "specs/../../secret.yaml", "specs/link.yaml"):
+        with pytest.raises(BadRequest):
+            daemon._path({"p": escape}, "p")
+    with pytest.raises(BadRequest):
+        daemon._path({"p": ""}, "p")
+
+
+def test_requests_with_escaping_paths_are_400(daemon) -> None:
+    for route, body in (("/run", {"ir_path": "../x.yaml"}), ("/convert", {"spec_path": "/etc/passwd"}),
+                        ("/convert", {"spec": {"id": "a", "desc": "d", "expect": "e"}, "out": "../out.yaml"})):
+        status, payload = asyncio.run(daemon.dispatch("POST", route, body))
+        assert status == 400 and "outside the daemon workdir" in payload["error"]
+
+
+def test_bearer_token_and_loopback() -> None:
+    daemon = Spec2IRDaemon(token="s3cret", a11y_cache=False)
+    assert daemon.authorized({"authorization": "Bearer s3cret"})
+    assert not daemon.authorized({"authorization": "Bearer wrong"})
+    assert not daemon.authorized({})
+    assert Spec2IRDaemon(a11y_cache=False).authorized({})
+    assert is_loopback("127.0.0.1") and is_loopback("::1") and is_loopback("localhost")
+    assert not is_loopback("0.0.0.0") and not is_loopback("example.test")
+
+
+async def _exchange(daemon: Spec2IRDaemon, raw: bytes) -> bytes:
+    server = await asyncio.start_server(daemon.handle_connection, "127.0.0.1", 0)
+    async with server:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(raw)
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+    return data
+
+
+def test_http_rejects_missing_token_and_bad_content_length(daemon) -> None:
+    body = json.dumps({}).encode()
+    unauthorized = asyncio.run(_exchange(daemon, b"GET /health HTTP/1.1\r\nContent-Length: 2\r\n"
+                                                 b"Connection: close\r\n\r\n" + body))
+    assert unauthorized.startswith(b"HTTP/1.1 401 Unauthorized")
+    ok = asyncio.run(_exchange(daemon, b"GET /health HTTP/1.1\r\nAuthorization: Bearer s3cret\r\n"
+                                       b"Connection: close\r\n\r\n"))
+    assert ok.startswith(b"HTTP/1.1 200 OK") and b'"status": "ok"' in ok
+    bad = asyncio.run(_exchange(daemon, b"POST /run HTTP/1.1\r\nContent-Length: -5\r\n\r\n"))
+    assert bad.startswith(b"HTTP/1.1 400 Bad Request") and b"Connection: close" in bad
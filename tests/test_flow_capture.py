@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from spec2ir.flow_capture import _click_allowed, _is_password_fill, _locate
+from spec2ir.ir_model import Fill, Locator
+from spec2ir_runner.plan import fill_value
+
+
+class RecordingPage:
+    """Stands in for a Playwright page: every locator method returns its own call as `.first`."""
+
+    def __getattr__(self, method):
+        def build(*args, **kwargs):
+            return type("Locator", (), {"first": (method, args, kwargs)})()
+        return build
+
+
+def test_locators_match_the_runner() -> None:
+    page = RecordingPage()
+    assert _locate(page, Locator(kind="role", value="button", name="登录")) == ("get_by_role", ("button",),
+                                                                                {"name": "登录"})
+    assert _locate(page, Locator(kind="xpath", value="//a")) == ("locator", ("xpath=//a",), {})
+    assert _locate(page, Locator(kind="testid", value="save")) == ("get_by_test_id", ("save",), {})
+
+
+def test_fill_values_come_from_the_environment(monkeypatch) -> None:
+    monkeypatch.setenv("ADMIN_PASS", "secret")
+    monkeypatch.delenv("UNSET_VAR", raising=False)
+    assert fill_value("${ADMIN_PASS}") == "secret"
+    assert fill_value("${UNSET_VAR}") == "${UNSET_VAR}"
+    assert fill_value("plain ${ADMIN_PASS}") == "plain ${ADMIN_PASS}"
+
+
+def test_click_gate_helpers() -> None:
+    assert _click_allowed(Locator(kind="role", value="link", name="下一页"), ["下一*"])
+    assert not _click_allowed(Locator(kind="role", value="button", name="删除"), ["下一*"])
+    password = Fill(locator=Locator(kind="label", value="Password"), value="x")
+    assert _is_password_fill("输入 口令", password)
+    assert not _is_password_fill("输入 bypass", Fill(locator=Locator(kind="label", value="bypass"), value="x"))
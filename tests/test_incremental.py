@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from spec2ir import ir_model
+from spec2ir.ir_model import Click, Fill, Goto, Locator
+from spec2ir.llm.base import LLMProvider
+from spec2ir.rules import _previous_steps, convert_spec
+from spec2ir.spec_model import SpecCase, SpecStep, spec_lines, step_hashes
+
+
+class CountingLLM(LLMProvider):
+    """Records prompts; always answers with one click attributed to sub-spec line 2."""
+
+    def __init__(self, tags=()) -> None:
+        self.prompts = []
+        self.tags = list(tags)
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        self.prompts.append(user_prompt)
+        return json.dumps({"id": "case", "desc": "d", "env_base_url": "http://app.test", "tags": self.tags,
+                           "actions": [{"op": "click", "locator": {"kind": "text", "value": "x"}, "step": "2"}],
+                           "expects": [{"kind": "url_is", "value": "/"}]})
+
+
+def _spec(*steps: str) -> SpecCase:
+    return SpecCase(id="case", desc="d", steps=[SpecStep(action=s) for s in steps], expect="看到首页效果")
+
+
+def test_step_hashes_ignore_whitespace_and_number_repeats() -> None:
+    a, b, c = step_hashes(["点击  保存", "点击 保存", " 点击 保存 "])
+    assert len({a, b, c}) == 3
+    assert step_hashes(["点击 保存"]) == [a]
+    assert step_hashes(["x", "点击   保存"])[1] == a
+
+
+def test_unchanged_steps_are_reused_and_only_edits_reach_the_llm() -> None:
+    spec = _spec("打开 http://app.test/", "在页面上做一件事")
+    first, _ = asyncio.run(convert_spec(spec, CountingLLM(tags=["smoke"])))
+    llm = CountingLLM()
+    again, report = asyncio.run(convert_spec(spec, llm, previous=first))
+    assert llm.prompts == [] and report.reused == 2
+    assert again.actions == first.actions and again.tags == ["smoke"]
+
+    edited = _spec("打开 http://app.test/", "在页面上做另一件事")
+    _, report = asyncio.run(convert_spec(edited, llm, previous=first))
+    assert len(llm.prompts) == 1 and report.reused == 1
+
+
+def test_unattributed_actions_follow_the_preceding_step() -> None:
+    h1, h2 = step_hashes(spec_lines(_spec("a", "b")))
+    lead = Goto(url="http://app.test/")
+    fill = Fill(locator=Locator(kind="label", value="x"), value="1", step=h1)
+    loose = Click(locator=Locator(kind="text", value="ok"))
+    click = Click(locator=Locator(kind="text", value="go"), step=h2)
+    groups = _previous_steps(ir_model.TestIR(id="case", desc="d", env_base_url="http://app.test",
+                                             actions=[lead, fill, loose, click]))
+    assert groups == {h1: [lead, fill, loose], h2: [click]}
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import yaml
+
+from spec2ir import ir_model
+from spec2ir_runner import suite
+from spec2ir_runner.loader import IRLoader, bundle_entry_name, bundle_line_numbers, write_bundle
+
+
+def _ir(ir_id: str) -> ir_model.TestIR:
+    return ir_model.TestIR(id=ir_id, desc="d", env_base_url="http://app.test", actions=[{"op": "goto", "url": "/"}])
+
+
+def test_yaml_file_is_reused_from_memory_and_cache_dir(tmp_path) -> None:
+    path = tmp_path / "a.yaml"
+    path.write_text(yaml.safe_dump(_ir("a").model_dump()), encoding="utf-8")
+    loader = IRLoader(cache_dir=str(tmp_path / "cache"), use_disk=True)
+    assert loader.load(str(path)) is loader.load(str(path))
+    assert (loader.stats.parsed, loader.stats.memory_hits) == (1, 1)
+    fresh = IRLoader(cache_dir=str(tmp_path / "cache"), use_disk=True)
+    assert fresh.load(str(path)) == _ir("a")
+    assert (fresh.stats.parsed, fresh.stats.disk_hits) == (0, 1)
+
+
+def test_bundle_entries_are_named_by_line(tmp_path) -> None:
+    path = str(tmp_path / "b.irs.jsonl")
+    assert write_bundle([_ir("a"), _ir("a"), _ir("b")], path) == 3
+    entries = IRLoader(use_disk=False).load_all([path])
+    assert [name for name, _ in entries] == [f"{path}:2", f"{path}:3", f"{path}:4"]
+    assert [ir.id for _, ir in entries] == ["a", "a", "b"]
+
+
+def test_invalid_bundle_line_fails_only_itself(tmp_path) -> None:
+    path = str(tmp_path / "b.irs.jsonl")
+    write_bundle([_ir("a"), _ir("b")], path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "broken"\n\n' + _ir("c").model_dump_json() + "\n")
+    loader = IRLoader(use_disk=False)
+    entries = dict(loader.load_all([path]))
+    assert isinstance(entries[f"{path}:4"], ValueError)
+    assert [ir.id for ir in entries.values() if isinstance(ir, ir_model.TestIR)] == ["a", "b", "c"]
+    assert (loader.stats.irs, loader.stats.failed) == (3, 1)
+    assert bundle_line_numbers(path) == [2, 3, 4, 6]
+
+
+def test_bad_header_fails_the_bundle(tmp_path) -> None:
+    path = tmp_path / "b.irs.jsonl"
+    path.write_text(_ir("a").model_dump_json() + "\n", encoding="utf-8")
+    [(name, error)] = IRLoader(use_disk=False).load_all([str(path)])
+    assert name == str(path) and isinstance(error, ValueError)
+
+
+def test_workers_split_a_bundle_and_name_entries_like_the_loader(tmp_path) -> None:
+    path = str(tmp_path / "b.irs.jsonl")
+    write_bundle([_ir(f"t{i}") for i in range(5)], path)
+    items = suite._work_items([path, str(tmp_path / "missing.yaml")])
+    assert items == [(path, n) for n in range(2, 7)] + [(str(tmp_path / "missing.yaml"), None)]
+    chunk = items[1:5:2]
+    loaded = IRLoader(use_disk=False).load_all([path], {path: {n for _, n in chunk}})
+    assert [name for name, _ in loaded] == [bundle_entry_name(path, n) for _, n in chunk]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import pytest
+
+from spec2ir.netprofile import NetworkStats, get_profile, profile_for_tags
+
+
+def test_lean_blocks_heavy_types_and_analytics_but_never_documents() -> None:
+    lean = get_profile("lean")
+    assert lean.should_block("http://app.test/logo.png", "image")
+    assert lean.should_block("https://www.google-analytics.com/g/collect?v=2", "script")
+    assert not lean.should_block("http://app.test/app.js", "script")
+    assert not lean.should_block("http://app.test/", "document")
+
+
+def test_minimal_blocks_third_party_hosts() -> None:
+    minimal = get_profile("minimal")
+    assert minimal.should_block("https://cdn.other.test/x.js", "script", {"app.test"})
+    assert not minimal.should_block("https://api.app.test/x", "fetch", {"app.test"})
+
+
+def test_profiles_resolve_from_tags() -> None:
+    assert get_profile("none") is None
+    assert profile_for_tags(["smoke", "net:lean"], None).name == "lean"
+    with pytest.raises(ValueError):
+        get_profile("nope")
+
+
+def test_stats_report_request_counts_only() -> None:
+    stats = NetworkStats(requests=10)
+    stats.blocked.update({"image": 3, "font": 1})
+    assert str(stats) == "[NET] blocked 4/10 requests: image=3, font=1"
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+
+from spec2ir.llm.openai_compat import OpenAICompatProvider
+from spec2ir.llm.ratelimit import RateLimiter
+
+
+def _provider(monkeypatch, handler, **env) -> OpenAICompatProvider:
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    provider = OpenAICompatProvider(base_url="http://llm.test/v1")
+    provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return provider
+
+
+def test_retry_after_is_capped_by_backoff_max(monkeypatch) -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "3600"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "{}"}}]})
+
+    provider = _provider(monkeypatch, handler, LLM_BACKOFF_MAX_SEC="0.05")
+    started = time.perf_counter()
+    assert asyncio.run(provider.complete_json("s", "u")) == "{}"
+    assert len(calls) == 2 and time.perf_counter() - started < 1.0
+    assert provider._backoff(0, httpx.Response(503, headers={"Retry-After": "0.01"})) == 0.01
+
+
+def test_streamed_usage_reconciles_the_token_reservation(monkeypatch) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream_options"] == {"include_usage": True}
+        chunks = [{"choices": [{"delta": {"content": '{"a": 1}'}}]},
+                  {"choices": [], "usage": {"prompt_tokens": 5, "total_tokens": 9}}]
+        body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body)
+
+    provider = _provider(monkeypatch, handler, LLM_STREAM="1", LLM_TPM="6000")
+    adjusted = []
+    monkeypatch.setattr(provider.rate_limiter, "adjust", adjusted.append)
+    assert asyncio.run(provider.complete_json("s" * 30, "u" * 30)) == '{"a": 1}'
+    assert adjusted == [9 - 20] and provider.prompt_tokens == 5
+
+
+def test_refunds_never_exceed_capacity() -> None:
+    limiter = RateLimiter(tokens_per_minute=600)
+    asyncio.run(limiter.acquire(100))
+    limiter.adjust(-10_000)
+    assert limiter._tokens.level == 600
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+
+import pytest
+
+from spec2ir.converter import specs_to_irs, validate_completion
+from spec2ir.llm.base import LLMProvider
+from spec2ir.packing import SpecPacker
+from spec2ir.spec_model import SpecCase, SpecStep
+
+
+def _ir(spec_id: str) -> dict:
+    return {"id": spec_id, "desc": "d", "env_base_url": "http://app.test",
+            "actions": [{"op": "goto", "url": "/", "step": "1"}], "expects": [{"kind": "url_is", "value": "/"}]}
+
+
+class PackingLLM(LLMProvider):
+    """Packed prompts get one entry per SPEC, except that specs listed in `broken` get an invalid one."""
+
+    def __init__(self, broken=(), reorder: bool = False) -> None:
+        self.broken = set(broken)
+        self.reorder = reorder
+        self.packed = 0
+        self.single = 0
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        if '{"irs": [...]}' in user_prompt:
+            self.packed += 1
+            ids = re.findall(r"^id: (\S+)$", user_prompt, re.MULTILINE)
+            entries = [{"id": i, "actions": "nope"} if i in self.broken else _ir(i) for i in ids]
+            return json.dumps({"irs": entries[::-1] + [_ir("extra")] if self.reorder else entries})
+        self.single += 1
+        return json.dumps(_ir(re.findall(r"^id: (\S+)$", user_prompt, re.MULTILINE)[0]))
+
+
+def _specs(n: int):
+    return [SpecCase(id=f"s{i}", desc="d", steps=[SpecStep(action="打开首页")], expect="看到首页")
+            for i in range(n)]
+
+
+def test_split_matches_entries_to_specs() -> None:
+    specs = _specs(3)
+    llm = PackingLLM(broken={"s1"})
+    irs = asyncio.run(specs_to_irs(specs, llm))
+    assert [ir.id if ir else None for ir in irs] == ["s0", None, "s2"]
+    # entries out of order or with extras are matched by id
+    irs = asyncio.run(specs_to_irs(specs, PackingLLM(reorder=True)))
+    assert [ir.id for ir in irs] == ["s0", "s1", "s2"]
+
+
+def test_packer_sends_one_request_and_retries_bad_entries_alone() -> None:
+    llm = PackingLLM(broken={"s2"})
+    packer = SpecPacker(llm, max_specs=4, window_sec=0.01)
+
+    async def main():
+        return await asyncio.gather(*(packer.convert(spec) for spec in _specs(4)))
+
+    assert [ir.id for ir in asyncio.run(main())] == ["s0", "s1", "s2", "s3"]
+    assert (llm.packed, llm.single) == (1, 1)
+    assert (packer.stats.requests, packer.stats.retried) == (2, 1)
+
+
+def test_completion_check_accepts_both_answer_kinds() -> None:
+    validate_completion(json.dumps(_ir("a")))
+    validate_completion(json.dumps({"irs": [{"id": "partial"}]}))  # entries are checked later, one by one
+    with pytest.raises(ValueError):
+        validate_completion(json.dumps({"irs": ["x"]}))
+    with pytest.raises(ValueError):
+        validate_completion(json.dumps({"id": "a"}))
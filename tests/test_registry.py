@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+
+from spec2ir.llm import registry
+from spec2ir.llm.base import LLMProvider
+from spec2ir.llm.registry import MultiProvider
+
+
+class Canned(LLMProvider):
+    def __init__(self, answer: str, delay: float = 0.0, fail: bool = False) -> None:
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("down")
+        return self.answer
+
+
+def test_fallback_skips_failing_and_rejected_providers() -> None:
+    a, b = Canned("a", fail=True), Canned("b")
+    multi = MultiProvider({"a": a, "b": b})
+    assert asyncio.run(multi.complete_json("s", "u")) == "b"
+    a.fail = False
+    multi.discard("s", "u")  # b's answer was bad: the same prompt goes to a first now
+    assert asyncio.run(multi.complete_json("s", "u")) == "a"
+    assert multi.members[1].stats.invalid == 1
+
+
+def test_invalid_output_falls_through_to_the_next_provider() -> None:
+    def validate(text: str) -> None:
+        if text == "bad":
+            raise ValueError(text)
+
+    multi = MultiProvider({"a": Canned("bad"), "b": Canned("good")}, validate=validate)
+    assert asyncio.run(multi.complete_json("s", "u")) == "good"
+
+
+def test_per_prompt_bookkeeping_is_bounded(monkeypatch) -> None:
+    monkeypatch.setattr(registry, "_TRACKED_PROMPTS", 3)
+    multi = MultiProvider({"a": Canned("a"), "b": Canned("b")})
+    for i in range(10):
+        asyncio.run(multi.complete_json("s", str(i)))
+        if i % 2:
+            multi.discard("s", str(i))
+    assert list(multi._rejected) == [multi._key("s", str(i)) for i in (5, 7, 9)]
+    assert list(multi._answered_by) == [multi._key("s", str(i)) for i in (6, 8)]  # 9 was capped in, then discarded
+
+
+def test_hedge_loser_is_cancelled_without_a_latency_sample() -> None:
+    slow, fast = Canned("slow", delay=1.0), Canned("fast", delay=0.01)
+    multi = MultiProvider({"slow": slow, "fast": fast}, mode="hedge", hedge_delay_sec=0.02)
+    assert asyncio.run(multi.complete_json("s", "u")) == "fast"
+    stats = {m.name: m.stats for m in multi.members}
+    assert stats["slow"].cancelled == 1 and not stats["slow"].latencies
+    assert multi.hedges == 1
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from spec2ir.a11y_index import A11yIndex
+from spec2ir.ir_model import ExpectURL, ExpectVisibleText, Fill, Goto, WaitFor
+from spec2ir.llm.base import LLMProvider
+from spec2ir.rules import RuleContext, compile_expect, compile_step, convert_spec
+from spec2ir.spec_model import SpecCase, SpecStep
+
+
+class ScriptedLLM(LLMProvider):
+    """Answers every prompt with the same IR; `step` numbers refer to the sub-spec it is sent."""
+
+    def __init__(self, actions, expects=None) -> None:
+        self.answer = json.dumps({"id": "case", "desc": "d", "env_base_url": "http://app.test",
+                                  "actions": actions, "expects": expects or [{"kind": "url_is", "value": "/"}]})
+        self.calls = 0
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        self.calls += 1
+        return self.answer
+
+
+def _spec(*steps: str, expect: str = "页面显示 设置") -> SpecCase:
+    return SpecCase(id="case", desc="d", steps=[SpecStep(action=s) for s in steps], expect=expect)
+
+
+def test_open_and_wait_rules() -> None:
+    assert compile_step("打开 http://app.test/login。", RuleContext()) == [Goto(url="http://app.test/login")]
+    assert compile_step("跳转到 /home/", RuleContext()) == [WaitFor(target="url", value="**/home*")]
+    assert compile_step("等待「保存成功」出现", RuleContext()) == [WaitFor(target="text", value="保存成功")]
+
+
+def test_fill_and_click_need_the_index() -> None:
+    index = A11yIndex.from_tree({"role": "form", "children": [
+        {"role": "textbox", "name": "用户名"}, {"role": "textbox", "name": "密码"},
+        {"role": "button", "name": "登录"}]})
+    assert compile_step("输入 用户名 admin", RuleContext()) is None
+    assert compile_step("输入 用户名 admin", RuleContext(index))[0].value == "${ADMIN_USER}"
+    # a password is never copied from the spec
+    assert compile_step("输入 密码 hunter2", RuleContext(index))[0].value == "${ADMIN_PASS}"
+    click = compile_step("点击「登录」按钮", RuleContext(index))[0]
+    assert (click.locator.value, click.locator.name) == ("button", "登录")
+    assert compile_step("点击「注册」按钮", RuleContext(index)) is None
+
+
+def test_expect_split() -> None:
+    assert compile_expect("跳转到 /home，并且页面显示 欢迎") == [ExpectURL(value="/home"),
+                                                             ExpectVisibleText(value="欢迎")]
+    assert compile_expect("页面显示并发数") == [ExpectVisibleText(value="并发数")]
+    assert compile_expect("弹出确认框") is None
+
+
+def test_llm_goto_to_another_page_is_kept() -> None:
+    llm = ScriptedLLM([{"op": "goto", "url": "/settings", "step": "2"}])
+    ir, report = asyncio.run(convert_spec(_spec("打开 http://app.test/login", "打开设置页"), llm))
+    assert [a.url for a in ir.actions if isinstance(a, Goto)] == ["http://app.test/login", "/settings"]
+    assert (report.compiled, report.llm_calls) == (1, 1)
+
+
+def test_llm_goto_reopening_the_current_page_is_dropped() -> None:
+    llm = ScriptedLLM([{"op": "goto", "url": "/login", "step": "1"},
+                       {"op": "fill", "locator": {"kind": "label", "value": "用户名"}, "value": "admin", "step": "2"}])
+    ir, _ = asyncio.run(convert_spec(_spec("打开 http://app.test/login", "填写登录表单"), llm))
+    assert [type(a) for a in ir.actions] == [Goto, Fill]
+    assert ir.env_base_url == "http://app.test"
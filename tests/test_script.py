@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import ast
+
+from spec2ir import ir_model
+from spec2ir_runner.plan import compile_plan, url_pattern
+from spec2ir_runner.script import plan_to_script, script_file_name, write_script
+
+
+def _plan(ir_id: str = "login", desc: str = "d"):
+    return compile_plan(ir_model.TestIR(id=ir_id, desc=desc, env_base_url="http://app.test", actions=[
+        {"op": "goto", "url": "/login"},
+        {"op": "fill", "locator": {"kind": "label", "value": "用户名"}, "value": "${ADMIN_USER}"},
+        {"op": "wait_for", "target": "url", "value": "/home*"},
+    ], expects=[{"kind": "url_is", "value": "**/home*"}]))
+
+
+def test_url_pattern_resolves_only_leading_slash() -> None:
+    assert url_pattern("/home*", "http://app.test/") == "http://app.test/home*"
+    assert url_pattern("**/home*", "http://app.test") == "**/home*"
+
+
+def test_script_parses_with_hostile_ids_and_sources() -> None:
+    nasty = 'a"""b\\'
+    module = ast.parse(plan_to_script(_plan(ir_id=nasty, desc=nasty), source="C:\\specs\\'''x.yaml"))
+    docstring = ast.get_docstring(module)
+    assert docstring.startswith("a'''b\\: a'''b\\") and "C:\\specs\\'''x.yaml" in docstring
+    calls = [ast.unparse(n) for n in ast.walk(module) if isinstance(n, ast.Call)]
+    assert "page.wait_for_url('http://app.test/home*', timeout=15000)" in calls
+    assert "os.getenv('ADMIN_USER', '${ADMIN_USER}')" in calls
+
+
+def test_script_names_do_not_collide(tmp_path) -> None:
+    taken: set = set()
+    assert [script_file_name(i, taken) for i in ("a-b", "a_b", "a b")] == ["a_b.py", "a_b_2.py", "a_b_3.py"]
+    first = write_script(_plan(), str(tmp_path), taken=set(taken))
+    assert first.endswith("login.py")
+    paths = {write_script(_plan(), str(tmp_path), taken=taken) for _ in range(2)}
+    assert len(paths) == 2 and len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from spec2ir.converter import IRStream
+from spec2ir.llm.base import LLMProvider
+from spec2ir.stream_json import IncrementalJSONParser, StreamValidationError
+
+_IR = {
+    "id": "login", "desc": "d", "env_base_url": "http://app.test",
+    "actions": [
+        {"op": "goto", "url": "/login?next=\"a}b\""},
+        {"op": "fill", "locator": {"kind": "label", "value": "用户名 [x]"}, "value": "${ADMIN_USER}"},
+        {"op": "click", "locator": {"kind": "role", "value": "button", "name": "登录"}},
+    ],
+    "expects": [{"kind": "url_is", "value": "/home"}],
+}
+
+
+def _feed(parser: IncrementalJSONParser, text: str, size: int):
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(parser.feed(text[i:i + size]))
+    return out
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_items_are_emitted_whatever_the_chunking(size: int) -> None:
+    text = "Here you go:\n```json\n" + json.dumps(_IR, ensure_ascii=False, indent=2) + "\n```"
+    parser = IncrementalJSONParser(("actions", "expects"))
+    items = _feed(parser, text, size)
+    assert items == [("actions", a) for a in _IR["actions"]] + [("expects", e) for e in _IR["expects"]]
+    assert parser.done
+
+
+def test_each_item_is_emitted_as_soon_as_it_closes() -> None:
+    text = json.dumps(_IR)
+    item = json.dumps(_IR["actions"][0])
+    first_end = text.index(item) + len(item)  # its "}" inside the URL string must not close it
+    parser = IncrementalJSONParser(("actions",))
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1]) == [("actions", _IR["actions"][0])]
+
+
+def test_invalid_value_is_rejected_mid_item() -> None:
+    parser = IncrementalJSONParser(("actions",), {("actions", "locator", "kind"): {"label", "role"}})
+    with pytest.raises(StreamValidationError, match="actions.locator.kind"):
+        parser.feed('{"actions": [{"op": "click", "locator": {"kind": "shadow"')
+
+
+def test_non_object_items_are_rejected() -> None:
+    with pytest.raises(StreamValidationError):
+        IncrementalJSONParser(("actions",)).feed('{"actions": ["goto"')
+
+
+class StreamingLLM(LLMProvider):
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.pieces = 0
+        self.discarded = 0
+
+    @property
+    def supports_streaming(self) -> bool:
+        return True
+
+    async def complete_json(self, system_prompt: str, user_prompt: str) -> str:
+        return self.text
+
+    async def stream_json(self, system_prompt: str, user_prompt: str):
+        for i in range(0, len(self.text), 5):
+            self.pieces += 1
+            yield self.text[i:i + 5]
+
+    def discard(self, system_prompt: str, user_prompt: str) -> None:
+        self.discarded += 1
+
+
+def test_ir_stream_stops_reading_at_the_first_bad_action() -> None:
+    bad = dict(_IR, actions=[{"op": "hover", "locator": {"kind": "label", "value": "x"}}] + _IR["actions"])
+    llm = StreamingLLM(json.dumps(bad))
+
+    async def consume():
+        return [a async for a in IRStream(llm, "s", "u")]
+
+    with pytest.raises(StreamValidationError):
+        asyncio.run(consume())
+    assert llm.pieces < len(llm.text) / 5 / 2 and llm.discarded == 1
+
+
+def test_ir_stream_yields_actions_then_the_full_ir() -> None:
+    llm = StreamingLLM(json.dumps(_IR))
+    stream = IRStream(llm, "s", "u")
+
+    async def consume():
+        return [a.op async for a in stream]
+
+    assert asyncio.run(consume()) == ["goto", "fill", "click"]
+    assert stream.ir.expects[0].value == "/home"